@@ -0,0 +1,50 @@
+import heapq
+
+from antagent.AntAgent import AntAgent
+
+
+class AgentPool:
+    """
+    預先配置 capacity 隻 AntAgent，id 就是在池中的位置（pool[id]）。
+    螞蟻死亡時放回池中，下一隻出生的沿用同一個物件與它的記憶、路徑緩衝區，
+    族群反覆增減也不會再配置新物件；空出來的 id 由小到大重用，結果只取決於死亡與出生的順序。
+    """
+
+    def __init__(self, capacity, **kwargs):
+        """kwargs: 每隻螞蟻共用的 AntAgent 參數（memory_base、planner、flow_field、events、rng、view_radius）"""
+        self.slots = [AntAgent(i, [0, 0], **kwargs) for i in range(capacity)]
+        self.free = list(range(capacity))  # 由小到大排好的 list 本身就是 heap
+        self.extent = 0  # 用過的最大 id + 1
+        # 每個池位的世代，放回池中時加一：排程裡記下世代，到期時不同就是給了之後出生的螞蟻
+        self.generation = [0] * capacity
+
+    @property
+    def capacity(self):
+        return len(self.slots)
+
+    def __len__(self):
+        """使用中的螞蟻數"""
+        return len(self.slots) - len(self.free)
+
+    def __getitem__(self, agent_id):
+        return self.slots[agent_id]
+
+    def acquire(self, pos, is_explorer=True, born=0):
+        """取出 id 最小的空位，重設成剛出生的螞蟻；池滿時回傳 None"""
+        if not self.free:
+            return None
+        agent = self.slots[heapq.heappop(self.free)]
+        agent.reset(pos, is_explorer, born)
+        self.extent = max(self.extent, agent.id + 1)
+        return agent
+
+    def release(self, agent):
+        self.generation[agent.id] += 1
+        heapq.heappush(self.free, agent.id)
+
+    def restore(self, ids, extent, generation):
+        """快照還原用：ids 為使用中的 id，generation 為每個池位的世代"""
+        used = set(ids)
+        self.free = [i for i in range(len(self.slots)) if i not in used]
+        self.extent = extent
+        self.generation = list(generation)
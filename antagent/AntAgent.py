@@ -1,58 +1,99 @@
 import numpy as np
-from collections import deque
-import random
+from antagent.LayeredMemory import LayeredMemory
+from antagent.ReturnPlanner import ReturnPlanner
+from antagent.PathStorage import TrailBuffer, PlannedPath
+from event_bus import DISABLED
+
+
+DIRECTIONS = [(dx, dy) for dx in [-1, 0, 1]
+              for dy in [-1, 0, 1] if not (dx == 0 and dy == 0)]
 
 
 class AntAgent:
-    def __init__(self, agent_id, pos, is_explorer=True):
+    # 屬性一律在這裡宣告（沒有 __dict__）：存取較快、每隻的大小固定，池中的物件可反覆重用（見 AgentPool）
+    __slots__ = ("id", "pos", "carrying_food", "is_explorer", "steps_taken", "max_steps", "mode",
+                 "return_path", "memory", "size", "planner", "flow_field", "follow_field",
+                 "path_history", "blocked_count", "just_reset", "food_zones", "events", "rng",
+                 "view_radius", "born")
+
+    def __init__(self, agent_id, pos, is_explorer=True, memory_base=None,
+                 planner=None, flow_field=None, events=None, rng=None, size=150,
+                 view_radius=1, born=0):
         self.id = agent_id
+        self.return_path = PlannedPath()  # planned path home
+
+        # 個人記憶只存與共享基底（NestMemory.base）不同的格子；
+        # 沒有基底時才依 size 自己配置（地圖大小一律由基底決定）
+        if memory_base is None:
+            memory_base = np.zeros((size, size), dtype=np.int8)
+        self.memory = LayeredMemory(memory_base)
+        self.size = self.memory.size
+        self.planner = planner  # 可由多隻螞蟻共用的 ReturnPlanner
+        self.flow_field = flow_field  # 巢的距離場（NestFlowField）
+        self.path_history = TrailBuffer()  # 只留最近的足跡
+        self.food_zones = set()  # 撿過食物的食物區編號（見 envs/food_zones.py）
+        self.events = events if events is not None else DISABLED
+        # 介面會整批傳入本回合的方向亂數；單獨使用時才用自己的 Generator
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.view_radius = view_radius  # 每回合看得到自己周圍幾格
+        self.reset(pos, is_explorer, born)
+
+    def reset(self, pos, is_explorer=True, born=0):
+        """回到剛出生的狀態；記憶、路徑與足跡沿用原本的容器，只清空內容"""
         self.pos = pos  # [x, y]
         self.carrying_food = False
         self.is_explorer = is_explorer
         self.steps_taken = 0
         self.max_steps = 300
         self.mode = "explore"  # or "return"
-        self.return_path = []  # planned path home
-
-        self.memory = np.zeros((150, 150), dtype=np.int8)
-        self.path_history = [tuple(pos)]
+        self.return_path.clear()
+        self.memory.clear()
+        self.follow_field = False  # return_path 走完後改沿距離場回巢
+        self.path_history.reset(pos)
         self.blocked_count = 0
         self.just_reset = False
+        self.food_zones.clear()
+        self.born = born  # 出生的 tick（見 colony.py）
 
     def observe(self, global_grid):
+        """把以自己為中心、半徑 view_radius 的視窗從地圖複製到記憶（整批版本見 observation.observe_all）"""
         x, y = self.pos
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < 150 and 0 <= ny < 150:
-                    self.memory[nx][ny] = global_grid[nx][ny]
+        r = self.view_radius
+        x0, y0 = max(x - r, 0), max(y - r, 0)
+        self.memory.write_window(x0, y0, global_grid[x0:x + r + 1, y0:y + r + 1])
 
-    def decide_move(self):
+    def decide_move(self, keys=None):
+        """keys: 本回合 8 個方向的亂數（見 sim_random.direction_keys），省略時自己抽"""
         if self.mode == "return":
+            if not self.return_path and self.follow_field:
+                step = self.flow_field.next_step(self.pos, self.memory)
+                if step is not None:
+                    return step
             if not self.return_path:
                 return (0, 0)  # 被卡住但仍在 return 模式
-            target = self.return_path.pop(0)
+            target = self.return_path.pop_next()
             dx = target[0] - self.pos[0]
             dy = target[1] - self.pos[1]
             return (dx, dy)
 
-        # explore 模式
-        directions = [(dx, dy) for dx in [-1, 0, 1]
-                      for dy in [-1, 0, 1] if not (dx == 0 and dy == 0)]
-        random.shuffle(directions)
-
-        for dx, dy in directions:
-            nx, ny = self.pos[0] + dx, self.pos[1] + dy
-            if 0 <= nx < 150 and 0 <= ny < 150 and self.memory[nx][ny] == 0:
-                return (dx, dy)
-
-        return random.choice(directions)
+        # explore 模式：在未知格裡隨機挑一個，沒有就隨便走
+        if keys is None:
+            keys = self.rng.random(8)
+        x, y = self.pos
+        best, best_key = None, 3.0
+        for (dx, dy), key in zip(DIRECTIONS, keys):
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < self.size and 0 <= ny < self.size and self.memory[nx, ny] == 0):
+                key += 1.0
+            if key < best_key:
+                best, best_key = (dx, dy), key
+        return best
 
     def move(self, direction, global_grid, agent_positions):
         new_x = self.pos[0] + direction[0]
         new_y = self.pos[1] + direction[1]
 
-        if 0 <= new_x < 150 and 0 <= new_y < 150:
+        if 0 <= new_x < self.size and 0 <= new_y < self.size:
             if global_grid[new_x][new_y] != 1 and (new_x, new_y) not in agent_positions:
                 self.pos = [new_x, new_y]
                 self.steps_taken += 1
@@ -61,11 +102,13 @@ class AntAgent:
                 return True
             else:
                 self.blocked_count += 1
-                print(
-                    f"[{self.id}] 移動到 ({new_x},{new_y}) 被擋住（連續 {self.blocked_count} 次）")
+                events = self.events
+                if events.blocked:
+                    events.emit("blocked", self.id, new_x, new_y, self.blocked_count)
                 if self.blocked_count >= 3:
-                    print(f"[{self.id}] 被卡 {self.blocked_count} 次，強制切回探索")
-                    self.return_path = []
+                    if events.stuck:
+                        events.emit("stuck", self.id, new_x, new_y, self.blocked_count)
+                    self.return_path.clear()
                     self.mode = "explore"
                     self.reset_steps()
         return False
@@ -76,45 +119,34 @@ class AntAgent:
     def reset_steps(self):
         self.steps_taken = 0
 
-    def known_food_locations(self):
-        return list(zip(*np.where(self.memory == 2)))
+    def known_food_zones(self):
+        """撿過食物的食物區編號（位置與剩餘量見 FoodZones.boxes / remaining）"""
+        return sorted(self.food_zones)
+
+    def remember_food_zone(self, zone):
+        """記住撿到食物的食物區（-1 表示不屬於任何區），回巢時由 NestMemory 合併"""
+        if zone >= 0:
+            self.food_zones.add(zone)
 
     def plan_return_path(self, nest_coords):
-        """從自己的記憶中，用 BFS 找出回巢路徑"""
-        queue = deque()
-        visited = set()
-        queue.append((tuple(self.pos), [tuple(self.pos)]))
-        visited.add(tuple(self.pos))
-
-        while queue:
-            current, path = queue.popleft()
-            if current in nest_coords:
-                self.return_path = path[1:]  # 排除自己
-                self.mode = "return"
-                return True
-            for dx in [-1, 0, 1]:
-                for dy in [-1, 0, 1]:
-                    if dx == dy == 0:
-                        continue
-                    nx, ny = current[0] + dx, current[1] + dy
-                    if 0 <= nx < 150 and 0 <= ny < 150:
-                        if self.memory[nx][ny] != 1 and (nx, ny) not in visited:
-                            queue.append(((nx, ny), path + [(nx, ny)]))
-                            visited.add((nx, ny))
-        return False  # 找不到
-
-    def mark_food_region(self, start_pos, global_grid):
-        """從起始格出發，尋找並標記整塊食物區域"""
-        queue = deque([start_pos])
-        visited = set()
-        while queue:
-            x, y = queue.popleft()
-            if (x, y) in visited:
-                continue
-            visited.add((x, y))
-            if 0 <= x < 150 and 0 <= y < 150 and global_grid[x][y] == 2:
-                self.memory[x][y] = 2
-                for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                    nx, ny = x + dx, y + dy
-                    if (nx, ny) not in visited:
-                        queue.append((nx, ny))
+        """
+        先沿巢的距離場回巢；距離場覆蓋不到（或與自己的記憶衝突）時，
+        才用自己的記憶規劃到距離場覆蓋的範圍或巢。
+        """
+        if self.planner is None:
+            self.planner = ReturnPlanner(self.size, nest_coords)
+        field = self.flow_field
+        if field is not None and (field.distance(self.pos) == 0
+                                  or field.next_step(self.pos, self.memory) is not None):
+            self.return_path.clear()
+            self.follow_field = True
+            self.mode = "return"
+            return True
+
+        path = self.planner.plan(self.pos, self.memory, field)
+        if path is None:
+            return False  # 找不到
+        self.return_path.set(path)  # 排除自己
+        self.follow_field = field is not None
+        self.mode = "return"
+        return True
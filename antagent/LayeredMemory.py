@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class LayeredMemory:
+    """
+    螞蟻個人記憶：共享的基底層（由 NestMemory 持有）+ 私有差異層。
+    讀取時先查差異層，沒有就落到基底層；寫入只記錄與基底不同的格子。
+    值的意義與舊版 memory 陣列相同（0: 未知/空地, 1: 蟻窩, 2: 食物）。
+    """
+    __slots__ = ("base", "size", "delta")
+
+    def __init__(self, base):
+        self.base = base
+        self.size = base.shape[0]
+        self.delta = {}  # 平坦索引 x * size + y -> 值
+
+    def __getitem__(self, key):
+        x, y = key
+        idx = x * self.size + y
+        if idx in self.delta:
+            return self.delta[idx]
+        return self.base[x, y]
+
+    def __setitem__(self, key, value):
+        x, y = key
+        idx = x * self.size + y
+        if self.base[x, y] == value:
+            self.delta.pop(idx, None)
+        else:
+            self.delta[idx] = value
+
+    def write_window(self, x0, y0, values):
+        """把一塊矩形（左上角 (x0, y0)）整塊寫入，結果與逐格 memory[x, y] = value 相同"""
+        values = np.asarray(values)
+        w, h = values.shape
+        known = self.base[x0:x0 + w, y0:y0 + h].tolist()
+        delta = self.delta
+        row = x0 * self.size + y0
+        for vs, ks in zip(values.tolist(), known):
+            for j, (v, k) in enumerate(zip(vs, ks)):
+                if v != k:
+                    delta[row + j] = v
+                elif delta:
+                    delta.pop(row + j, None)
+            row += self.size
+
+    def changed_cells(self):
+        """回傳差異層的 (平坦索引, 值) 陣列"""
+        if not self.delta:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty.astype(self.base.dtype)
+        idx = np.fromiter(self.delta.keys(), dtype=np.intp, count=len(self.delta))
+        vals = np.fromiter(self.delta.values(), dtype=self.base.dtype,
+                           count=len(self.delta))
+        return idx, vals
+
+    def clear(self):
+        """差異已合併進基底層後呼叫"""
+        self.delta.clear()
+
+    def to_array(self):
+        """展開成完整的記憶陣列（複本）"""
+        arr = self.base.copy()
+        idx, vals = self.changed_cells()
+        arr.flat[idx] = vals
+        return arr
+
+    def __len__(self):
+        return len(self.delta)
@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class TrailBuffer:
+    """
+    固定容量的足跡環形緩衝區，取代無上限成長的 path_history 列表。
+    只保留最近 capacity 步；total 為累計寫入的步數，可用來增量讀取。
+    """
+    __slots__ = ("capacity", "points", "head", "total")
+
+    def __init__(self, capacity=256, start=None):
+        self.capacity = capacity
+        self.points = np.zeros((capacity, 2), dtype=np.int32)
+        self.head = 0  # 下一個寫入位置
+        self.total = 0
+        if start is not None:
+            self.append(start)
+
+    def reset(self, start=None):
+        """清空（緩衝區沿用，不重新配置）"""
+        self.head = 0
+        self.total = 0
+        if start is not None:
+            self.append(start)
+
+    def append(self, pos):
+        self.points[self.head] = pos
+        self.head = (self.head + 1) % self.capacity
+        self.total += 1
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def to_array(self):
+        """由舊到新排列的 (N, 2) 陣列（複本）"""
+        if self.total < self.capacity:
+            return self.points[:self.total].copy()
+        return np.roll(self.points, -self.head, axis=0)
+
+    def since(self, total_seen):
+        """total_seen 之後新寫入的點；已被覆蓋的部分會略過"""
+        new = min(self.total - total_seen, len(self))
+        if new <= 0:
+            return self.points[:0]
+        start = (self.head - new) % self.capacity
+        if start + new <= self.capacity:
+            return self.points[start:start + new]
+        return np.concatenate([self.points[start:], self.points[:self.head]])
+
+    def last(self):
+        return tuple(self.points[(self.head - 1) % self.capacity])
+
+
+class PlannedPath:
+    """
+    規劃好的回巢路徑：int 陣列 + 游標，取下一步是 O(1)，
+    取代每步 list.pop(0)。
+    """
+    __slots__ = ("points", "cursor")
+
+    def __init__(self):
+        self.points = np.zeros((0, 2), dtype=np.int32)
+        self.cursor = 0
+
+    def set(self, points):
+        """points: (L, 2) 陣列，不含起點"""
+        self.points = points
+        self.cursor = 0
+
+    def clear(self):
+        self.cursor = len(self.points)
+
+    def pop_next(self):
+        x, y = self.points[self.cursor]
+        self.cursor += 1
+        return int(x), int(y)
+
+    def remaining(self):
+        """尚未走的部分（view）"""
+        return self.points[self.cursor:]
+
+    def __len__(self):
+        return len(self.points) - self.cursor
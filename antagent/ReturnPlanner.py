@@ -0,0 +1,169 @@
+import heapq
+import numpy as np
+
+
+UNREACHABLE = np.iinfo(np.int32).max
+
+
+class ReturnPlanner:
+    """
+    回巢路徑規劃器，可重複使用：parent / visited / queue 都是預先配置好的，
+    每次規劃只遞增 stamp，不需清空也不重新配置。
+    - mode="bfs"：與 AntAgent 舊版 BFS 相同的展開順序，路徑完全一致。
+    - mode="astar"：A*，啟發值為到巢區外框的 Chebyshev 距離 max(dx, dy)（斜走成本 1），
+      與 BFS 一樣回傳最短步數。
+    記憶值為 1 的格子不可通行（巢格本身除外），終點（巢格）在出列時才判定。
+    plan() 傳入 NestFlowField 時，距離場已覆蓋的格子也算終點，
+    螞蟻只需規劃距離場之外的那一段。
+    """
+
+    def __init__(self, size, nest_coords, mode="bfs"):
+        if mode not in ("bfs", "astar"):
+            raise ValueError(f"未知的規劃模式: {mode}")
+        self.size = size
+        self.mode = mode
+        n = size * size
+
+        self.goal = [False] * n
+        for x, y in nest_coords:
+            self.goal[x * size + y] = True
+        xs = [x for x, _ in nest_coords]
+        ys = [y for _, y in nest_coords]
+        self.goal_box = (min(xs), max(xs), min(ys), max(ys))
+
+        self.parent = [-1] * n
+        self.seen = [0] * n
+        self.queue = [0] * n
+        self.stamp = 0
+        self.expanded = 0  # 上一次規劃展開的節點數
+
+        # 與舊版 BFS 相同的方向順序
+        self.neighbors = [(dx, dy, dx * size + dy) for dx in [-1, 0, 1]
+                          for dy in [-1, 0, 1] if not (dx == 0 and dy == 0)]
+
+    def plan(self, start, memory, field=None):
+        """
+        memory 可為 LayeredMemory 或二維陣列；field 為選用的 NestFlowField。
+        成功時回傳 (L, 2) int32 陣列（不含起點），失敗回傳 None。
+        """
+        if hasattr(memory, "delta"):
+            base, delta = memory.base.ravel(), memory.delta
+        else:
+            base, delta = np.asarray(memory).ravel(), {}
+
+        covered = None if field is None else field.dist
+
+        self.stamp += 1
+        start_idx = start[0] * self.size + start[1]
+        if self.mode == "astar":
+            goal_idx = self._astar(start_idx, base, delta, covered)
+        else:
+            goal_idx = self._bfs(start_idx, base, delta, covered)
+        if goal_idx < 0:
+            return None
+        return self._trace(start_idx, goal_idx)
+
+    def _bfs(self, start_idx, base, delta, covered):
+        size, stamp = self.size, self.stamp
+        goal, parent, seen, queue = self.goal, self.parent, self.seen, self.queue
+        neighbors = self.neighbors
+
+        queue[0] = start_idx
+        seen[start_idx] = stamp
+        head, tail = 0, 1
+        while head < tail:
+            cur = queue[head]
+            head += 1
+            if goal[cur] or (covered is not None and covered[cur] != UNREACHABLE):
+                self.expanded = head
+                return cur
+            x, y = divmod(cur, size)
+            for dx, dy, off in neighbors:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < size and 0 <= ny < size:
+                    n = cur + off
+                    if seen[n] == stamp:
+                        continue
+                    if goal[n] or (delta[n] if n in delta else base[n]) != 1:
+                        seen[n] = stamp
+                        parent[n] = cur
+                        queue[tail] = n
+                        tail += 1
+        self.expanded = head
+        return -1
+
+    def _heuristic(self, x, y):
+        x0, x1, y0, y1 = self.goal_box
+        hx = x0 - x if x < x0 else (x - x1 if x > x1 else 0)
+        hy = y0 - y if y < y0 else (y - y1 if y > y1 else 0)
+        # Chebyshev 距離：直走與斜走成本皆為 1，所以不會高估。
+        # 若斜走成本改成 sqrt(2)，要換成 octile：max + (sqrt(2) - 1) * min
+        return max(hx, hy)
+
+    def _astar(self, start_idx, base, delta, covered):
+        size, stamp = self.size, self.stamp
+        goal, parent, seen = self.goal, self.parent, self.seen
+        cost = self.queue  # 借用 queue 陣列存 g 值
+        neighbors = self.neighbors
+
+        # 距離場的覆蓋範圍也是終點，此時巢區外框的啟發值不再可採納，退化成 h = 0
+        heuristic = self._heuristic if covered is None else (lambda x, y: 0)
+
+        seen[start_idx] = stamp
+        cost[start_idx] = 0
+        heap = [(heuristic(*divmod(start_idx, size)), 0, start_idx)]
+        expanded = 0
+        while heap:
+            _, g, cur = heapq.heappop(heap)
+            if g > cost[cur]:
+                continue
+            expanded += 1
+            if goal[cur] or (covered is not None and covered[cur] != UNREACHABLE):
+                self.expanded = expanded
+                return cur
+            x, y = divmod(cur, size)
+            for dx, dy, off in neighbors:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < size and 0 <= ny < size:
+                    n = cur + off
+                    if seen[n] == stamp and cost[n] <= g + 1:
+                        continue
+                    if not goal[n] and (delta[n] if n in delta else base[n]) == 1:
+                        continue
+                    seen[n] = stamp
+                    cost[n] = g + 1
+                    parent[n] = cur
+                    heapq.heappush(heap, (g + 1 + heuristic(nx, ny), g + 1, n))
+        self.expanded = expanded
+        return -1
+
+    def _trace(self, start_idx, goal_idx):
+        parent = self.parent
+        length = 0
+        cur = goal_idx
+        while cur != start_idx:
+            cur = parent[cur]
+            length += 1
+
+        path = np.empty((length, 2), dtype=np.int32)
+        cur = goal_idx
+        for i in range(length - 1, -1, -1):
+            path[i] = divmod(cur, self.size)
+            cur = parent[cur]
+        return path
+
+
+if __name__ == "__main__":
+    import time
+
+    # 單獨量測規劃器：150x150 空白記憶，從角落走回巢
+    size = 150
+    nest = [(i, j) for i in range(70, 74) for j in range(70, 74)]
+    memory = np.zeros((size, size), dtype=np.int8)
+    for mode in ("bfs", "astar"):
+        planner = ReturnPlanner(size, nest, mode=mode)
+        t = time.perf_counter()
+        for _ in range(20):
+            path = planner.plan((0, 0), memory)
+        dt = (time.perf_counter() - t) / 20
+        print(f"{mode}: {len(path)} 步, 展開 {planner.expanded} 格, {dt * 1000:.2f} ms/次")
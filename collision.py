@@ -0,0 +1,118 @@
+"""
+以佔用格陣列做批次碰撞結算，取代逐隻檢查 agent_positions dict。
+結果只取決於這回合所有螞蟻的「目前位置 / 目標 / 優先序」，與螞蟻在列表裡的順序無關：
+  1. 目標格上有不動的螞蟻 → 擋住
+  2. 兩隻螞蟻互換位置（穿過彼此）→ 兩隻都擋住
+  3. 多隻螞蟻搶同一格 → 優先序（rank 最小）者勝，其餘擋住
+被擋住的螞蟻變成不動的螞蟻，重複以上直到沒有變化；前面的螞蟻成功離開時，
+後面跟著的螞蟻可以補進去。巢內的格子沒有容量限制（螞蟻在巢裡可以重疊）。
+每一輪只處理還在移動的螞蟻，成本與螞蟻數成正比，與地圖大小無關。
+"""
+import numpy as np
+
+from envs.chunked_grid import ChunkedGrid, flat_add_at
+
+
+class OccupancyGrid:
+
+    def __init__(self, size, nest_coords=(), chunk=None, count=1):
+        """
+        chunk: 給定時各層改用 ChunkedGrid，只在螞蟻到過的區塊配置記憶體
+        count: 幾張 size×size 地圖沿 x 方向疊在一起（x 的範圍變成 count * size）
+        """
+        self.size = size
+        n = count * size * size
+        if chunk:
+            self.counts = ChunkedGrid(size, chunk, np.int32).flat
+            self.unlimited = ChunkedGrid(size, chunk, bool, False).flat
+            self._leaving = ChunkedGrid(size, chunk, np.int32).flat
+            self._owner = ChunkedGrid(size, chunk, np.int64, -1).flat
+        else:
+            self.counts = np.zeros(n, dtype=np.int32)  # 每格的螞蟻數
+            self.unlimited = np.zeros(n, dtype=bool)  # 巢：不限容量
+            # 結算用的暫存區，用完會還原，避免每回合配置整張地圖
+            self._leaving = np.zeros(n, dtype=np.int32)
+            self._owner = np.full(n, -1, dtype=np.int64)
+        cells = np.array([x * size + y for x, y in nest_coords], dtype=np.int64)
+        self.unlimited[cells] = True
+
+        self.contested = 0  # 上一回合因搶同一格而被擋的螞蟻數
+        self.swaps = 0  # 上一回合因互換位置而被擋的螞蟻數
+
+    def cells(self, pos):
+        """(N, 2) 座標 → 扁平索引"""
+        pos = np.asarray(pos)
+        return pos[:, 0] * self.size + pos[:, 1]
+
+    def add(self, cells):
+        flat_add_at(self.counts, cells, 1)
+
+    def remove(self, cells):
+        flat_add_at(self.counts, cells, -1)
+
+    def occupied(self, x, y):
+        return self.counts[x * self.size + y] > 0
+
+    def resolve(self, cur, tgt, rank):
+        """
+        cur / tgt: 想移動的螞蟻目前與目標格的扁平索引（已排除出界與撞牆）
+        rank: 每隻的優先序，越小越優先，需互不相同
+        回傳 bool 陣列：哪些螞蟻可以移動。只判斷，不更新 counts（見 apply）。
+        """
+        n = len(cur)
+        ok = np.ones(n, dtype=bool)
+        self.contested = 0
+        self.swaps = 0
+        if n == 0:
+            return ok
+        free_tgt = self.unlimited[tgt]
+        free_cur = self.unlimited[cur]
+        leaving = self._leaving
+        owner = self._owner
+        # (目標, rank) 的順序整個結算都不變，只排序一次，之後每輪依遮罩挑出來就好。
+        # rank 互不相同，換成名次後與目標合成一個整數鍵，一次 argsort 比 lexsort 快好幾倍
+        place = np.empty(n, dtype=np.int64)
+        place[np.argsort(rank)] = np.arange(n)
+        order = np.argsort(np.asarray(tgt, dtype=np.int64) * n + place)
+        contender = np.zeros(n, dtype=bool)
+
+        while True:
+            idx = np.flatnonzero(ok & ~free_tgt)
+            if len(idx) == 0:
+                break
+            movers = np.flatnonzero(ok)
+            t = tgt[idx]
+
+            # 1. 目標格上還有不會離開的螞蟻
+            flat_add_at(leaving, cur[movers], 1)
+            stay = self.counts[t] - leaving[t] > 0
+            leaving[cur[movers]] = 0
+
+            # 2. 互換：目標格上唯一的螞蟻正要走到自己這格
+            solo = movers[~free_cur[movers]]
+            owner[cur[solo]] = solo
+            other = owner[t]
+            owner[cur[solo]] = -1
+            swap = (other >= 0) & (tgt[np.maximum(other, 0)] == cur[idx])
+            swap &= ~stay & ~free_cur[idx]
+
+            # 3. 搶同一格：依 (目標, rank) 排序，每組只留第一隻
+            contender[idx[~(stay | swap)]] = True
+            alive = order[contender[order]]
+            contender[alive] = False
+            first = np.ones(len(alive), dtype=bool)
+            first[1:] = tgt[alive[1:]] != tgt[alive[:-1]]
+            lost = alive[~first]
+
+            blocked = np.concatenate([idx[stay | swap], lost])
+            if len(blocked) == 0:
+                break
+            ok[blocked] = False
+            self.contested += len(lost)
+            self.swaps += int(swap.sum())
+        return ok
+
+    def apply(self, cur, tgt):
+        """移動成功的螞蟻：從 cur 移到 tgt"""
+        self.remove(cur)
+        self.add(tgt)
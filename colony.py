@@ -0,0 +1,40 @@
+"""
+族群的生命週期：蟻后用送回巢的食物產下新的探索蟻，螞蟻活到壽命就死，
+死掉的螞蟻放回 AgentPool，之後出生的螞蟻重用同一個物件。
+
+    sim = AntSimInterface(seed=1, colony=True)
+    sim = AntSimInterface(seed=1, colony=Colony(max_ants=200, spawn_cost=1, lifespan=1500))
+
+每 spawn_cost 份送回的食物在 queen_pos 產下一隻探索蟻（每回合最多一隻，族群滿了食物先存著），
+新的探索蟻排進出發佇列。防守蟻一進巢就結束，所以只產探索蟻。
+每隻螞蟻的壽命在 [lifespan / 2, lifespan * 3 / 2] 之間隨機，死亡時帶著的食物一起消失；
+結束的防守蟻一樣會老死，不會一直留在模擬裡。lifespan=None 時不會死。
+"""
+
+
+class Colony:
+    def __init__(self, max_ants=64, spawn_cost=2, lifespan=2000):
+        """max_ants: 族群上限（AgentPool 預先配置的數量）"""
+        self.max_ants = max_ants
+        self.spawn_cost = spawn_cost
+        self.lifespan = lifespan
+        self.store = 0  # 還沒用來產卵的食物
+        self.born = 0
+        self.died = 0
+
+    def deposit(self, amount=1):
+        self.store += amount
+
+    def ready(self):
+        return self.store >= self.spawn_cost
+
+    def lifetime(self, rng):
+        """一隻螞蟻能活幾個 tick（用模擬的 Generator 抽，快照後結果相同）"""
+        return int(rng.integers(self.lifespan // 2, self.lifespan * 3 // 2 + 1))
+
+    def params(self):
+        return {"max_ants": self.max_ants, "spawn_cost": self.spawn_cost,
+                "lifespan": self.lifespan}
+
+    def counters(self):
+        return [self.store, self.born, self.died]
@@ -0,0 +1,415 @@
+"""
+空間分區的多 process 模擬：地圖沿 x 切成 K 條（對齊費洛蒙的 32×32 區塊），
+每條由一個 worker process 負責位在條內的螞蟻。
+地圖、足跡、佔用格、費洛蒙與螞蟻狀態都放在 multiprocessing.shared_memory，
+相鄰條的邊界（halo）直接讀共享陣列，各階段之間以 barrier 分隔：
+
+  1. 決策：各自對自己的螞蟻做 _decide（讀鄰條邊界的地圖 / 氣味）
+  2. 碰撞：每輪先標記「要離開的格子」，再由目標格所在的 worker 判斷擋住 / 互換 / 搶格，
+     與 OccupancyGrid.resolve 逐輪相同；跨條的移動經由 outbox 批次交給鄰條
+  3. 交接：移動後跨出邊界的螞蟻改由新的條負責，再做撿食物 / 回巢 / 留氣味
+  4. 費洛蒙：各自計算自己的區塊列，全部算完後才寫回
+
+亂數用 streams="counter"（只由 seed、tick、螞蟻編號決定），所以結果與
+VecAntSimInterface(streams="counter") 逐位元相同，與 worker 數無關。
+只支援一般（非分塊）地圖，不發事件。
+
+    sim = DomainSim(size=2000, seed=1, num_agents=100000, workers=8)
+    sim.run(1000)
+    grid, ants = sim.get_state()
+    sim.close()
+
+使用 spawn 啟動方式的平台（Windows / macOS）上，建立 DomainSim 的程式要放在
+if __name__ == "__main__": 之下。
+"""
+import multiprocessing as mp
+import os
+import threading
+import types
+
+import numpy as np
+
+from collision import OccupancyGrid
+from env_interface_vec import VecAntSimInterface, MODE_DONE
+from envs.chunked_grid import flat_add_at
+from event_bus import DISABLED
+from pheromone import PheromoneField
+from shared_arrays import attach, share
+
+
+# 放進共享記憶體的 VecAntSimInterface 陣列（屬性路徑）
+SHARED = [
+    "pos", "mode", "carrying", "steps_taken", "blocked_count", "is_explorer", "scent_age",
+    "scent_blocked", "grid", "visit_count", "dist_home",
+    "occupancy.counts", "occupancy.unlimited", "occupancy._leaving", "occupancy._owner",
+    "pheromone.data", "pheromone.active",
+]
+
+
+def _set_path(obj, path, value):
+    *parents, attr = path.split(".")
+    for p in parents:
+        obj = getattr(obj, p)
+    setattr(obj, attr, value)
+
+
+def _get_path(obj, path):
+    for p in path.split("."):
+        obj = getattr(obj, p)
+    return obj
+
+
+def strip_bounds(size, workers, tile=32):
+    """把 x 方向切成 workers 條、對齊 tile，回傳每條的區塊列範圍 [(tx0, tx1)]"""
+    tiles = -(-size // tile)
+    edges = np.linspace(0, tiles, min(workers, tiles) + 1).round().astype(int).tolist()
+    return list(zip(edges[:-1], edges[1:]))
+
+
+class _DomainWorker(VecAntSimInterface):
+    """一條地圖的 VecAntSimInterface：陣列都是共享記憶體，只處理 owned 裡的螞蟻"""
+
+    def __init__(self, params, views, barrier):
+        self.size = params["size"]
+        self.collision = params["collision"]
+        self.chunk = None
+        self.events = DISABLED
+        self.streams = "counter"
+        self.counter_key = params["counter_key"]
+        self.env = types.SimpleNamespace(nest_pos=params["nest_pos"],
+                                         nest_size=params["nest_size"])
+        self.tick = params["tick"]
+        self.max_steps = params["max_steps"]
+        self.food_delivered = 0
+        self.nest_coords = params["nest_coords"]
+        self.food = None  # 食物區剩餘量由主 process 依地圖重算（見 DomainSim.run）
+        self.departure_queue = params["departure_queue"]
+        self.departure_index = params["departure_index"]
+
+        occupancy = OccupancyGrid.__new__(OccupancyGrid)
+        occupancy.size = self.size
+        occupancy.contested = occupancy.swaps = 0
+        self.occupancy = occupancy
+        self.pheromone = None
+        if params["pheromone"] is not None:
+            self.pheromone = PheromoneField.__new__(PheromoneField)
+            self.pheromone.__dict__.update(params["pheromone"])
+        for path in SHARED:
+            if path in views:
+                _set_path(self, path, views[path])
+
+        # 每隻螞蟻的碰撞 / 交接暫存
+        for name in ("cur", "tgt", "rank", "ok", "acting", "moved", "still", "blocked"):
+            setattr(self, name, views[name])
+        self.outbox = views["outbox"]
+        self.outcount = views["outcount"]
+        self.flags = views["flags"]
+        self.delivered = views["delivered"]
+        self.barrier = barrier
+
+        self.k = params["k"]
+        self.workers = params["workers"]
+        tile = params["tile"]
+        self.rows = params["rows"][self.k]
+        self.domain_of = np.repeat(np.arange(self.workers), [
+            (b - a) * tile for a, b in params["rows"]])[:self.size]
+        self.owned = np.flatnonzero(self.domain_of[self.pos[:, 0]] == self.k)
+
+    def _collide(self, cand, cur, tgt):
+        """
+        與 OccupancyGrid.resolve 逐輪相同的分散版本。
+        每輪：A. 各自標記自己格子上要離開的螞蟻；B. 目標格所在的 worker 判斷擋住 / 互換 / 搶格。
+        ok[i] 只由 i 的目標格所在的 worker 改寫，所以 B 不需要鎖。
+        """
+        k = self.k
+        if self.collision == "random":
+            rank = self._draw(cand, 1, 1)
+        else:
+            rank = np.where(self.carrying[cand], 0, len(self.pos)) + cand
+        self.cur[cand] = cur
+        self.tgt[cand] = tgt
+        self.rank[cand] = rank
+        self.ok[cand] = True
+        dom = self.domain_of[tgt // self.size]
+        for side, nb in ((0, k - 1), (1, k + 1)):
+            out = cand[dom == nb]
+            self.outbox[k, side, :len(out)] = out
+            self.outcount[k, side] = len(out)
+        self.barrier.wait()
+
+        # 目標在自己條內的候選：自己的 + 鄰條送來的
+        inbox = [cand[dom == k]]
+        if k > 0:
+            inbox.append(self.outbox[k - 1, 1, :self.outcount[k - 1, 1]])
+        if k < self.workers - 1:
+            inbox.append(self.outbox[k + 1, 0, :self.outcount[k + 1, 0]])
+        mine = np.concatenate(inbox)
+        unlimited = self.occupancy.unlimited
+        mine = mine[~unlimited[self.tgt[mine]]]
+        leaving = self.occupancy._leaving
+        owner = self.occupancy._owner
+        counts = self.occupancy.counts
+
+        r = 0
+        while True:
+            # A. 自己格子上還在移動的螞蟻
+            leaving[cur] = 0
+            owner[cur] = -1
+            movers = cand[self.ok[cand]]
+            mcur = self.cur[movers]
+            flat_add_at(leaving, mcur, 1)
+            solo = movers[~unlimited[mcur]]
+            owner[self.cur[solo]] = solo
+            self.barrier.wait()
+
+            # B. 目標在自己條內的螞蟻
+            live = mine[self.ok[mine]]
+            t = self.tgt[live]
+            stay = counts[t] - leaving[t] > 0
+            other = owner[t]
+            swap = (other >= 0) & (self.tgt[np.maximum(other, 0)] == self.cur[live])
+            swap &= ~stay & ~unlimited[self.cur[live]]
+            alive = live[~(stay | swap)]
+            alive = alive[np.lexsort((self.rank[alive], self.tgt[alive]))]
+            first = np.ones(len(alive), dtype=bool)
+            first[1:] = self.tgt[alive[1:]] != self.tgt[alive[:-1]]
+            blocked = np.concatenate([live[stay | swap], alive[~first]])
+            self.ok[blocked] = False
+            self.flags[r % 2, k] = len(blocked) > 0
+            self.barrier.wait()
+            if not self.flags[r % 2].any():
+                break
+            r += 1
+
+        leaving[cur] = 0
+        owner[cur] = -1
+        ok = self.ok[cand]
+        # 只移除自己格子上的佔用，目標格由交接後的新 worker 加上
+        self.occupancy.remove(cur[ok])
+        return ok
+
+    def step(self):
+        self.tick += 1
+        owned = self.owned
+        self.acting[owned] = self.mode[owned] != MODE_DONE
+        idx = owned[self.acting[owned]]
+        moves = self._decide(idx)
+        moved, still, blocked = self._move(idx, moves)
+        self.moved[idx] = moved
+        self.still[idx] = still
+        self.blocked[idx] = blocked
+        self.barrier.wait()
+
+        # 交接：依移動後的座標重新分配螞蟻
+        self.owned = owned = np.flatnonzero(self.domain_of[self.pos[:, 0]] == self.k)
+        idx = owned[self.acting[owned]]
+        moved, still, blocked = self.moved[idx], self.still[idx], self.blocked[idx]
+        self.occupancy.add(self.occupancy.cells(self.pos[idx[moved & ~still]]))
+        self._arrive(idx, moved, still, blocked)
+        self.delivered[self.k] = self.food_delivered
+        self.barrier.wait()
+
+        # 出發順序每個 worker 都算一次（讀到的都是同一份狀態，結果相同）
+        computed = None
+        if self.pheromone is not None and self.pheromone.due(self.tick):
+            computed = self.pheromone.compute(self.rows)
+        self._depart()
+        self.barrier.wait()
+        if computed is not None:
+            self.pheromone.commit(computed)
+            self.barrier.wait()
+
+
+def _worker_main(params, spec, barriers):
+    # shms 要留到 process 結束，陣列才一直有效
+    views, shms = attach(spec)
+    start, done, phase = barriers
+    try:
+        worker = _DomainWorker(params, views, phase)
+        ctrl = views["ctrl"]
+        while True:
+            start.wait()
+            if ctrl[0] == 0:
+                break
+            for _ in range(int(ctrl[1])):
+                worker.step()
+            done.wait()
+    except threading.BrokenBarrierError:
+        pass
+    except BaseException:
+        # 讓其他 worker 與主程式的 barrier 立刻失敗，而不是永遠等下去
+        for b in barriers:
+            b.abort()
+        raise
+
+
+class DomainSim:
+    """
+    以多個 process 執行的 VecAntSimInterface（見模組說明）。
+    與 VecAntSimInterface(streams="counter") 相同 seed 的結果完全一樣；
+    get_state()、pos、mode、grid、pheromone 等屬性直接讀共享記憶體。
+    """
+
+    def __init__(self, size=150, seed=None, num_agents=16, workers=None, max_steps=300,
+                 collision="random", pheromone=False, scenario=None, world_cache=None):
+        """
+        workers: process 數（預設 CPU 核心數），超過區塊列數時以區塊列數為準
+        scenario / world_cache: 程序化生成的地圖（見 envs/scenario.py）
+        """
+        sim = VecAntSimInterface(size=size, seed=seed, num_agents=num_agents,
+                                 max_steps=max_steps, collision=collision,
+                                 pheromone=pheromone, streams="counter",
+                                 scenario=scenario, world_cache=world_cache)
+        self.sim = sim
+        tile = sim.pheromone.tile if sim.pheromone is not None else 32
+        rows = strip_bounds(size, workers or os.cpu_count(), tile)
+        self.workers = k = len(rows)
+        n = len(sim.pos)
+
+        self._shms = []
+        spec = {}
+        for path in SHARED:
+            if path.startswith("pheromone.") and sim.pheromone is None:
+                continue
+            _set_path(sim, path, share(_get_path(sim, path), path, self._shms, spec))
+        sim.env.grid = sim.grid
+        scratch = {
+            "cur": np.zeros(n, np.int64), "tgt": np.zeros(n, np.int64),
+            "rank": np.zeros(n, np.float64), "ok": np.zeros(n, bool),
+            "acting": np.zeros(n, bool), "moved": np.zeros(n, bool),
+            "still": np.zeros(n, bool), "blocked": np.zeros(n, bool),
+            "outbox": np.zeros((k, 2, n), np.int64), "outcount": np.zeros((k, 2), np.int64),
+            "flags": np.zeros((2, k), bool), "delivered": np.zeros(k, np.int64),
+            "ctrl": np.zeros(2, np.int64),
+        }
+        for name, arr in scratch.items():
+            scratch[name] = share(arr, name, self._shms, spec)
+        self._delivered = scratch["delivered"]
+        self._ctrl = scratch["ctrl"]
+
+        field = None
+        if sim.pheromone is not None:
+            field = {key: value for key, value in vars(sim.pheromone).items()
+                     if key not in ("data", "active")}
+        ctx = mp.get_context()
+        self._barriers = (ctx.Barrier(k + 1), ctx.Barrier(k + 1), ctx.Barrier(k))
+        self._procs = []
+        for i in range(k):
+            params = {
+                "k": i, "workers": k, "rows": rows, "tile": tile,
+                "size": size, "collision": collision, "max_steps": max_steps,
+                "counter_key": sim.counter_key, "tick": sim.tick,
+                "nest_pos": sim.env.nest_pos, "nest_size": sim.env.nest_size,
+                "nest_coords": sim.nest_coords, "departure_queue": sim.departure_queue,
+                "departure_index": sim.departure_index, "pheromone": field,
+            }
+            p = ctx.Process(target=_worker_main, args=(params, spec, self._barriers),
+                            daemon=True)
+            p.start()
+            self._procs.append(p)
+        self.closed = False
+
+    def __getattr__(self, name):
+        # size / pos / mode / grid / pheromone / get_state ... 都轉給共享記憶體上的 sim
+        if name == "sim":
+            raise AttributeError(name)
+        return getattr(self.sim, name)
+
+    @property
+    def tick(self):
+        return self.sim.tick
+
+    @property
+    def food_delivered(self):
+        return self.sim.food_delivered
+
+    def run(self, ticks):
+        """所有 worker 一起跑 ticks 回合後才返回"""
+        if self.closed:
+            raise RuntimeError("DomainSim 已關閉")
+        if ticks <= 0:
+            return
+        start, done, _ = self._barriers
+        self._ctrl[:] = (1, ticks)
+        try:
+            start.wait()
+            done.wait()
+        except threading.BrokenBarrierError:
+            self.close()
+            raise RuntimeError("worker process 執行失敗") from None
+        self.sim.tick += ticks
+        self.sim.food_delivered = int(self._delivered.sum())
+        self.sim.food.recount(self.sim.grid)
+
+    def step(self):
+        self.run(1)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        start = self._barriers[0]
+        self._ctrl[0] = 0
+        try:
+            start.wait(timeout=10)
+        except threading.BrokenBarrierError:
+            pass
+        for p in self._procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+        self._procs = []
+        self._barriers = None
+        # 關閉前把狀態複製回一般陣列，關閉後仍可讀 get_state()
+        for path in SHARED:
+            if path.startswith("pheromone.") and self.sim.pheromone is None:
+                continue
+            _set_path(self.sim, path, np.array(_get_path(self.sim, path)))
+        self.sim.env.grid = self.sim.grid
+        self._delivered = self._ctrl = None
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._shms = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    # 量測不同 worker 數的吞吐量，並確認結果與單一 process 相同
+    parser = argparse.ArgumentParser(description="DomainSim 擴展性量測")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--agents", type=int, default=50000)
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--pheromone", action="store_true")
+    args = parser.parse_args()
+
+    ref = VecAntSimInterface(size=args.size, seed=0, num_agents=args.agents,
+                             pheromone=args.pheromone, streams="counter")
+    t = time.perf_counter()
+    for _ in range(args.ticks):
+        ref.step()
+    base = args.ticks / (time.perf_counter() - t)
+    print(f"單一 process: {base:.1f} ticks/s")
+    for w in args.workers:
+        with DomainSim(size=args.size, seed=0, num_agents=args.agents, workers=w,
+                       pheromone=args.pheromone) as sim:
+            t = time.perf_counter()
+            sim.run(args.ticks)
+            rate = args.ticks / (time.perf_counter() - t)
+            same = (np.array_equal(sim.pos, ref.pos) and np.array_equal(sim.grid, ref.grid)
+                    and np.array_equal(sim.mode, ref.mode))
+            print(f"{sim.workers} workers: {rate:.1f} ticks/s ({rate / base:.2f}x), "
+                  f"結果{'相同' if same else '不同'}")
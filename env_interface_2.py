@@ -1,34 +1,254 @@
+import bisect
+
 import numpy as np
 from envs.Adam_ants_2 import AntWorldEnv
-from antagent.AntAgent import AntAgent
-import random
+from antagent.AgentPool import AgentPool
+from antagent.AntAgent import DIRECTIONS
+from antagent.ReturnPlanner import ReturnPlanner, UNREACHABLE
+from event_bus import DISABLED
+from collision import OccupancyGrid
+from sim_random import make_seed_sequence, env_seed, direction_keys
+from pheromone import PheromoneField, lay_trails, trail_bias
+from observation import AntLayer, observe_all, state_views
+from profiler import NO_PROFILER
+from schedule import DEPART, TimerWheel, death_item
+from colony import Colony
+
+
+CHUNK_SIZE = 32  # 髒區塊追蹤的區塊邊長
+OFFSETS = np.array(DIRECTIONS, dtype=np.int64)  # 與 AntAgent.decide_move 的 keys 同順序
+
+
+class NestFlowField:
+    """
+    全巢共用的「到巢距離場」，規則與 ReturnPlanner 的 BFS 相同：
+    值為 1 的格子不可通行（巢格除外），未知格視為可走，巢格距離為 0。
+    回巢的螞蟻沿梯度往下走即可，每步 O(1)。
+    記憶基底有格子改變可通行性時以 update() 增量修正，不整張重算。
+    """
+
+    def __init__(self, base, nest_coords):
+        self.base = base
+        self.size = base.shape[0]
+        n = self.size * self.size
+        self.nest = np.zeros(n, dtype=bool)
+        for x, y in nest_coords:
+            self.nest[x * self.size + y] = True
+        self.offsets = np.array([(dx, dy) for dx in [-1, 0, 1]
+                                 for dy in [-1, 0, 1] if not (dx == 0 and dy == 0)],
+                                dtype=np.intp)
+        self.dist = np.full(n, UNREACHABLE, dtype=np.int32)
+        self.rebuild()
+
+    def _passable(self, idx):
+        return (self.base.flat[idx] != 1) | self.nest[idx]
+
+    def _neighbors(self, idx):
+        """回傳 (鄰格, 來源格) 兩個平坦索引陣列，已去掉出界的部分"""
+        x, y = np.divmod(idx, self.size)
+        nx = x[:, None] + self.offsets[:, 0]
+        ny = y[:, None] + self.offsets[:, 1]
+        ok = (nx >= 0) & (nx < self.size) & (ny >= 0) & (ny < self.size)
+        src = np.broadcast_to(idx[:, None], ok.shape)
+        return nx[ok] * self.size + ny[ok], src[ok]
+
+    def _relax(self, frontier):
+        """從 frontier 出發往外傳播更短的距離（單位權重的 label-correcting）"""
+        while len(frontier):
+            nbr, src = self._neighbors(frontier)
+            cand = self.dist[src] + 1
+            ok = self._passable(nbr) & (cand < self.dist[nbr])
+            nbr, cand = nbr[ok], cand[ok]
+            np.minimum.at(self.dist, nbr, cand)
+            frontier = np.unique(nbr)
+
+    def rebuild(self):
+        self.dist[:] = UNREACHABLE
+        sources = np.flatnonzero(self.nest)
+        self.dist[sources] = 0
+        self._relax(sources)
+
+    def update(self, opened, closed):
+        """
+        opened: 變成可通行的格子；closed: 變成不可通行的格子（平坦索引）。
+        closed 會讓沿距離遞增方向依賴它的格子失效，再從失效區的邊界重新傳播。
+        """
+        seeds = []
+        if len(closed):
+            affected = [closed]
+            frontier = closed[self.dist[closed] != UNREACHABLE]
+            stale = np.zeros(self.dist.shape, dtype=bool)
+            stale[closed] = True
+            while len(frontier):
+                nbr, src = self._neighbors(frontier)
+                dep = (self.dist[nbr] == self.dist[src] + 1) & ~stale[nbr]
+                frontier = np.unique(nbr[dep])
+                stale[frontier] = True
+                affected.append(frontier)
+            affected = np.concatenate(affected)
+            self.dist[affected] = UNREACHABLE
+
+            # 失效區內仍可通行的巢格重新當作起點，邊界外的有限距離格也重新傳播
+            reopened = affected[self.nest[affected] & self._passable(affected)]
+            self.dist[reopened] = 0
+            nbr, _ = self._neighbors(affected)
+            border = nbr[~stale[nbr] & (self.dist[nbr] != UNREACHABLE)]
+            seeds += [reopened, np.unique(border)]
+
+        if len(opened):
+            opened = opened[self._passable(opened)]
+            src = opened[self.nest[opened]]
+            self.dist[src] = 0
+            # 新打開的格子先從鄰居取得距離
+            nbr, own = self._neighbors(opened)
+            finite = self.dist[nbr] != UNREACHABLE
+            np.minimum.at(self.dist, own[finite], self.dist[nbr[finite]] + 1)
+            seeds.append(opened[self.dist[opened] != UNREACHABLE])
+
+        if seeds:
+            self._relax(np.unique(np.concatenate(seeds)))
+
+    def distance(self, pos):
+        """從 pos 出發回巢的步數，到不了回傳 None"""
+        idx = pos[0] * self.size + pos[1]
+        if self.nest[idx]:
+            return 0
+        nbr, _ = self._neighbors(np.array([idx]))
+        best = self.dist[nbr].min()
+        return None if best == UNREACHABLE else int(best) + 1
+
+    def next_step(self, pos, memory=None):
+        """
+        沿梯度往下走的方向 (dx, dy)；memory 若提供，跳過螞蟻自己認為不能走的格子。
+        只走距離比腳下嚴格更小的鄰格，否則回傳 None，由呼叫端改用自己的記憶規劃
+        （往旁邊或往上走會在兩格之間來回）。
+        """
+        idx = pos[0] * self.size + pos[1]
+        here = self.dist[idx]
+        nbr, _ = self._neighbors(np.array([idx]))
+        d = self.dist[nbr]
+        for i in np.argsort(d, kind="stable"):
+            if d[i] == UNREACHABLE or d[i] >= here:
+                break
+            nx, ny = divmod(int(nbr[i]), self.size)
+            if memory is None or memory[nx, ny] != 1 or self.nest[nbr[i]]:
+                return (nx - pos[0], ny - pos[1])
+        return None
 
 
 class NestMemory:
-    def __init__(self, size=150):
+    def __init__(self, size=150, nest_coords=None, food=None):
+        """food: 地圖的 FoodZones，巢以食物區編號記住找過的食物"""
         self.size = size
         self.explored = np.zeros((size, size), dtype=np.int8)  # 1: 探索過
-        self.food_locs = set()
+        self.food = food
+        self.food_zones = set()  # 已知的食物區編號
+        # 全巢共享的記憶基底，螞蟻的 LayeredMemory 讀不到差異時落到這裡
+        self.base = np.zeros((size, size), dtype=np.int8)
+        self.flow_field = None
+        if nest_coords is not None:
+            self.flow_field = NestFlowField(self.base, nest_coords)
+
+        # 合併統計
+        self.sync_count = 0  # update_from_agent 被呼叫的次數
+        self.empty_syncs = 0  # 沒有新資訊、直接跳過的次數
+        self.merged_cells = 0  # 累計真正寫入基底的格數
+        self.last_merged = 0  # 上一次合併寫入的格數
+        # 自上次 pop_dirty_chunks() 以來基底有變動的區塊 id
+        self.chunks_per_row = -(-size // CHUNK_SIZE)
+        self.dirty_chunks = set()
 
     def update_from_agent(self, agent):
-        mem = agent.memory
-        self.explored |= (mem > 0).astype(np.int8)
-        self.food_locs |= set([tuple(p) for p in np.argwhere(mem == 2)])
+        """
+        只合併螞蟻差異層裡改過的格子，合併後清空差異層。
+        成本與新資訊量成正比，與地圖大小無關。
+        """
+        self.sync_count += 1
+        self.last_merged = 0
+        self.food_zones |= agent.food_zones
+        if not len(agent.memory):
+            self.empty_syncs += 1
+            return
+
+        idx, vals = agent.memory.changed_cells()
+        agent.memory.clear()
+        # 其他螞蟻可能已先合併了同樣的值
+        new = self.base.flat[idx] != vals
+        idx, vals = idx[new], vals[new]
+        if len(idx) == 0:
+            self.empty_syncs += 1
+            return
+        self.last_merged = len(idx)
+        self.merged_cells += len(idx)
+        x, y = np.divmod(idx, self.size)
+        chunks = (x // CHUNK_SIZE) * self.chunks_per_row + y // CHUNK_SIZE
+        self.dirty_chunks.update(np.unique(chunks).tolist())
+
+        was_blocked = self.base.flat[idx] == 1
+        self.base.flat[idx] = vals
+        if self.flow_field is not None:
+            # 巢格一律可以進入，看到巢不算可通行性改變
+            now_blocked = vals == 1
+            other = ~self.flow_field.nest[idx]
+            self.flow_field.update(idx[was_blocked & ~now_blocked & other],
+                                   idx[now_blocked & ~was_blocked & other])
+        self.explored.flat[idx[vals > 0]] = 1
+        if self.food is not None:
+            zones = self.food.labels.flat[idx[vals == 2]]
+            self.food_zones.update(zones[zones >= 0].tolist())
+
+    def pop_dirty_chunks(self):
+        """取出並清空有變動的區塊 id，區塊 (cx, cy) = divmod(id, chunks_per_row)"""
+        chunks, self.dirty_chunks = self.dirty_chunks, set()
+        return chunks
 
     def get_known_food(self):
-        return list(self.food_locs)
+        """已知且還有食物的食物區編號；沒有 food（FoodZones）時查不到剩量，回傳空列表"""
+        if self.food is None:
+            return []
+        return [z for z in sorted(self.food_zones) if self.food.remaining[z] > 0]
+
+    def nearest_known_food(self, pos):
+        """離 pos 最近、已知且還有食物的食物區編號，沒有時（或沒有 food）-1"""
+        if self.food is None:
+            return -1
+        return self.food.nearest(pos, self.food_zones)
 
     def is_explored(self, x, y):
         return self.explored[x][y] == 1
 
 
 class AntSimInterface:
-    def __init__(self, size=150, seed=None):
+    def __init__(self, size=150, seed=None, events=None, collision="random", pheromone=False,
+                 view_radius=1, profiler=None, scenario=None, world_cache=None, staggered=False,
+                 colony=None):
+        """
+        seed 可為 None / int / numpy SeedSequence（見 sim_random.spawn_seeds）
+        collision: 多隻搶同一格時誰贏，"random"（每回合抽籤）或 "priority"（帶食物的優先，再依 id）
+        pheromone: True（或自訂的 PheromoneField）時螞蟻沿路留下氣味，
+                   探索時往 "food" 較濃處走，帶著食物卻規劃不到路時往 "nest" 較濃處走
+        view_radius: 螞蟻每回合看得到自己周圍幾格（1 為 3×3）
+        profiler: profiler.StepProfiler，記錄 step() 各階段的耗時
+        scenario / world_cache: 程序化生成的地圖參數與磁碟快取（見 envs/scenario.py、AntWorldEnv）
+        staggered: True 時探索蟻真的在巢內等到自己的出發時段（每 5 tick 一隻）才開始行動，
+                   回巢後重新出發前也先停一回合；等待中的螞蟻不觀測、不決策、不結算。
+                   預設 False 與以前相同：just_reset 在同一回合就清除，出發佇列只決定 departed 事件
+        colony: True（或自訂的 Colony）時蟻后用送回的食物產下新的探索蟻、螞蟻活到壽命就死（見 colony.py）；
+                預設 None 與以前相同，固定 16 隻
+        """
+        if collision not in ("random", "priority"):
+            raise ValueError(f"未知的 collision: {collision}")
         self.size = size
-        self.env = AntWorldEnv(size=size, seed=seed)
+        self.collision = collision
+        self.view_radius = view_radius
+        self.events = events if events is not None else DISABLED  # 見 event_bus.EventBus
+        self.profiler = profiler if profiler is not None else NO_PROFILER
+        self.seed_seq = make_seed_sequence(seed)
+        self.rng = np.random.default_rng(self.seed_seq)
+        self.env = AntWorldEnv(size=size, seed=env_seed(seed, self.seed_seq),
+                               scenario=scenario, cache=world_cache)
         self.grid = self.env.get_grid()
         self.agents = []
-        self.agent_positions = {}
         self.tick = 0
         self.departure_queue = []  # 裝螞蟻 id
         self.departure_index = 0  # 每輪最多讓一隻出巢
@@ -36,10 +256,43 @@ class AntSimInterface:
         self.nest_coords = self._get_nest_coords()
         self.queen_pos = self._place_queen()
         self.food_delivered = 0
-        self.nest_memory = NestMemory(size)
-
+        self.food = self.env.food  # 食物區索引，撿食物時更新（見 envs/food_zones.py）
+        self.nest_memory = NestMemory(size, self.nest_coords, self.food)
+        self.occupancy = OccupancyGrid(size, self.nest_coords)  # 每格的螞蟻數
+        self.planner = ReturnPlanner(size, self.nest_coords)  # 所有螞蟻共用
+        # 全巢共用的足跡層：每格被走過的次數
+        self.visit_count = np.zeros((size, size), dtype=np.int32)
+        self.ant_layer = AntLayer(size)  # get_state() 的螞蟻層，呼叫時才更新
+
+        # 螞蟻都從預先配置的池裡取（id 即池中的位置），沒有 colony 時池的大小就是初始的 16 隻
+        if colony is True:
+            colony = Colony()
+        self.colony = colony or None
+        self.pool = self._make_pool(self.colony.max_ants if self.colony is not None else 16)
         self._init_agents()
         self.departure_queue = [a.id for a in self.agents if a.is_explorer]
+        # 等待中 / 已結束的螞蟻 id，以及出發時段與醒來時間的計時輪（見 schedule.py）
+        self.staggered = staggered
+        self.waiting = set()
+        self.retired = set()
+        if staggered:
+            for i in self.departure_queue:
+                self.agents[i].just_reset = True
+                self.waiting.add(i)
+        self.wheel = TimerWheel()
+        self.next_departure = None  # 已排進計時輪的出發時段
+        self._schedule_departure()
+        if self.colony is not None and self.colony.lifespan:
+            for a in self.agents:
+                self.wheel.schedule(self.colony.lifetime(self.rng), death_item(a.id),
+                                    self.pool.generation[a.id])
+        self._alive = self._acting = None  # 見 _members()
+        if pheromone is True:
+            pheromone = PheromoneField(size)
+        self.pheromone = pheromone or None
+        # 依 id 索引，大小與池相同
+        self.scent_age = np.zeros(self.pool.capacity, dtype=np.int32)  # 離開氣味來源後的步數
+        self.scent_blocked = np.zeros(self.pool.capacity, dtype=bool)  # 上回合被擋住
 
     def _get_nest_coords(self):
         coords = []
@@ -53,23 +306,26 @@ class AntSimInterface:
         nx, ny = self.env.nest_pos
         return (nx + self.env.nest_size // 2, ny + self.env.nest_size // 2)
 
+    def _make_pool(self, capacity):
+        return AgentPool(capacity, memory_base=self.nest_memory.base, planner=self.planner,
+                         flow_field=self.nest_memory.flow_field, events=self.events,
+                         rng=self.rng, view_radius=self.view_radius)
+
     def _init_agents(self, total=16):
+        total = min(total, self.pool.capacity)
         explorer_target = total // 2
         explorer_count = 0
 
-        nest_spots = list(self._get_nest_coords())
-        random.shuffle(nest_spots)
+        nest_spots = self._get_nest_coords()
+        nest_spots = [nest_spots[i] for i in self.rng.permutation(len(nest_spots))]
 
         for pos in nest_spots:
-            if pos not in self.agent_positions:
+            if not self.occupancy.occupied(*pos):
                 is_explorer = explorer_count < explorer_target
-                agent = AntAgent(
-                    agent_id=len(self.agents),
-                    pos=list(pos),
-                    is_explorer=is_explorer
-                )
+                agent = self.pool.acquire(list(pos), is_explorer, self.tick)
                 self.agents.append(agent)
-                self.agent_positions[pos] = agent.id
+                self.occupancy.add(pos[0] * self.size + pos[1])
+                self.visit_count[pos] += 1
                 if is_explorer:
                     explorer_count += 1
                 if len(self.agents) >= total:
@@ -81,54 +337,90 @@ class AntSimInterface:
 
     def step(self):
         self.tick += 1
-        self.agent_positions = {}
-
-        # 第一步：決定所有 agent 要去哪
-        proposed_moves = {}
-        for agent in self.agents:
-            if agent.mode == "done":
+        events = self.events
+        events.tick = self.tick
+        prof = self.profiler
+        profiling = prof.enabled
+        if profiling:
+            prof.begin_tick(self.tick)
+            prof.phase("observe")
+
+        # 計時輪上這回合到期的事件：等待中的螞蟻醒來、壽命到的螞蟻死亡（出發時段留到回合最後）
+        depart = False
+        for item, gen in self.wheel.pop(self.tick):
+            if item == DEPART:
+                depart = True
                 continue
-
-            agent.observe(self.grid)
-
+            i = item if item > DEPART else DEPART - 1 - item
+            if self.pool.generation[i] != gen:
+                continue  # 排程後這個 id 已經死過，現在是之後才出生的螞蟻
+            if item > DEPART:
+                self.waiting.discard(i)
+                self.pool[i].just_reset = False
+                self._acting = None
+            else:
+                self._die(self.pool[i])
+        active = self._members()[1]
+
+        # 觀測只讀地圖、只寫自己的記憶，所有螞蟻整批做完再逐隻決策，結果與逐隻 observe 相同
+        observe_all(active, self.grid, self.view_radius)
+
+        # 第一步：決定所有 agent 要去哪（本回合的亂數一次抽完，每隻螞蟻的亂數不因別隻結束而改變）
+        if profiling:
+            prof.phase("decide")
+        keys = direction_keys(self.rng, self.pool.extent)
+        ids = [a.id for a in active]
+        keys = keys[ids]
+        if self.pheromone is not None:
+            keys -= self._scent_bias(active)
+        proposed_moves = {}
+        for agent, agent_keys in zip(active, keys.tolist()):
             if agent.should_return() and agent.mode == "explore":
-                success = agent.plan_return_path(self.nest_coords)
+                success = self._plan(agent)
                 if not success:
                     agent.reset_steps()
-                    print(f"[{agent.id}] 無法規劃回巢路，繼續探索！")
+                    if events.replan_failed:
+                        events.emit("replan_failed", agent.id, *agent.pos)
 
             if agent.mode == "return" and not agent.return_path:
-                agent.plan_return_path(self.nest_coords)
+                self._plan(agent)
 
-            if hasattr(agent, 'just_reset') and agent.just_reset:
+            # 有費洛蒙時，被擋住而退回 explore 的帶食螞蟻每回合重試回巢，失敗才沿 "nest" 氣味走
+            if self.pheromone is not None and agent.mode == "explore" and agent.carrying_food:
+                self._plan(agent)
+
+            if agent.just_reset:
                 proposed_moves[agent.id] = (0, 0)
             else:
-                dx, dy = agent.decide_move()
+                dx, dy = agent.decide_move(agent_keys)
                 proposed_moves[agent.id] = (dx, dy)
 
-        # 第二步：根據 agent_positions 判斷誰可以移動
-        new_positions = {}
-        for agent in self.agents:
-            if agent.mode == "done":
-                continue
-
+        # 第二步：所有移動一起結算碰撞（結果與螞蟻順序無關，見 collision.py）
+        if profiling:
+            prof.phase("resolve")
+        carrying_before = [a.carrying_food for a in active]
+        allowed = self._resolve_collisions(active, proposed_moves)
+        if profiling:
+            prof.phase("move")
+        for agent, can_move in zip(active, allowed):
             dx, dy = proposed_moves.get(agent.id, (0, 0))
             new_x = agent.pos[0] + dx
             new_y = agent.pos[1] + dy
 
             if 0 <= new_x < self.size and 0 <= new_y < self.size:
-                if self.grid[new_x][new_y] != 1 and (new_x, new_y) not in self.agent_positions:
+                if can_move:
                     agent.pos = [new_x, new_y]
                     agent.steps_taken += 1
                     agent.path_history.append((new_x, new_y))
-                    new_positions[(new_x, new_y)] = agent.id
+                    self.visit_count[new_x, new_y] += 1
                 else:
                     agent.blocked_count += 1
-                    print(
-                        f"[{agent.id}] 移動到 ({new_x},{new_y}) 被擋住（連續 {agent.blocked_count} 次）")
+                    if events.blocked:
+                        events.emit("blocked", agent.id, new_x, new_y, agent.blocked_count)
                     if agent.blocked_count >= 3:
-                        print(f"[{agent.id}] 被卡 {agent.blocked_count} 次，強制切回探索")
-                        agent.return_path = []
+                        if events.stuck:
+                            events.emit("stuck", agent.id, new_x, new_y, agent.blocked_count)
+                        agent.return_path.clear()
                         agent.mode = "explore"
                         agent.reset_steps()
             else:
@@ -136,53 +428,257 @@ class AntSimInterface:
 
             x, y = agent.pos
             if self.grid[x][y] == 2 and not agent.carrying_food:
+                if profiling:
+                    start = prof.now()
                 agent.carrying_food = True
                 self.grid[x][y] = 0
-                agent.mark_food_region((x, y), self.grid)
-                agent.plan_return_path(self.nest_coords)
+                agent.remember_food_zone(self.food.take(x, y))
+                if events.food_picked:
+                    events.emit("food_picked", agent.id, x, y)
+                self._plan(agent)
+                if profiling:
+                    prof.span("pickup", start)
 
             if tuple(agent.pos) in self.nest_coords:
                 if agent.carrying_food:
                     agent.carrying_food = False
                     self.food_delivered += 1
+                    if self.colony is not None:
+                        self.colony.deposit()
+                    if events.food_delivered:
+                        events.emit("food_delivered", agent.id, x, y, self.food_delivered)
+                if profiling:
+                    start = prof.now()
                 self.nest_memory.update_from_agent(agent)
+                if profiling:
+                    prof.span("merge", start)
 
                 if agent.is_explorer and agent.mode == "return":
                     agent.mode = "explore"
                     agent.reset_steps()
-                    agent.return_path = []
+                    agent.return_path.clear()
                     agent.just_reset = True
-                    print(f"[{agent.id}] 回巢後重啟探索，從 {agent.pos} 出發")
+                    if self.staggered:
+                        # 下一回合停在巢內，再下一回合醒來
+                        self.waiting.add(agent.id)
+                        self.wheel.schedule(self.tick + 2, agent.id,
+                                            self.pool.generation[agent.id])
+                        self._acting = None
+                    if events.restarted:
+                        events.emit("restarted", agent.id, x, y)
                 elif not agent.is_explorer:
                     agent.mode = "done"
+                    self.retired.add(agent.id)
+                    self._alive = self._acting = None
 
-            # 清除 just_reset 標記讓下回合能動
-            if hasattr(agent, 'just_reset') and agent.just_reset:
+            # 清除 just_reset 標記讓下回合能動（staggered 時改由計時輪叫醒）
+            if agent.just_reset and not self.staggered:
                 agent.just_reset = False
 
+        if self.pheromone is not None:
+            if profiling:
+                prof.phase("pheromone")
+            moved = [ok and proposed_moves.get(a.id, (0, 0)) != (0, 0)
+                     for a, ok in zip(active, allowed)]
+            self._lay_scent(active, moved, allowed, carrying_before)
+
         # 控制探索蟻出發順序（每 5 tick 一隻）
-        if hasattr(self, 'departure_queue') and hasattr(self, 'departure_index'):
-            if self.tick % 5 == 0 and self.departure_index < len(self.departure_queue):
-                i = self.departure_queue[self.departure_index]
-                a = self.agents[i]
-                if a.mode == "explore" and tuple(a.pos) in self.nest_coords:
-                    print(f"[排程] 探索蟻 {i} 被允許出巢")
-                    a.just_reset = False
-                    self.departure_index += 1
-
-        self.agent_positions = new_positions
-
-    def get_state(self):
-        grid_copy = self.grid.copy()
-        ant_layer = np.zeros_like(grid_copy)
-
-        for agent in self.agents:
-            if agent.mode == "done":
+        if profiling:
+            prof.phase("depart")
+        if depart:
+            self.next_departure = None
+            self._depart()
+        if self.colony is not None and self.colony.ready():
+            self._spawn()
+        if profiling:
+            prof.end_tick()
+
+    def _members(self):
+        """
+        (還沒結束的螞蟻, 其中這回合要行動的)，依 id 排序。
+        只在有螞蟻結束、開始等待或醒來後才重建，平常每回合不必掃過所有螞蟻。
+        """
+        if self._acting is None:
+            if self._alive is None:
+                self._alive = [a for a in self.agents if a.id not in self.retired]
+            self._acting = [a for a in self._alive if a.id not in self.waiting]
+        return self._alive, self._acting
+
+    def _schedule_departure(self):
+        """下一個出發時段（tick 為 5 的倍數）排進計時輪；已經排了或佇列都出發了就不再排"""
+        if self.next_departure is None and self.departure_index < len(self.departure_queue):
+            self.next_departure = (self.tick // 5 + 1) * 5
+            self.wheel.schedule(self.next_departure, DEPART)
+
+    def _depart(self):
+        """出發時段：佇列最前面的探索蟻在巢內就出發，不在的話下個時段再試"""
+        if self.departure_index >= len(self.departure_queue):
+            return  # 還沒出發的都死了
+        i = self.departure_queue[self.departure_index]
+        a = self.pool[i]
+        if a.mode == "explore" and tuple(a.pos) in self.nest_coords:
+            if self.events.departed:
+                self.events.emit("departed", i, *a.pos)
+            a.just_reset = False
+            self.departure_index += 1
+            if self.departure_index >= 256:
+                # 丟掉已出發的部分，蟻后一直產卵時佇列也不會無限變長
+                del self.departure_queue[:self.departure_index]
+                self.departure_index = 0
+            if i in self.waiting:
+                self.waiting.discard(i)
+                self._acting = None
+        self._schedule_departure()
+
+    def _spawn(self):
+        """蟻后用存下的食物在 queen_pos 產下一隻探索蟻，排進出發佇列；族群滿了食物就先存著"""
+        colony = self.colony
+        x, y = self.queen_pos
+        agent = self.pool.acquire([x, y], True, self.tick)
+        if agent is None:
+            return
+        colony.store -= colony.spawn_cost
+        colony.born += 1
+        i = agent.id
+        bisect.insort(self.agents, agent, key=lambda a: a.id)
+        self.occupancy.add(x * self.size + y)
+        self.visit_count[x, y] += 1
+        self.scent_age[i] = 0
+        self.scent_blocked[i] = False
+        if colony.lifespan:
+            self.wheel.schedule(self.tick + colony.lifetime(self.rng), death_item(i),
+                                self.pool.generation[i])
+        self.departure_queue.append(i)
+        if self.staggered:
+            agent.just_reset = True
+            self.waiting.add(i)
+        self._schedule_departure()
+        self._alive = self._acting = None
+        if self.events.spawned:
+            self.events.emit("spawned", i, x, y, len(self.agents))
+
+    def _die(self, agent):
+        """壽命到了：離開模擬（帶著的食物一起消失），物件放回池中"""
+        i = agent.id
+        x, y = agent.pos
+        self.occupancy.remove(x * self.size + y)
+        self.agents.remove(agent)
+        self.retired.discard(i)
+        self.waiting.discard(i)
+        # 還沒出發就死了：從佇列拿掉，不要卡住後面的螞蟻
+        queue = self.departure_queue
+        if i in queue[self.departure_index:]:
+            del queue[queue.index(i, self.departure_index)]
+        self.pool.release(agent)
+        self.colony.died += 1
+        self._alive = self._acting = None
+        if self.events.died:
+            self.events.emit("died", i, x, y, self.tick - agent.born)
+
+    def _plan(self, agent):
+        """agent.plan_return_path，開啟 profiler 時記錄每次規劃的耗時"""
+        prof = self.profiler
+        if not prof.enabled:
+            return agent.plan_return_path(self.nest_coords)
+        start = prof.now()
+        success = agent.plan_return_path(self.nest_coords)
+        prof.span("plan", start)
+        return success
+
+    def _ant_arrays(self, agents):
+        pos = np.array([a.pos for a in agents], dtype=np.int64).reshape(-1, 2)
+        carrying = np.array([a.carrying_food for a in agents], dtype=bool)
+        return pos, carrying
+
+    def _scent_bias(self, agents):
+        """agents 每隻 8 個方向的氣味偏好（見 pheromone.trail_bias），return 模式的螞蟻用不到"""
+        pos, carrying = self._ant_arrays(agents)
+        ids = [a.id for a in agents]
+        nest = self.nest_memory.flow_field.nest.reshape(self.grid.shape)
+        return trail_bias(self.pheromone, pos, carrying, OFFSETS, self.grid,
+                          ~self.scent_blocked[ids], nest)
+
+    def _lay_scent(self, active, moved, allowed, carrying_before):
+        """
+        撿到食物或回到巢的螞蟻從頭算起；這回合有移動的螞蟻照步數留下越來越淡的氣味
+        （站著不動不留，否則被擋住的螞蟻會堆出一個把其他螞蟻吸過去的熱點）
+        """
+        if active:
+            pos, carrying = self._ant_arrays(active)
+            ids = np.array([a.id for a in active])
+            reset = carrying & ~np.array(carrying_before, dtype=bool)
+            reset |= self.occupancy.unlimited[self.occupancy.cells(pos)]  # 在巢內
+            self.scent_age[ids[reset]] = 0
+            self.scent_blocked[:] = False
+            self.scent_blocked[ids] = ~np.array(allowed, dtype=bool)
+            moved = np.array(moved, dtype=bool)
+            lay_trails(self.pheromone, pos[moved], carrying[moved], self.scent_age[ids[moved]])
+            self.scent_age[ids[moved]] += 1
+        self.pheromone.update(self.tick)
+
+    def _passable(self, x, y):
+        """值為 1 的格子不能走，但巢格本身可以進入（回巢交付食物）"""
+        return self.grid[x][y] != 1 or (x, y) in self.nest_coords
+
+    def _resolve_collisions(self, active, proposed_moves):
+        """回傳與 active 對齊的 bool 列表：這回合能不能走到目標格（原地不動一律可以）"""
+        size = self.size
+        allowed = [True] * len(active)
+        cand = []
+        cur = []
+        tgt = []
+        for k, agent in enumerate(active):
+            dx, dy = proposed_moves.get(agent.id, (0, 0))
+            if dx == 0 and dy == 0:
                 continue
             x, y = agent.pos
-            ant_layer[x][y] = 3 if agent.carrying_food else 4
-
-        return grid_copy, ant_layer
+            new_x, new_y = x + dx, y + dy
+            if not (0 <= new_x < size and 0 <= new_y < size) or not self._passable(new_x, new_y):
+                allowed[k] = False
+                continue
+            cand.append(k)
+            cur.append(x * size + y)
+            tgt.append(new_x * size + new_y)
+        if not cand:
+            return allowed
+
+        cur = np.array(cur, dtype=np.int64)
+        tgt = np.array(tgt, dtype=np.int64)
+        if self.collision == "random":
+            rank = self.rng.random(len(cand))
+        else:
+            rank = np.array([(0 if active[k].carrying_food else self.pool.capacity) + active[k].id
+                             for k in cand])
+        ok = self.occupancy.resolve(cur, tgt, rank)
+        self.occupancy.apply(cur[ok], tgt[ok])
+        for k, moved in zip(cand, ok.tolist()):
+            allowed[k] = moved
+        return allowed
+
+    def get_state(self, region=None, out=None):
+        """
+        region: (x0, y0, w, h) 只取一個視窗（世界座標）
+        回傳 (地圖, 螞蟻層) 的唯讀 view，下一次 step() 後內容會變；
+        out=(grid_buf, ant_buf) 時改寫進呼叫端的緩衝區（見 observation.state_views）
+        """
+        pos, carrying = self._ant_arrays(self._members()[0])
+        self.ant_layer.update(pos[:, 0] * self.size + pos[:, 1], carrying)
+        return state_views(self.grid, self.ant_layer.layer, region, out)
 
     def is_done(self):
         return self.food_delivered >= 100
+
+    # 快照（實作見 snapshot.py）
+    def save_snapshot(self, path):
+        from snapshot import save_snapshot
+        save_snapshot(self, path)
+
+    @classmethod
+    def load_snapshot(cls, path, events=None):
+        from snapshot import load_snapshot
+        return load_snapshot(path, events)
+
+    def fork(self, events=None):
+        """複製出獨立的模擬，用來從同一個狀態分支出多個 what-if"""
+        from snapshot import fork
+        return fork(self, events)
@@ -0,0 +1,393 @@
+import numpy as np
+from envs.Adam_ants_2 import AntWorldEnv
+from antagent.ReturnPlanner import UNREACHABLE
+from env_interface_2 import NestFlowField
+from event_bus import DISABLED
+from collision import OccupancyGrid
+from envs.chunked_grid import ChunkedGrid, add_at
+from sim_random import make_seed_sequence, env_seed, direction_keys, counter_key, counter_random
+from pheromone import PheromoneField, lay_trails, trail_bias
+from observation import AntLayer, state_views
+from profiler import NO_PROFILER
+
+
+# 八個移動方向，順序與 AntAgent 的 BFS 展開順序相同
+DIRECTIONS = np.array([(dx, dy) for dx in [-1, 0, 1]
+                       for dy in [-1, 0, 1] if not (dx == 0 and dy == 0)],
+                      dtype=np.int32)
+
+MODE_EXPLORE = 0
+MODE_RETURN = 1
+MODE_DONE = 2
+
+
+class VecAntSimInterface:
+    """
+    Struct-of-arrays 版本的 AntSimInterface。
+    所有螞蟻狀態都放在 NumPy 陣列裡，決策與結算兩階段以批次運算完成，
+    規則與 env_interface_2.AntSimInterface 相同（先決定、後結算）。
+    螞蟻在此引擎中以真實地圖代替個人記憶做回巢規劃。
+    """
+
+    def __init__(self, size=150, seed=None, num_agents=16, max_steps=300, events=None,
+                 collision="random", chunk=None, pheromone=False, streams="sequential",
+                 profiler=None, scenario=None, world_cache=None):
+        """
+        collision: 搶同一格時誰贏，"random" 或 "priority"（同 AntSimInterface）
+        chunk: 給定時地圖、足跡與佔用格都改用 ChunkedGrid，只配置有東西的區塊，
+               可跑 20000×20000 的稀疏地圖；回巢改用到巢的切比雪夫距離（地圖上除了巢沒有障礙）
+        pheromone: True 或 PheromoneField 時螞蟻會留下 / 追蹤氣味（同 AntSimInterface）
+        streams: "sequential"（預設，依序從 self.rng 抽）或 "counter"（見 _draw），
+                 兩者都可重播，但同一個 seed 的結果不同
+        profiler: profiler.StepProfiler，記錄 step() 各階段的耗時（同 AntSimInterface）
+        scenario / world_cache: 程序化生成的地圖參數與磁碟快取（見 envs/scenario.py）；
+                 分塊地圖只能用沒有牆的 "open"
+        """
+        if collision not in ("random", "priority"):
+            raise ValueError(f"未知的 collision: {collision}")
+        if streams not in ("sequential", "counter"):
+            raise ValueError(f"未知的 streams: {streams}")
+        if chunk and pheromone:
+            raise ValueError("分塊地圖不支援費洛蒙場")
+        if chunk and scenario and scenario.get("terrain", "open") != "open":
+            raise ValueError("分塊地圖不支援牆（回巢用的是沒有障礙時的切比雪夫距離）")
+        self.size = size
+        self.collision = collision
+        self.chunk = chunk
+        self.events = events if events is not None else DISABLED  # 見 event_bus.EventBus
+        self.profiler = profiler if profiler is not None else NO_PROFILER
+        self.seed_seq = make_seed_sequence(seed)
+        self.rng = np.random.default_rng(self.seed_seq)
+        self.streams = streams
+        self.counter_key = counter_key(self.seed_seq)
+        self.env = AntWorldEnv(size=size, seed=env_seed(seed, self.seed_seq), chunk=chunk,
+                               scenario=scenario, cache=world_cache)
+        self.grid = self.env.get_grid()
+        self.food = self.env.food  # 食物區索引，撿食物時更新（見 envs/food_zones.py）
+        self.tick = 0
+        self.max_steps = max_steps
+        self.food_delivered = 0
+
+        self.nest_coords = self._get_nest_coords()
+        self.queen_pos = self._place_queen()
+
+        self.occupancy = OccupancyGrid(size, self.nest_coords, chunk)  # 每格的螞蟻數
+        # 全巢共用的足跡層：每格被走過的次數
+        if chunk:
+            self.visit_count = ChunkedGrid(size, chunk, np.int32)
+            self.dist_home = None
+        else:
+            self.visit_count = np.zeros((size, size), dtype=np.int32)
+            self.dist_home = self._distance_to_nest()
+        self.ant_layer = AntLayer(size, chunk)  # get_state() 的螞蟻層，呼叫時才更新
+
+        self._init_agents(num_agents)
+        if pheromone is True:
+            pheromone = PheromoneField(size)
+        self.pheromone = pheromone or None
+        self.scent_age = np.zeros(len(self.pos), dtype=np.int32)  # 離開氣味來源後的步數
+        self.scent_blocked = np.zeros(len(self.pos), dtype=bool)  # 上回合被擋住
+        self.departure_queue = np.flatnonzero(self.is_explorer)
+        self.departure_index = 0
+
+    def _get_nest_coords(self):
+        nx, ny = self.env.nest_pos
+        return [(i, j) for i in range(nx, nx + self.env.nest_size)
+                for j in range(ny, ny + self.env.nest_size)]
+
+    def _place_queen(self):
+        nx, ny = self.env.nest_pos
+        return (nx + self.env.nest_size // 2, ny + self.env.nest_size // 2)
+
+    def _init_agents(self, total):
+        spots = np.array(self.nest_coords, dtype=np.int32)
+        self.rng.shuffle(spots)
+        # 螞蟻數超過巢格時依序疊放
+        self.pos = spots[np.arange(total) % len(spots)].copy()
+        self.mode = np.full(total, MODE_EXPLORE, dtype=np.int8)
+        self.carrying = np.zeros(total, dtype=bool)
+        self.steps_taken = np.zeros(total, dtype=np.int32)
+        self.blocked_count = np.zeros(total, dtype=np.int32)
+        self.is_explorer = np.arange(total) < total // 2
+        add_at(self.visit_count, self.pos[:, 0], self.pos[:, 1], 1)
+        self.occupancy.add(self.occupancy.cells(self.pos))
+
+    def _in_nest(self, x, y):
+        nx, ny = self.env.nest_pos
+        n = self.env.nest_size
+        return (x >= nx) & (x < nx + n) & (y >= ny) & (y < ny + n)
+
+    def _home_distance(self, x, y):
+        """
+        到巢的距離（巢內為 0）。分塊地圖上不存整張距離場：
+        地圖上除了巢沒有障礙，距離就是到巢區外框的切比雪夫距離。
+        """
+        if self.dist_home is not None:
+            return self.dist_home[x, y]
+        nx, ny = self.env.nest_pos
+        n = self.env.nest_size
+        x = np.asarray(x)
+        y = np.asarray(y)
+        hx = np.maximum(np.maximum(nx - x, x - (nx + n - 1)), 0)
+        hy = np.maximum(np.maximum(ny - y, y - (ny + n - 1)), 0)
+        return np.maximum(hx, hy).astype(np.int32)
+
+    def _distance_to_nest(self):
+        """
+        以巢為終點的距離場，規則與 AntAgent.plan_return_path 相同，
+        只是以真實地圖代替個人記憶。地圖可通行性不會改變，只需算一次。
+        """
+        field = NestFlowField(self.grid, self.nest_coords)
+        dist = field.dist.reshape(self.size, self.size).copy()
+        # 已在巢內的螞蟻永遠能「規劃成功」（起點即終點）
+        for x, y in self.nest_coords:
+            dist[x, y] = 0
+        return dist
+
+    def _plan_return(self, idx):
+        """對 idx 中的螞蟻規劃回巢，成功者切成 return 模式"""
+        px, py = self.pos[idx, 0], self.pos[idx, 1]
+        ok = self._home_distance(px, py) != UNREACHABLE
+        self.mode[idx[ok]] = MODE_RETURN
+        return ok
+
+    def _draw(self, ids, width, salt):
+        """
+        ids 這幾隻螞蟻本回合的亂數 (len(ids), width)。
+        streams="sequential" 依序從 self.rng 抽；"counter" 只由 (seed, tick, 螞蟻編號, salt) 決定，
+        與處理順序、由哪個 process 處理都無關（domains.DomainSim 靠這點做到與單一 process 相同）。
+        """
+        if self.streams == "counter":
+            keys = counter_random(self.counter_key, self.tick, ids, width, salt)
+            return keys if width > 1 else keys[:, 0]
+        return direction_keys(self.rng, len(ids)) if width == 8 else self.rng.random(len(ids))
+
+    def _decide(self, idx):
+        """idx: 本回合要行動的螞蟻（依編號排序）；回傳與 idx 對齊的 (len(idx), 2) 移動"""
+        # 走太久的探索蟻嘗試回巢，失敗就重設步數繼續探索
+        tired = idx[(self.mode[idx] == MODE_EXPLORE)
+                    & (self.steps_taken[idx] >= self.max_steps)]
+        if len(tired):
+            ok = self._plan_return(tired)
+            failed = tired[~ok]
+            self.steps_taken[failed] = 0
+            if self.events.replan_failed:
+                self._emit("replan_failed", failed)
+
+        # 有費洛蒙時，被擋住而退回 explore 的帶食螞蟻每回合重試回巢，失敗才沿 "nest" 氣味走
+        if self.pheromone is not None:
+            lost = idx[(self.mode[idx] == MODE_EXPLORE) & self.carrying[idx]]
+            if len(lost):
+                self._plan_return(lost)
+
+        moves = np.zeros((len(idx), 2), dtype=np.int32)
+        mode = self.mode[idx]
+
+        # explore：隨機打亂方向後取第一個未知格，沒有就隨便選一個
+        e = np.flatnonzero(mode == MODE_EXPLORE)
+        if len(e):
+            explore = idx[e]
+            inside, tx, ty = self._neighbors(explore)
+            unknown = inside & (self.grid[tx, ty] == 0)
+            keys = self._draw(explore, 8, 0) + ~unknown
+            if self.pheromone is not None:
+                keys -= trail_bias(self.pheromone, self.pos[explore], self.carrying[explore],
+                                   DIRECTIONS, self.grid, ~self.scent_blocked[explore],
+                                   self.dist_home == 0)
+            moves[e] = DIRECTIONS[np.argmin(keys, axis=1)]
+
+        # return：沿距離場往下走一步，距離場斷掉就原地不動（等同 return_path 為空）
+        r = np.flatnonzero(mode == MODE_RETURN)
+        if len(r):
+            ret = idx[r]
+            inside, tx, ty = self._neighbors(ret)
+            here = self._home_distance(self.pos[ret, 0], self.pos[ret, 1])
+            near = np.where(inside, self._home_distance(tx, ty), UNREACHABLE)
+            step_ok = (near == here[:, None] - 1) & (here[:, None] > 0)
+            has_step = step_ok.any(axis=1)
+            first = np.argmax(step_ok, axis=1)
+            moves[r[has_step]] = DIRECTIONS[first[has_step]]
+
+        return moves
+
+    def _neighbors(self, idx):
+        """idx 每隻螞蟻 8 個鄰格的 (inside, tx, ty)，見 _targets"""
+        return self._targets(idx, self.pos[idx, None, :] + DIRECTIONS[None, :, :])
+
+    def _targets(self, idx, targets):
+        """
+        idx 的螞蟻要去的座標 targets (len(idx), ..., 2)：
+        (是否在地圖內, 裁切到地圖內的 x, y)
+        """
+        inside = ((targets >= 0) & (targets < self.size)).all(axis=-1)
+        tx = np.clip(targets[..., 0], 0, self.size - 1)
+        ty = np.clip(targets[..., 1], 0, self.size - 1)
+        return inside, tx, ty
+
+    def _collide(self, cand, cur, tgt):
+        """想移動的螞蟻 cand（目前格 cur → 目標格 tgt）哪些走得成，並更新佔用格"""
+        if self.collision == "random":
+            rank = self._draw(cand, 1, 1)
+        else:
+            rank = np.where(self.carrying[cand], 0, len(self.pos)) + cand
+        ok = self.occupancy.resolve(cur, tgt, rank)
+        self.occupancy.apply(cur[ok], tgt[ok])
+        return ok
+
+    def _move(self, idx, moves):
+        """結算移動，回傳與 idx 對齊的 (moved, still, blocked)；原地不動的也算 moved"""
+        new = self.pos[idx] + moves
+        inside, nx, ny = self._targets(idx, new)
+
+        # 原地不動的一律成功；真正要移動的交給佔用格批次結算
+        # 值為 1 的格子不能走，但巢格本身可以進入（回巢交付食物）
+        free = inside & ((self.grid[nx, ny] != 1) | self._in_nest(nx, ny))
+        still = (moves == 0).all(axis=1)
+        c = np.flatnonzero(free & ~still)
+        cand = idx[c]
+        cur = self.pos[cand, 0] * self.size + self.pos[cand, 1]
+        tgt = nx[c] * self.size + ny[c]
+        ok = self._collide(cand, cur, tgt)
+        free[c[~ok]] = False
+
+        hit = idx[free]
+        self.pos[hit] = new[free]
+        self.steps_taken[hit] += 1
+
+        blocked = ~free
+        self.blocked_count[idx[blocked]] += 1
+        stuck = blocked & inside & (self.blocked_count[idx] >= 3)
+        self.mode[idx[stuck]] = MODE_EXPLORE
+        self.steps_taken[idx[stuck]] = 0
+        events = self.events
+        if events.blocked:
+            m = np.flatnonzero(blocked & inside)
+            events.emit_many("blocked", idx[m], nx[m], ny[m], self.blocked_count[idx[m]])
+        if events.stuck:
+            m = np.flatnonzero(stuck)
+            events.emit_many("stuck", idx[m], nx[m], ny[m], self.blocked_count[idx[m]])
+        return free, still, blocked
+
+    def _arrive(self, idx, moved, still, blocked):
+        """移動之後：足跡、撿食物、回巢交付、留下氣味（idx 與三個遮罩對齊）"""
+        events = self.events
+        hit = idx[moved]
+        add_at(self.visit_count, self.pos[hit, 0], self.pos[hit, 1], 1)
+
+        px, py = self.pos[idx, 0], self.pos[idx, 1]
+
+        # 撿食物：同一格多隻螞蟻時只有編號最小的撿得到
+        p = np.flatnonzero(~self.carrying[idx] & (self.grid[px, py] == 2))
+        pick = idx[p]
+        if len(pick):
+            flat = px[p] * self.size + py[p]
+            _, first = np.unique(flat, return_index=True)
+            pick = pick[first]
+            self.carrying[pick] = True
+            self.grid[self.pos[pick, 0], self.pos[pick, 1]] = 0
+            if self.food is not None:
+                self.food.take_many(self.pos[pick, 0], self.pos[pick, 1])
+            if events.food_picked:
+                self._emit("food_picked", pick)
+            self._plan_return(pick)
+
+        # 在巢內：交付食物、探索蟻重新出發、防守蟻結束
+        home = idx[self._in_nest(px, py)]
+        if len(home):
+            delivered = home[self.carrying[home]]
+            self.carrying[delivered] = False
+            self.food_delivered += len(delivered)
+            if events.food_delivered:
+                self._emit("food_delivered", delivered)
+
+            restart = home[self.is_explorer[home]
+                           & (self.mode[home] == MODE_RETURN)]
+            self.mode[restart] = MODE_EXPLORE
+            self.steps_taken[restart] = 0
+            if events.restarted:
+                self._emit("restarted", restart)
+
+            retire = home[~self.is_explorer[home]]
+            self.mode[retire] = MODE_DONE
+
+        if self.pheromone is not None:
+            self._lay_scent(idx, moved & ~still, blocked, pick, home)
+
+    def _lay_scent(self, idx, moved, blocked, picked, home):
+        """
+        撿到食物或回到巢的螞蟻從頭算起；這回合有移動的螞蟻照步數留下越來越淡的氣味
+        （站著不動不留，否則被擋住的螞蟻會堆出一個把其他螞蟻吸過去的熱點）
+        """
+        self.scent_age[picked] = 0
+        self.scent_age[home] = 0
+        self.scent_blocked[idx] = blocked
+        live = idx[moved]
+        lay_trails(self.pheromone, self.pos[live], self.carrying[live], self.scent_age[live])
+        self.scent_age[live] += 1
+
+    def _emit(self, kind, idx):
+        self.events.emit_many(kind, idx, self.pos[idx, 0], self.pos[idx, 1])
+
+    def _depart(self):
+        """控制探索蟻出發順序（每 5 tick 一隻）"""
+        if self.tick % 5 == 0 and self.departure_index < len(self.departure_queue):
+            i = self.departure_queue[self.departure_index]
+            if (self.mode[i] == MODE_EXPLORE
+                    and self._in_nest(self.pos[i, 0], self.pos[i, 1])):
+                self.departure_index += 1
+                if self.events.departed:
+                    self._emit("departed", np.array([i]))
+
+    def step(self):
+        self.tick += 1
+        self.events.tick = self.tick
+        prof = self.profiler
+        if prof.enabled:
+            prof.begin_tick(self.tick)
+            prof.phase("decide")
+        idx = np.flatnonzero(self.mode != MODE_DONE)
+        moves = self._decide(idx)
+        if prof.enabled:
+            prof.phase("move")
+        moved, still, blocked = self._move(idx, moves)
+        if prof.enabled:
+            prof.phase("arrive")
+        self._arrive(idx, moved, still, blocked)
+        if self.pheromone is not None:
+            if prof.enabled:
+                prof.phase("pheromone")
+            self.pheromone.update(self.tick)
+        if prof.enabled:
+            prof.phase("depart")
+        self._depart()
+        if prof.enabled:
+            prof.end_tick()
+
+    def get_state(self, region=None, out=None):
+        """
+        region: (x0, y0, w, h) 只取一個視窗（世界座標），大地圖上用來避免整張複製
+        回傳 (地圖, 螞蟻層) 的唯讀 view，下一次 step() 後內容會變；
+        out=(grid_buf, ant_buf) 時改寫進呼叫端的緩衝區（見 observation.state_views）
+        """
+        cells = np.where(self.mode != MODE_DONE,
+                         self.pos[:, 0].astype(np.int64) * self.size + self.pos[:, 1], -1)
+        self.ant_layer.update(cells, self.carrying)
+        return state_views(self.grid, self.ant_layer.layer, region, out)
+
+    def is_done(self):
+        return self.food_delivered >= 100
+
+    # 快照（實作見 snapshot.py）
+    def save_snapshot(self, path):
+        from snapshot import save_snapshot
+        save_snapshot(self, path)
+
+    @classmethod
+    def load_snapshot(cls, path, events=None):
+        from snapshot import load_snapshot
+        return load_snapshot(path, events)
+
+    def fork(self, events=None):
+        """複製出獨立的模擬，用來從同一個狀態分支出多個 what-if"""
+        from snapshot import fork
+        return fork(self, events)
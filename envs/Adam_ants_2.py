@@ -1,20 +1,52 @@
 import numpy as np
 import random
 
+from envs.chunked_grid import ChunkedGrid
+from envs.food_zones import FoodZones
+from envs.scenario import WorldCache, generate_world
+
 
 class AntWorldEnv:
-    def __init__(self, size=150, nest_size=4, food_size=10, min_dist=30, seed=None):
+    def __init__(self, size=150, nest_size=4, food_size=10, min_dist=30, seed=None,
+                 chunk=None, scenario=None, cache=None):
+        """
+        chunk: 給定時地圖改用 ChunkedGrid（chunk×chunk 區塊懶惰配置），供超大稀疏地圖使用
+        scenario: dict，給定時改用 envs/scenario.generate_world 生成（可以有牆、任意數量的食物區），
+                  鍵為 generate_world 的參數（terrain / num_food / density ...）；省略則沿用原本的隨機放置
+        cache: scenario 生成結果的磁碟快取（WorldCache 或目錄），同一組 (seed, 參數) 直接讀檔
+        """
         self.size = size
         self.nest_size = nest_size
         self.food_size = food_size
         self.min_dist = min_dist
         self.rng = random.Random(seed)
-        # 0: 空地, 1: 蟻窩, 2: 食物
-        self.grid = np.zeros((size, size), dtype=np.int8)
+        # 0: 空地, 1: 蟻窩 / 牆, 2: 食物
+        if chunk:
+            self.grid = ChunkedGrid(size, chunk, np.int8)
+        else:
+            self.grid = np.zeros((size, size), dtype=np.int8)
+
+        if scenario is None:
+            self.nest_pos = self._place_nest()
+            self.food_positions = []
+            self._place_multiple_food_zones(num=4)
+        else:
+            self._build_scenario(seed, scenario, cache)
+        # 食物區索引：每格的區編號、每區剩餘量與範圍（見 envs/food_zones.py）
+        self.food = FoodZones(size, self.food_positions, food_size, self.grid, chunk)
 
-        self.nest_pos = self._place_nest()
-        self.food_positions = []
-        self._place_multiple_food_zones(num=4)
+    def _build_scenario(self, seed, scenario, cache):
+        params = dict(scenario, nest_size=self.nest_size, food_size=self.food_size,
+                      min_dist=self.min_dist)
+        if cache is not None and seed is not None:
+            if not isinstance(cache, WorldCache):
+                cache = WorldCache(cache)
+            world = cache.get(self.size, seed, **params)
+        else:
+            world = generate_world(self.size, seed, **params)
+        world.paint(self.grid, self.nest_size, self.food_size)
+        self.nest_pos = world.nest_pos
+        self.food_positions = world.food_positions
 
     def _place_nest(self):
         x = self.rng.randint(0, self.size - self.nest_size)
@@ -42,9 +74,11 @@ class AntWorldEnv:
         return self.grid.copy()
 
     def render_ascii(self):
-        symbols = {0: ".", 1: "N", 2: "F"}
-        for row in self.grid:
-            print("".join([symbols[val] for val in row]))
+        symbols = {0: ".", 1: "#", 2: "F"}
+        nx, ny = self.nest_pos
+        for x, row in enumerate(self.grid):
+            print("".join(["N" if nx <= x < nx + self.nest_size and ny <= y < ny + self.nest_size
+                           else symbols[val] for y, val in enumerate(row)]))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,235 @@
+import numpy as np
+
+
+class ChunkedGrid:
+    """
+    以 chunk×chunk 區塊懶惰配置的二維格子，取代超大地圖上的稠密陣列。
+    只有寫入非預設值（fill）的區塊才會配置，讀取未配置的區塊直接得到 fill。
+    以世界座標存取，支援 NumPy 陣列常用的幾種索引：
+        g[x, y]            單格
+        g[xs, ys]          座標陣列（任意形狀，回傳同形狀）
+        g[x0:x1, y0:y1]    取出稠密的複本 / 整塊填入同一個值
+        g.flat[idx]        扁平索引 x * size + y
+    """
+
+    def __init__(self, size, chunk=64, dtype=np.int8, fill=0):
+        self.size = size
+        self.shape = (size, size)
+        self.chunk = chunk
+        self.dtype = np.dtype(dtype)
+        self.fill = fill
+        self.per_row = -(-size // chunk)
+        self.chunks = {}  # cx * per_row + cy -> (chunk, chunk) 陣列
+
+    @property
+    def flat(self):
+        return _FlatView(self)
+
+    @property
+    def allocated(self):
+        return len(self.chunks)
+
+    @property
+    def nbytes(self):
+        return len(self.chunks) * self.chunk * self.chunk * self.dtype.itemsize
+
+    def _new_chunk(self):
+        return np.full((self.chunk, self.chunk), self.fill, dtype=self.dtype)
+
+    def _groups(self, xs, ys):
+        """依所屬區塊分組：回傳 (區塊編號, 區塊內 x, 區塊內 y, 每組的切片位置)"""
+        c = self.chunk
+        keys = (xs // c) * self.per_row + ys // c
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        starts = np.concatenate([[0], bounds])
+        ends = np.concatenate([bounds, [len(keys)]])
+        return keys[starts], order, starts, ends
+
+    def get(self, xs, ys):
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        shape = np.broadcast(xs, ys).shape
+        xs = np.broadcast_to(xs, shape).ravel()
+        ys = np.broadcast_to(ys, shape).ravel()
+        out = np.full(len(xs), self.fill, dtype=self.dtype)
+        if len(xs) == 0 or not self.chunks:
+            return out.reshape(shape)
+        c = self.chunk
+        keys, order, starts, ends = self._groups(xs, ys)
+        for key, s, e in zip(keys.tolist(), starts.tolist(), ends.tolist()):
+            ch = self.chunks.get(key)
+            if ch is None:
+                continue
+            sel = order[s:e]
+            out[sel] = ch[xs[sel] % c, ys[sel] % c]
+        return out.reshape(shape)
+
+    def set(self, xs, ys, vals):
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        shape = np.broadcast(xs, ys).shape
+        xs = np.broadcast_to(xs, shape).ravel()
+        ys = np.broadcast_to(ys, shape).ravel()
+        vals = np.broadcast_to(np.asarray(vals, dtype=self.dtype), shape).ravel()
+        if len(xs) == 0:
+            return
+        c = self.chunk
+        keys, order, starts, ends = self._groups(xs, ys)
+        for key, s, e in zip(keys.tolist(), starts.tolist(), ends.tolist()):
+            sel = order[s:e]
+            ch = self.chunks.get(key)
+            if ch is None:
+                if (vals[sel] == self.fill).all():
+                    continue  # 寫入預設值不需要配置
+                ch = self.chunks[key] = self._new_chunk()
+            ch[xs[sel] % c, ys[sel] % c] = vals[sel]
+
+    def add_at(self, xs, ys, vals):
+        """等同 np.add.at(grid, (xs, ys), vals)：重複的座標會累加"""
+        xs = np.asarray(xs).ravel()
+        ys = np.asarray(ys).ravel()
+        vals = np.broadcast_to(np.asarray(vals, dtype=self.dtype), xs.shape)
+        if len(xs) == 0:
+            return
+        c = self.chunk
+        keys, order, starts, ends = self._groups(xs, ys)
+        for key, s, e in zip(keys.tolist(), starts.tolist(), ends.tolist()):
+            sel = order[s:e]
+            ch = self.chunks.get(key)
+            if ch is None:
+                ch = self.chunks[key] = self._new_chunk()
+            np.add.at(ch, (xs[sel] % c, ys[sel] % c), vals[sel])
+
+    def _bounds(self, sx, sy):
+        x0, x1, _ = sx.indices(self.size)
+        y0, y1, _ = sy.indices(self.size)
+        return x0, max(x1, x0), y0, max(y1, y0)
+
+    def region(self, x0, x1, y0, y1):
+        """稠密的 [x0:x1, y0:y1] 複本，只複製有配置的區塊"""
+        out = np.full((x1 - x0, y1 - y0), self.fill, dtype=self.dtype)
+        c = self.chunk
+        for cx in range(x0 // c, -(-x1 // c)):
+            for cy in range(y0 // c, -(-y1 // c)):
+                ch = self.chunks.get(cx * self.per_row + cy)
+                if ch is None:
+                    continue
+                ax0, ax1 = max(x0, cx * c), min(x1, (cx + 1) * c)
+                ay0, ay1 = max(y0, cy * c), min(y1, (cy + 1) * c)
+                out[ax0 - x0:ax1 - x0, ay0 - y0:ay1 - y0] = \
+                    ch[ax0 - cx * c:ax1 - cx * c, ay0 - cy * c:ay1 - cy * c]
+        return out
+
+    def fill_region(self, x0, x1, y0, y1, value):
+        c = self.chunk
+        for cx in range(x0 // c, -(-x1 // c)):
+            for cy in range(y0 // c, -(-y1 // c)):
+                key = cx * self.per_row + cy
+                ch = self.chunks.get(key)
+                if ch is None:
+                    if value == self.fill:
+                        continue
+                    ch = self.chunks[key] = self._new_chunk()
+                ax0, ax1 = max(x0, cx * c), min(x1, (cx + 1) * c)
+                ay0, ay1 = max(y0, cy * c), min(y1, (cy + 1) * c)
+                ch[ax0 - cx * c:ax1 - cx * c, ay0 - cy * c:ay1 - cy * c] = value
+
+    def __getitem__(self, key):
+        kx, ky = key
+        if isinstance(kx, slice) and isinstance(ky, slice):
+            return self.region(*self._bounds(kx, ky))
+        if np.ndim(kx) == 0 and np.ndim(ky) == 0:
+            ch = self.chunks.get((kx // self.chunk) * self.per_row + ky // self.chunk)
+            if ch is None:
+                return self.dtype.type(self.fill)
+            return ch[kx % self.chunk, ky % self.chunk]
+        return self.get(kx, ky)
+
+    def __setitem__(self, key, value):
+        kx, ky = key
+        if isinstance(kx, slice) and isinstance(ky, slice):
+            self.fill_region(*self._bounds(kx, ky), value)
+        else:
+            self.set(kx, ky, value)
+
+    def copy(self):
+        out = ChunkedGrid(self.size, self.chunk, self.dtype, self.fill)
+        out.chunks = {k: v.copy() for k, v in self.chunks.items()}
+        return out
+
+    def count(self, value):
+        """等於 value 的格數"""
+        hits = sum(int(np.count_nonzero(ch == value)) for ch in self.chunks.values())
+        if value != self.fill:
+            return hits
+        # 未配置的區塊全是 fill；邊緣區塊超出地圖的部分也是 fill，要扣掉
+        others = sum(int(np.count_nonzero(ch != value)) for ch in self.chunks.values())
+        return self.size * self.size - others
+
+    def diff(self, other):
+        """與另一個相同規格的 ChunkedGrid 不同的格子（扁平索引）"""
+        c = self.chunk
+        empty = self._new_chunk()
+        found = []
+        for key in self.chunks.keys() | other.chunks.keys():
+            a = self.chunks.get(key, empty)
+            b = other.chunks.get(key, empty)
+            lx, ly = np.nonzero(a != b)
+            if len(lx):
+                cx, cy = divmod(key, self.per_row)
+                found.append((cx * c + lx) * self.size + cy * c + ly)
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(found))
+
+    def to_arrays(self):
+        """(區塊編號 (K,), 區塊資料 (K, chunk, chunk))，供快照 / 存檔"""
+        keys = np.array(sorted(self.chunks), dtype=np.int64)
+        data = np.zeros((len(keys), self.chunk, self.chunk), dtype=self.dtype)
+        for i, key in enumerate(keys.tolist()):
+            data[i] = self.chunks[key]
+        return keys, data
+
+    @classmethod
+    def from_arrays(cls, size, keys, data, fill=0):
+        grid = cls(size, data.shape[1], data.dtype, fill)
+        grid.chunks = {k: data[i].copy() for i, k in enumerate(keys.tolist())}
+        return grid
+
+
+class _FlatView:
+    """ChunkedGrid.flat：以扁平索引 x * size + y 讀寫，對應 ndarray.flat"""
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    def __getitem__(self, idx):
+        x, y = np.divmod(idx, self.grid.size)
+        return self.grid[x, y]
+
+    def __setitem__(self, idx, value):
+        x, y = np.divmod(idx, self.grid.size)
+        self.grid[x, y] = value
+
+    def add_at(self, idx, vals):
+        x, y = np.divmod(np.asarray(idx), self.grid.size)
+        self.grid.add_at(x, y, vals)
+
+
+def add_at(grid, xs, ys, vals):
+    """np.add.at(grid, (xs, ys), vals)，grid 可為 ndarray 或 ChunkedGrid"""
+    if isinstance(grid, ChunkedGrid):
+        grid.add_at(xs, ys, vals)
+    else:
+        # vals 先轉成 grid 的型別：傳 Python int 時 np.add.at 走逐個轉型的慢路徑（約慢 30 倍）
+        np.add.at(grid, (xs, ys), np.asarray(vals, dtype=grid.dtype))
+
+
+def flat_add_at(arr, idx, vals):
+    """一維版本：arr 為扁平 ndarray 或 ChunkedGrid.flat"""
+    if isinstance(arr, _FlatView):
+        arr.add_at(idx, vals)
+    else:
+        np.add.at(arr, idx, np.asarray(vals, dtype=arr.dtype))
@@ -0,0 +1,80 @@
+import numpy as np
+
+from envs.chunked_grid import ChunkedGrid
+
+
+class FoodZones:
+    """
+    食物區的索引：每格屬於哪一區（labels，-1 為不屬於任何區）、每區剩下幾格食物、每區的範圍。
+    由 AntWorldEnv 放置食物時建立，之後撿食物只要 take() 一次減一，
+    剩餘量與「最近的已知食物」都只看區的數量，與地圖大小無關。
+    labels 不隨食物被撿走而改變，某格現在有沒有食物仍以地圖（grid == 2）為準。
+    """
+
+    def __init__(self, size, positions, zone_size, grid, chunk=None):
+        """
+        positions: 每區左上角 (x, y)（AntWorldEnv.food_positions），zone_size: 區的邊長
+        grid: 用來算每區目前剩下幾格食物的地圖
+        """
+        self.size = size
+        if chunk:
+            self.labels = ChunkedGrid(size, chunk, np.int16, -1)
+        else:
+            self.labels = np.full((size, size), -1, dtype=np.int16)
+        # 每區的範圍 (x0, y0, x1, y1)，x1 / y1 不含
+        self.boxes = np.array([(x, y, x + zone_size, y + zone_size) for x, y in positions],
+                              dtype=np.int64).reshape(-1, 4)
+        for zone, (x0, y0, x1, y1) in enumerate(self.boxes.tolist()):
+            self.labels[x0:x1, y0:y1] = zone
+        self.remaining = np.zeros(len(self.boxes), dtype=np.int64)
+        self.total = 0
+        self.recount(grid)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def recount(self, grid):
+        """依地圖重算每區剩下的食物（只掃各區的範圍）"""
+        for zone, (x0, y0, x1, y1) in enumerate(self.boxes.tolist()):
+            self.remaining[zone] = np.count_nonzero(np.asarray(grid[x0:x1, y0:y1]) == 2)
+        self.total = int(self.remaining.sum())
+
+    def zone_at(self, x, y):
+        return int(self.labels[x, y])
+
+    def take(self, x, y):
+        """(x, y) 的食物被撿走，回傳所屬的區（不屬於任何區時 -1）"""
+        zone = int(self.labels[x, y])
+        if zone >= 0:
+            self.remaining[zone] -= 1
+            self.total -= 1
+        return zone
+
+    def take_many(self, xs, ys):
+        """向量化引擎用：一批格子的食物被撿走"""
+        zones = np.asarray(self.labels[xs, ys], dtype=np.int64)
+        zones = zones[zones >= 0]
+        np.subtract.at(self.remaining, zones, 1)
+        self.total -= len(zones)
+        return zones
+
+    def cells(self, zone, grid):
+        """某區還有食物的格子 (xs, ys)，只掃這一區的範圍"""
+        x0, y0, x1, y1 = self.boxes[zone].tolist()
+        xs, ys = np.nonzero(np.asarray(grid[x0:x1, y0:y1]) == 2)
+        return xs + x0, ys + y0
+
+    def nearest(self, pos, zones=None):
+        """
+        離 pos 最近（到範圍的切比雪夫距離）且還有食物的區，沒有時回傳 -1。
+        zones: 只在這些區裡找（例如巢已知的區），省略為全部
+        """
+        ids = np.arange(len(self.boxes)) if zones is None else np.fromiter(zones, np.int64)
+        ids = ids[self.remaining[ids] > 0]
+        if len(ids) == 0:
+            return -1
+        x0, y0, x1, y1 = self.boxes[ids].T
+        x, y = pos
+        dx = np.maximum(np.maximum(x0 - x, x - (x1 - 1)), 0)
+        dy = np.maximum(np.maximum(y0 - y, y - (y1 - 1)), 0)
+        return int(ids[np.argmin(np.maximum(dx, dy))])
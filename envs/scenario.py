@@ -0,0 +1,268 @@
+"""
+程序化生成地圖：巢、任意數量的食物區與牆（值 1，與巢相同，介面本來就當成不可通行），
+保證每個食物區都走得到巢；生成結果可以依 (seed, 參數) 存到磁碟，大量 seed 的批次執行直接讀檔。
+
+    world = generate_world(150, seed=3, num_food=12, terrain="caves")
+    env = AntWorldEnv(seed=3, scenario={"terrain": "maze", "num_food": 8}, cache="worlds/")
+
+terrain：
+    "open"   沒有牆，只放巢與食物區（與 AntWorldEnv 原本的地圖相同，但食物區數量不限）
+    "caves"  以雜訊做出的洞穴，density 為牆佔的比例，scale 為洞穴的大小（格）
+    "maze"   走道寬 corridor 的迷宮，braid 為額外打通的牆的比例（越大岔路越多）
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from envs.chunked_grid import ChunkedGrid
+
+
+TERRAINS = ("open", "caves", "maze")
+VERSION = 1  # 生成規則改變時加一，舊的快取就不會再被讀到
+
+# 八方向（與 AntAgent.DIRECTIONS 相同，對角可以直接穿過兩面牆的夾角）
+OFFSETS = np.array([(dx, dy) for dx in [-1, 0, 1]
+                    for dy in [-1, 0, 1] if not (dx == 0 and dy == 0)], dtype=np.int64)
+
+
+class World:
+    """生成結果：牆（(size, size) bool，沒有牆時為 None）、巢與各食物區的左上角"""
+
+    def __init__(self, size, walls, nest_pos, food_positions):
+        self.size = size
+        self.walls = walls
+        self.nest_pos = nest_pos
+        self.food_positions = food_positions
+
+    def paint(self, grid, nest_size, food_size):
+        """畫到地圖上（np.ndarray 或 ChunkedGrid）：牆與巢為 1、食物為 2"""
+        if self.walls is not None:
+            if isinstance(grid, ChunkedGrid):
+                xs, ys = np.nonzero(self.walls)
+                grid.set(xs, ys, 1)
+            else:
+                grid[self.walls] = 1
+        nx, ny = self.nest_pos
+        grid[nx:nx + nest_size, ny:ny + nest_size] = 1
+        for fx, fy in self.food_positions:
+            grid[fx:fx + food_size, fy:fy + food_size] = 2
+
+
+def generate_world(size, seed=None, nest_size=4, food_size=10, min_dist=30, num_food=4,
+                   terrain="open", density=0.35, scale=12, corridor=3, braid=0.05):
+    """
+    生成一張地圖，回傳 World。順序固定為 巢 → 食物區 → 牆，同一個 seed 與參數結果相同。
+    食物區彼此不重疊、中心與巢中心的距離至少 min_dist；放不下 num_food 個時丟 ValueError
+    （不會像 AntWorldEnv 的逐次嘗試那樣默默少放）。
+    牆生成後清出巢與食物區，走不到巢的食物區沿 L 形挖一條通道，最後把走不到的空地填成牆。
+    """
+    if terrain not in TERRAINS:
+        raise ValueError(f"未知的 terrain: {terrain}")
+    rng = np.random.default_rng(seed)
+    nest_pos = tuple(int(v) for v in rng.integers(0, size - nest_size + 1, 2))
+    food_positions = _place_food(rng, size, nest_pos, nest_size, food_size, min_dist, num_food)
+    if terrain == "open":
+        return World(size, None, nest_pos, food_positions)
+
+    if terrain == "caves":
+        walls = _caves(rng, size, density, scale)
+    else:
+        walls = _maze(rng, size, corridor, braid)
+
+    nx, ny = nest_pos
+    walls[max(nx - 1, 0):nx + nest_size + 1, max(ny - 1, 0):ny + nest_size + 1] = False
+    for fx, fy in food_positions:
+        walls[fx:fx + food_size, fy:fy + food_size] = False
+
+    nest = np.zeros((size, size), dtype=bool)
+    nest[nx:nx + nest_size, ny:ny + nest_size] = True
+    reach = reachable(~walls, np.flatnonzero(nest))
+    cx, cy = nx + nest_size // 2, ny + nest_size // 2
+    for fx, fy in food_positions:
+        if reach[fx:fx + food_size, fy:fy + food_size].any():
+            continue
+        x, y = fx + food_size // 2, fy + food_size // 2
+        walls[min(x, cx):max(x, cx) + 1, y] = False
+        walls[cx, min(y, cy):max(y, cy) + 1] = False
+    reach = reachable(~walls, np.flatnonzero(nest))
+    walls |= ~reach
+    return World(size, walls, nest_pos, food_positions)
+
+
+def _place_food(rng, size, nest_pos, nest_size, food_size, min_dist, num, rounds=100):
+    """
+    一次抽一批候選左上角，距離與是否壓到巢整批判斷，
+    彼此不重疊則以 food_size 為邊長的桶子檢查（每個候選只看周圍 3×3 個桶）。
+    """
+    nx, ny = nest_pos
+    nest_center = np.array([nx + nest_size // 2, ny + nest_size // 2])
+    batch = max(64, 4 * num)
+    placed = []
+    buckets = {}
+    for _ in range(rounds):
+        if len(placed) >= num:
+            break
+        cand = rng.integers(0, size - food_size + 1, (batch, 2))
+        dist = np.hypot(*(cand + food_size // 2 - nest_center).T)
+        on_nest = ((cand[:, 0] < nx + nest_size) & (nx < cand[:, 0] + food_size)
+                   & (cand[:, 1] < ny + nest_size) & (ny < cand[:, 1] + food_size))
+        for x, y in cand[(dist >= min_dist) & ~on_nest].tolist():
+            bx, by = x // food_size, y // food_size
+            if any(abs(x - ox) < food_size and abs(y - oy) < food_size
+                   for i in (bx - 1, bx, bx + 1) for j in (by - 1, by, by + 1)
+                   for ox, oy in buckets.get((i, j), ())):
+                continue
+            buckets.setdefault((bx, by), []).append((x, y))
+            placed.append((x, y))
+            if len(placed) >= num:
+                break
+    if len(placed) < num:
+        raise ValueError(f"只放得下 {len(placed)} 個食物區（要求 {num}），"
+                         f"請加大地圖或減少 num_food / min_dist")
+    return placed
+
+
+def _value_noise(rng, size, scale):
+    """粗格子上的亂數以 smoothstep 雙線性內插到 size×size"""
+    n = size // scale + 2
+    coarse = rng.random((n, n), dtype=np.float32)
+    t = np.arange(size, dtype=np.float32) / scale
+    i = t.astype(np.int64)
+    f = t - i
+    f = f * f * (3 - 2 * f)
+    rows = coarse[i] * (1 - f)[:, None] + coarse[i + 1] * f[:, None]
+    return rows[:, i] * (1 - f)[None, :] + rows[:, i + 1] * f[None, :]
+
+
+def _caves(rng, size, density, scale):
+    """兩個尺度的雜訊相加，取最高的 density 比例當牆"""
+    noise = _value_noise(rng, size, scale) + 0.5 * _value_noise(rng, size, max(scale // 2, 1))
+    return noise > np.quantile(noise, 1 - density)
+
+
+def _maze(rng, size, corridor, braid):
+    """
+    走道寬 corridor、牆厚 1 的迷宮（隨機深度優先）。
+    先在 (2m-1)×(2m-1) 的展開格上生成（偶數位置是節點、奇數是節點間的牆），再整張對應到地圖。
+    """
+    pitch = corridor + 1
+    m = max((size + 1) // pitch, 1)
+    order = rng.random((m * m, 4)).argsort(axis=1).tolist()  # 每個節點嘗試鄰居的順序
+    steps = ((-1, 0), (1, 0), (0, -1), (0, 1))
+    grid = np.zeros((2 * m - 1, 2 * m - 1), dtype=bool)  # True：打通
+    grid[::2, ::2] = True
+    # 迴圈只用 Python 的 list / bytearray，打通的牆最後一次寫進 grid
+    seen = bytearray(m * m)
+    opened = []
+    start = int(rng.integers(m * m))
+    seen[start] = 1
+    stack = [(start, 0)]
+    while stack:
+        node, k = stack.pop()
+        if k == 4:
+            continue
+        stack.append((node, k + 1))
+        i, j = divmod(node, m)
+        di, dj = steps[order[node][k]]
+        ni, nj = i + di, j + dj
+        if 0 <= ni < m and 0 <= nj < m and not seen[ni * m + nj]:
+            seen[ni * m + nj] = 1
+            opened.append((2 * i + di) * (2 * m - 1) + 2 * j + dj)
+            stack.append((ni * m + nj, 0))
+    grid.flat[opened] = True
+
+    # 額外打通一部分節點間的牆，做出迴圈
+    edge = np.zeros(grid.shape, dtype=bool)
+    edge[1::2, ::2] = True
+    edge[::2, 1::2] = True
+    grid |= edge & (rng.random(grid.shape) < braid)
+
+    # 地圖座標 → 展開格座標：走道格對到節點，牆格對到節點間的牆；超出最後一個節點的部分是牆
+    c = np.arange(size)
+    k, r = np.divmod(c, pitch)
+    k = 2 * k + (r >= corridor)
+    ok = k < grid.shape[0]
+    k = np.minimum(k, grid.shape[0] - 1)
+    return ~(grid[k[:, None], k[None, :]] & ok[:, None] & ok[None, :])
+
+
+def reachable(free, sources):
+    """從 sources（扁平索引）出發、八方向只走 free 的格子能到的範圍（與 free 同形狀的 bool）"""
+    size = free.shape[0]
+    # 外圍墊一圈不可走的格子，鄰格就不必檢查出界
+    padded = np.zeros((size + 2, size + 2), dtype=bool)
+    padded[1:-1, 1:-1] = free
+    flat = padded.ravel()
+    steps = OFFSETS[:, 0] * (size + 2) + OFFSETS[:, 1]
+    x, y = np.divmod(np.asarray(sources, dtype=np.int64), size)
+    frontier = (x + 1) * (size + 2) + y + 1
+    frontier = frontier[flat[frontier]]
+    seen = np.zeros(flat.shape, dtype=bool)
+    seen[frontier] = True
+    owner = np.empty(flat.shape, dtype=np.int64)  # 去重用：同一格只留最後寫入的那一筆
+    while len(frontier):
+        nbr = (frontier[:, None] + steps).ravel()
+        nbr = nbr[flat[nbr] & ~seen[nbr]]
+        rank = np.arange(len(nbr))
+        owner[nbr] = rank
+        nbr = nbr[owner[nbr] == rank]
+        seen[nbr] = True
+        frontier = nbr
+    return seen.reshape(size + 2, size + 2)[1:-1, 1:-1].copy()
+
+
+class WorldCache:
+    """
+    生成結果的磁碟快取：每組 (size, seed, 參數) 一個 .npz（牆以 packbits 壓縮）。
+    寫入先寫暫存檔再 os.replace，多個 process 同時生成同一張地圖也不會讀到寫一半的檔。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, size, seed, params):
+        text = json.dumps({"version": VERSION, "size": size, "seed": int(seed), **params},
+                          sort_keys=True)
+        return hashlib.sha1(text.encode()).hexdigest()[:20]
+
+    def path(self, size, seed, params):
+        return os.path.join(self.directory, self.key(size, seed, params) + ".npz")
+
+    def get(self, size, seed, **params):
+        """有快取就讀檔，否則以 generate_world(size, seed, **params) 生成並寫入"""
+        path = self.path(size, seed, params)
+        if os.path.exists(path):
+            self.hits += 1
+            return self.load(path)
+        self.misses += 1
+        world = generate_world(size, seed, **params)
+        self.save(path, world)
+        return world
+
+    @staticmethod
+    def save(path, world):
+        walls = world.walls if world.walls is not None else np.zeros((0, 0), dtype=bool)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, size=world.size, walls=np.packbits(walls),
+                                has_walls=world.walls is not None,
+                                nest_pos=np.array(world.nest_pos, dtype=np.int64),
+                                food_positions=np.array(world.food_positions,
+                                                        dtype=np.int64).reshape(-1, 2))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as a:
+            size = int(a["size"])
+            walls = None
+            if a["has_walls"]:
+                walls = np.unpackbits(a["walls"], count=size * size).reshape(size, size)
+                walls = walls.astype(bool)
+            return World(size, walls, tuple(int(v) for v in a["nest_pos"]),
+                         [tuple(p) for p in a["food_positions"].tolist()])
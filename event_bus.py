@@ -0,0 +1,165 @@
+"""
+模擬事件匯流排：取代 step() / AntAgent.move 裡的 print。
+每個事件類別可單獨開關，關閉時呼叫端只做一次屬性判斷；
+開啟時事件先累積在記憶體，滿 batch_size 筆才整批寫到 sink。
+
+    bus = EventBus(JsonlSink("events.jsonl"), kinds=["blocked", "food_delivered"])
+    sim = AntSimInterface(seed=1, events=bus)
+    ...
+    bus.close()
+"""
+import json
+
+import numpy as np
+
+
+KINDS = [
+    "blocked",         # 移動被擋住，value = 連續被擋次數
+    "stuck",           # 被擋太多次，強制切回探索
+    "replan_failed",   # 無法規劃回巢路
+    "food_picked",     # 撿到食物
+    "food_delivered",  # 把食物送回巢
+    "restarted",       # 回巢後重新出發探索
+    "departed",        # 排程允許出巢
+    "spawned",         # 蟻后產下新的螞蟻（見 colony.py），value = 族群數
+    "died",            # 壽命到了，value = 活了幾個 tick
+]
+KIND_ID = {name: i for i, name in enumerate(KINDS)}
+
+EVENT_DTYPE = np.dtype([
+    ("tick", np.int32),
+    ("kind", np.uint8),
+    ("agent", np.int32),
+    ("x", np.int32),
+    ("y", np.int32),
+    ("value", np.int32),
+])
+
+
+class EventBus:
+    """
+    呼叫端先檢查類別旗標再 emit，例如：
+        if bus.blocked:
+            bus.emit("blocked", agent.id, x, y, agent.blocked_count)
+    """
+
+    def __init__(self, sink=None, kinds=None, batch_size=4096):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.tick = 0  # 由介面每回合更新
+        self.buffer = []
+        self.counts = dict.fromkeys(KINDS, 0)
+        for name in KINDS:
+            setattr(self, name, False)
+        if sink is not None:
+            self.enable(*(kinds if kinds is not None else KINDS))
+
+    def enable(self, *kinds):
+        for name in kinds:
+            if name not in KIND_ID:
+                raise ValueError(f"未知的事件類別: {name}")
+            setattr(self, name, True)
+
+    def disable(self, *kinds):
+        for name in kinds or KINDS:
+            setattr(self, name, False)
+
+    def emit(self, kind, agent, x=-1, y=-1, value=0):
+        self.buffer.append((self.tick, KIND_ID[kind], agent, x, y, value))
+        self.counts[kind] += 1
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def emit_many(self, kind, agents, xs, ys, values=0):
+        """向量化引擎用：一次送出一整批同類事件"""
+        n = len(agents)
+        if n == 0:
+            return
+        self.flush()
+        records = np.empty(n, dtype=EVENT_DTYPE)
+        records["tick"] = self.tick
+        records["kind"] = KIND_ID[kind]
+        records["agent"] = agents
+        records["x"] = xs
+        records["y"] = ys
+        records["value"] = values
+        self.counts[kind] += n
+        if self.sink is not None:
+            self.sink.write(records)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.sink is not None:
+            self.sink.write(np.array(self.buffer, dtype=EVENT_DTYPE))
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        if self.sink is not None:
+            self.sink.close()
+
+
+# 沒指定匯流排時共用的預設值：所有類別關閉、沒有 sink
+DISABLED = EventBus()
+
+
+class BinarySink:
+    """直接附加 EVENT_DTYPE 的原始位元組，用 read_events() 讀回"""
+
+    def __init__(self, path):
+        self.file = open(path, "ab")
+
+    def write(self, records):
+        records.tofile(self.file)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlSink:
+    """每個事件一行 JSON"""
+
+    def __init__(self, path):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, records):
+        lines = []
+        for tick, kind, agent, x, y, value in records.tolist():
+            lines.append(json.dumps({"tick": tick, "kind": KINDS[kind], "agent": agent,
+                                     "x": x, "y": y, "value": value}))
+        self.file.write("\n".join(lines) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class ConsoleSink:
+    """除錯用：印出和舊版 print 相同的訊息"""
+
+    MESSAGES = {
+        "blocked": "[{agent}] 移動到 ({x},{y}) 被擋住（連續 {value} 次）",
+        "stuck": "[{agent}] 被卡 {value} 次，強制切回探索",
+        "replan_failed": "[{agent}] 無法規劃回巢路，繼續探索！",
+        "food_picked": "[{agent}] 在 ({x},{y}) 撿到食物",
+        "food_delivered": "[{agent}] 把食物送回巢",
+        "restarted": "[{agent}] 回巢後重啟探索，從 [{x}, {y}] 出發",
+        "departed": "[排程] 探索蟻 {agent} 被允許出巢",
+        "spawned": "[蟻后] 在 ({x},{y}) 產下 {agent}，族群 {value} 隻",
+        "died": "[{agent}] 在 ({x},{y}) 老死，活了 {value} tick",
+    }
+    GENERIC = "[{agent}] {kind} ({x},{y}) value={value}"  # 沒有專屬訊息的類別
+
+    def write(self, records):
+        for tick, kind, agent, x, y, value in records.tolist():
+            name = KINDS[kind]
+            print(self.MESSAGES.get(name, self.GENERIC).format(
+                kind=name, agent=agent, x=x, y=y, value=value))
+
+    def close(self):
+        pass
+
+
+def read_events(path):
+    """讀回 BinarySink 寫的檔案"""
+    return np.fromfile(path, dtype=EVENT_DTYPE)
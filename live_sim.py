@@ -0,0 +1,381 @@
+"""
+背景執行的模擬 + 雙緩衝快照：模擬在背景 thread（或 process）裡全速、或以目標 tick 速率執行，
+與畫面的幀率無關。畫面要畫時才把需要的狀態複製到兩份緩衝區中沒人在讀的那一份再交換，
+畫面端隨時取最新的一份來畫，雙方都不必等對方。
+
+    live = LiveSim(AntSimInterface, {"seed": 223})        # tps=None：全速
+    live.start()
+    with live.latest() as frame:        # frame 可直接交給 GridRenderer.draw
+        renderer.draw(screen, frame)
+    live.toggle_pause(); live.advance(1); live.advance(1000); live.set_tps(60)
+    live.stop()
+
+backend="thread" 與畫面共用 GIL，畫面合成的時候模擬仍會慢一點；
+backend="process" 另開 process，緩衝區放在 multiprocessing.shared_memory，完全不受畫面影響。
+使用 spawn 啟動方式的平台（Windows / macOS）上，process 版要放在 if __name__ == "__main__": 之下。
+"""
+import multiprocessing as mp
+from multiprocessing import resource_tracker
+import queue
+import threading
+import time
+import traceback
+import types
+
+import numpy as np
+
+from observation import nest_box, state_views
+from shared_arrays import attach, share
+
+
+# stats 陣列的欄位（每份緩衝區一列，float64）
+STATS = ["tick", "food_delivered", "food_remaining", "carrying", "done", "ants",
+         "queen_x", "queen_y", "paused", "pending", "tps", "target_tps", "has_memory",
+         "nest_x", "nest_y", "nest_size"]
+_S = {name: i for i, name in enumerate(STATS)}
+
+# ctrl 陣列：目前給畫面的那一份、畫面是否正在讀、發佈後畫面是否還沒讀過
+FRONT, HELD, FRESH = 0, 1, 2
+
+
+def _buffers(size):
+    """兩份緩衝區（第 0 維是哪一份）"""
+    return {
+        "grid": np.zeros((2, size, size), dtype=np.int8),
+        "ants": np.zeros((2, size, size), dtype=np.int8),
+        "explored": np.zeros((2, size, size), dtype=np.int8),
+        "visited": np.zeros((2, size, size), dtype=bool),
+        "stats": np.zeros((2, len(STATS)), dtype=np.float64),
+        "ctrl": np.zeros(3, dtype=np.int64),
+    }
+
+
+def _counts(sim):
+    """(帶食物的螞蟻數, 完成的螞蟻數, 螞蟻總數)，AntSimInterface 與 VecAntSimInterface 都可以"""
+    if hasattr(sim, "agents"):
+        carrying = sum(1 for a in sim.agents if a.carrying_food)
+        done = len(sim.retired)
+        return carrying, done, len(sim.agents)
+    from env_interface_vec import MODE_DONE
+    return int(sim.carrying.sum()), int(np.count_nonzero(sim.mode == MODE_DONE)), len(sim.pos)
+
+
+class LiveFrame:
+    """
+    一份快照，介面與 GridRenderer / main_visual_stage2.draw_info 要用到的 sim 屬性相同。
+    陣列直接是緩衝區（不複製），只在 LiveSim.latest() 的 with 區塊內有效。
+    """
+
+    def __init__(self, bufs, slot):
+        stats = bufs["stats"][slot]
+        self.grid = bufs["grid"][slot]
+        self.ant_layer = bufs["ants"][slot]
+        self.visit_count = bufs["visited"][slot]
+        self.size = self.grid.shape[0]
+        self.nest_memory = None
+        if stats[_S["has_memory"]]:
+            self.nest_memory = types.SimpleNamespace(explored=bufs["explored"][slot])
+        self.tick = int(stats[_S["tick"]])
+        self.food_delivered = int(stats[_S["food_delivered"]])
+        self.food_remaining = int(stats[_S["food_remaining"]])
+        self.carrying = int(stats[_S["carrying"]])
+        self.done = int(stats[_S["done"]])
+        self.ants = int(stats[_S["ants"]])
+        self.queen_pos = (int(stats[_S["queen_x"]]), int(stats[_S["queen_y"]]))
+        self.nest_box = None  # 見 observation.nest_box
+        if stats[_S["nest_size"]] > 0:
+            self.nest_box = tuple(int(stats[_S[k]]) for k in ("nest_x", "nest_y", "nest_size"))
+        self.paused = bool(stats[_S["paused"]])
+        self.pending = int(stats[_S["pending"]])
+        self.tps = float(stats[_S["tps"]])  # 實際的 tick / 秒
+        target = stats[_S["target_tps"]]
+        self.target_tps = None if target <= 0 else float(target)
+
+    def get_state(self, region=None, out=None):
+        return state_views(self.grid, self.ant_layer, region, out)
+
+
+class _Runner:
+    """在背景 thread / process 裡建立並執行 sim，處理指令、發佈快照"""
+
+    def __init__(self, sim, bufs, lock, commands, replies, tps, max_fps, record, profile):
+        self.sim = sim
+        self.bufs = bufs
+        self.lock = lock
+        self.commands = commands
+        self.replies = replies
+        self.tps = tps
+        self.interval = 1 / max_fps
+        self.paused = False
+        self.pending = 0  # advance() 要求、不受 tps 限制立刻跑的回合數
+        self.running = True
+        self.recorder = None
+        if record:
+            from trajectory import TrajectoryRecorder
+            self.recorder = TrajectoryRecorder(record, sim)
+        self.profile = profile
+        if profile:
+            from profiler import StepProfiler
+            sim.profiler = StepProfiler()
+        self.dirty = True  # 狀態（暫停、速率、單步結束）改變，下次一定要發佈
+        self.measured = 0.0
+        self._last_tick = sim.tick
+        self._last_time = time.perf_counter()
+        self._published = None  # 上次發佈時的 tick
+
+    def _handle(self, cmd):
+        name, value = cmd
+        self.dirty = True
+        if name == "pause":
+            self.paused = (not self.paused) if value is None else value
+        elif name == "advance":
+            self.pending += value
+        elif name == "tps":
+            self.tps = value
+        elif name == "stop":
+            self.running = False
+
+    def _drain(self, timeout=None):
+        """處理佇列中的指令；timeout 給定時最多等這麼久等第一個指令"""
+        try:
+            if timeout is not None:
+                self._handle(self.commands.get(timeout=timeout))
+            while True:
+                self._handle(self.commands.get_nowait())
+        except queue.Empty:
+            pass
+
+    def publish(self):
+        """
+        複製到畫面沒在讀的那一份，畫面沒在讀 front 才交換。
+        畫面還沒讀過上一份、或 tick 沒變時不複製（沒人看就不花成本），除非 dirty。
+        """
+        ctrl = self.bufs["ctrl"]
+        sim = self.sim
+        if not self.dirty and (ctrl[FRESH] or sim.tick == self._published):
+            return
+        back = 1 - int(ctrl[FRONT])
+        b = self.bufs
+        sim.get_state(out=(b["grid"][back], b["ants"][back]))
+        memory = getattr(sim, "nest_memory", None)
+        if memory is not None:
+            np.copyto(b["explored"][back], memory.explored)
+        visits = getattr(sim, "visit_count", None)
+        if visits is not None:
+            np.greater(np.asarray(visits), 0, out=b["visited"][back])
+
+        now = time.perf_counter()
+        if now > self._last_time:
+            self.measured = (sim.tick - self._last_tick) / (now - self._last_time)
+        self._last_tick, self._last_time = sim.tick, now
+        carrying, done, ants = _counts(sim)
+        food = getattr(sim, "food", None)
+        box = nest_box(sim) or (0, 0, 0)
+        stats = b["stats"][back]
+        stats[:] = (sim.tick, sim.food_delivered, food.total if food is not None else 0,
+                    carrying, done, ants, sim.queen_pos[0], sim.queen_pos[1],
+                    self.paused, self.pending, self.measured, self.tps or 0,
+                    memory is not None, *box)
+        with self.lock:
+            if not ctrl[HELD]:
+                ctrl[FRONT] = back
+                ctrl[FRESH] = 1
+                self.dirty = False
+                self._published = sim.tick
+
+    def step(self):
+        self.sim.step()
+        if self.recorder is not None:
+            self.recorder.record()
+
+    def run(self):
+        next_publish = next_tick = time.perf_counter()
+        while self.running:
+            now = time.perf_counter()
+            if now >= next_publish:
+                self._drain()
+                self.publish()
+                next_publish = now + self.interval
+                continue
+            if self.pending > 0:
+                self.step()
+                self.pending -= 1
+                if self.pending == 0:
+                    self.dirty = True
+                continue
+            if self.paused:
+                self._drain(timeout=max(next_publish - now, 0))
+                continue
+            if self.tps:
+                if now < next_tick:
+                    time.sleep(min(next_tick - now, next_publish - now))
+                    continue
+                next_tick = max(next_tick, now - 1 / self.tps) + 1 / self.tps
+            self.step()
+        self.close()
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.profile:
+            self.sim.profiler.export_chrome(self.profile)
+            print(self.sim.profiler.format_summary())
+
+
+def _process_main(factory, kwargs, options, commands, replies, lock):
+    shms = []
+    try:
+        sim = factory(**kwargs)
+        spec = {}
+        bufs = {name: share(arr, name, shms, spec) for name, arr in _buffers(sim.size).items()}
+        replies.put(("ready", spec))
+        _Runner(sim, bufs, lock, commands, replies, **options).run()
+    except Exception:
+        replies.put(("error", traceback.format_exc()))
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+        replies.put(("stopped", None))
+
+
+class LiveSim:
+    """見模組說明"""
+
+    def __init__(self, factory, kwargs=None, backend="thread", tps=None, max_fps=60,
+                 record=None, profile=None):
+        """
+        factory(**kwargs) 建立 sim（例如 AntSimInterface 類別本身）；process 版需可 pickle
+        tps: 目標 tick / 秒，None 為全速
+        max_fps: 最多每秒發佈幾份快照（實際上也不會超過畫面讀取的速度）
+        record / profile: 在背景端錄製軌跡（見 trajectory.py）/ 結束時寫出 Chrome trace（見 profiler.py）
+        """
+        if backend not in ("thread", "process"):
+            raise ValueError(f"未知的 backend: {backend}")
+        self.factory = factory
+        self.kwargs = kwargs or {}
+        self.backend = backend
+        self.options = {"tps": tps, "max_fps": max_fps, "record": record, "profile": profile}
+        self.error = None  # 背景端的例外（traceback 文字）
+        self.bufs = None
+        self._shms = []
+        self._worker = None
+
+    def start(self):
+        if self.backend == "thread":
+            self._lock = threading.Lock()
+            self._commands = queue.Queue()
+            self._replies = queue.Queue()
+            sim = self.factory(**self.kwargs)
+            self.bufs = _buffers(sim.size)
+            runner = _Runner(sim, self.bufs, self._lock, self._commands, self._replies,
+                             **self.options)
+            self._worker = threading.Thread(target=self._thread_main, args=(runner,),
+                                            daemon=True)
+            self._worker.start()
+            return self
+
+        ctx = mp.get_context()
+        # 先啟動 resource tracker，背景 process 建立的共享記憶體與這裡的對應才會記在同一處
+        resource_tracker.ensure_running()
+        self._lock = ctx.Lock()
+        self._commands = ctx.Queue()
+        self._replies = ctx.Queue()
+        self._worker = ctx.Process(target=_process_main,
+                                   args=(self.factory, self.kwargs, self.options,
+                                         self._commands, self._replies, self._lock),
+                                   daemon=True)
+        self._worker.start()
+        kind, value = self._replies.get()
+        if kind == "error":
+            self._worker.join()
+            raise RuntimeError(f"背景 process 建立 sim 失敗：\n{value}")
+        self.bufs, self._shms = attach(value)
+        return self
+
+    def _thread_main(self, runner):
+        try:
+            runner.run()
+        except Exception:
+            self._replies.put(("error", traceback.format_exc()))
+
+    @property
+    def alive(self):
+        return self._worker is not None and self._worker.is_alive()
+
+    def _check(self):
+        try:
+            while True:
+                kind, value = self._replies.get_nowait()
+                if kind == "error":
+                    self.error = value
+        except queue.Empty:
+            pass
+
+    def latest(self):
+        """with live.latest() as frame: ...，區塊內背景端不會覆寫這一份"""
+        return _Reading(self)
+
+    def _acquire(self):
+        ctrl = self.bufs["ctrl"]
+        with self._lock:
+            ctrl[HELD] = 1
+            ctrl[FRESH] = 0
+            slot = int(ctrl[FRONT])
+        return LiveFrame(self.bufs, slot)
+
+    def _release(self):
+        with self._lock:
+            self.bufs["ctrl"][HELD] = 0
+        self._check()
+
+    # ---- 控制（都只是把指令放進佇列，不等背景端） ----
+
+    def pause(self, paused=True):
+        self._commands.put(("pause", paused))
+
+    def resume(self):
+        self._commands.put(("pause", False))
+
+    def toggle_pause(self):
+        self._commands.put(("pause", None))
+
+    def advance(self, ticks=1):
+        """不論是否暫停、目標速率多少，立刻全速再跑 ticks 回合（單步 / 快轉）"""
+        self._commands.put(("advance", int(ticks)))
+
+    def set_tps(self, tps):
+        """目標 tick / 秒，None 為全速"""
+        self._commands.put(("tps", tps))
+
+    def stop(self, timeout=10):
+        """停止背景端（會關閉錄製檔、寫出 profile），之後不能再讀快照"""
+        if self._worker is None:
+            return
+        self._commands.put(("stop", None))
+        self._worker.join(timeout)
+        self._check()
+        self._worker = None
+        if self._shms:
+            # 只關閉對應，unlink 由背景 process 負責
+            self.bufs = None
+            for shm in self._shms:
+                shm.close()
+            self._shms = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _Reading:
+    def __init__(self, live):
+        self.live = live
+
+    def __enter__(self):
+        return self.live._acquire()
+
+    def __exit__(self, *exc):
+        self.live._release()
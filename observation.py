@@ -0,0 +1,126 @@
+"""
+觀測與狀態視圖：
+  - window_cells：一批螞蟻以自己為中心、半徑 radius 的視窗格子（扁平索引），整批一次算
+  - observe_all：所有 AntAgent 一起把視窗內的地圖寫進個人記憶（取代逐隻逐格的 observe）
+  - AntLayer：get_state() 的螞蟻層，常駐一張圖，每次只改螞蟻離開與到達的格子
+  - state_views：get_state() 的回傳值，預設是唯讀 view，也可以寫進呼叫端的緩衝區
+  - nest_box：巢的範圍，畫面、錄製檔與即時快照共用
+
+    grid, ants = sim.get_state()                    # 唯讀 view，不複製
+    sim.get_state(out=(grid_buf, ant_buf))          # 寫進自己的緩衝區
+"""
+import numpy as np
+
+from envs.chunked_grid import ChunkedGrid
+
+
+def nest_box(sim):
+    """
+    巢的範圍 (x, y, 邊長)。模擬從 env 取，錄製檔與即時快照（ReplaySim / LiveFrame）從 nest_box 屬性取；
+    都沒有時回傳 None。地圖上牆與巢都是 1，要分開畫只能靠這個範圍。
+    """
+    env = getattr(sim, "env", None)
+    if env is not None:
+        nx, ny = env.nest_pos
+        return int(nx), int(ny), int(env.nest_size)
+    return getattr(sim, "nest_box", None)
+
+
+def window_cells(xs, ys, radius, size):
+    """
+    (cells, inside)：每隻螞蟻 (2r+1)² 個視窗格子的扁平索引（已裁切到地圖內）與是否在地圖內，
+    形狀都是 (n, (2r+1)²)，順序與逐格 for dx: for dy: 相同
+    """
+    offsets = np.arange(-radius, radius + 1)
+    wx = np.asarray(xs)[:, None, None] + offsets[None, :, None]
+    wy = np.asarray(ys)[:, None, None] + offsets[None, None, :]
+    inside = (wx >= 0) & (wx < size) & (wy >= 0) & (wy < size)
+    cells = np.clip(wx, 0, size - 1) * size + np.clip(wy, 0, size - 1)
+    n = len(cells)
+    return cells.reshape(n, -1), inside.reshape(n, -1)
+
+
+def observe_all(agents, grid, radius=1):
+    """
+    等同對每隻螞蟻呼叫 agent.observe(grid)，但視窗的讀取與比對整批做完，
+    每隻只剩把有差異的格子寫進 LayeredMemory 的 dict。
+    螞蟻共用同一個記憶基底（NestMemory.base）時基底也只讀一次。
+    """
+    if not agents:
+        return
+    pos = np.array([a.pos for a in agents], dtype=np.int64).reshape(-1, 2)
+    size = agents[0].size
+    cells, inside = window_cells(pos[:, 0], pos[:, 1], radius, size)
+    values = np.asarray(grid).ravel()[cells]
+    base = agents[0].memory.base
+    if not all(a.memory.base is base for a in agents):
+        for agent, (x, y) in zip(agents, pos.tolist()):
+            x0, y0 = max(x - radius, 0), max(y - radius, 0)
+            agent.memory.write_window(x0, y0, grid[x0:x + radius + 1, y0:y + radius + 1])
+        return
+
+    # 1：與基底不同，要記；2：與基底相同，之前記過的要拿掉；0：在地圖外
+    action = np.where(values != base.ravel()[cells], 1, 2) * inside
+    rows = zip(agents, cells.tolist(), values.tolist(), action.tolist())
+    for agent, cs, vs, acts in rows:
+        delta = agent.memory.delta
+        for c, v, act in zip(cs, vs, acts):
+            if act == 1:
+                delta[c] = v
+            elif act == 2 and delta:
+                delta.pop(c, None)
+
+
+class AntLayer:
+    """
+    get_state() 的螞蟻層（0：沒有螞蟻、3：帶食物、4：沒帶食物）。
+    常駐一張圖，update() 只清掉上次畫的格子再畫這次的，成本與螞蟻數成正比、與地圖大小無關，
+    沒人讀取時不花任何成本。同一格有多隻螞蟻（巢內）時，只要有一隻帶食物就是 3。
+    """
+
+    def __init__(self, size, chunk=None):
+        self.size = size
+        if chunk:
+            self.layer = ChunkedGrid(size, chunk, np.int8)
+            self._flat = self.layer.flat
+        else:
+            self.layer = np.zeros((size, size), dtype=np.int8)
+            self._flat = self.layer.reshape(-1)
+        self.cells = np.zeros(0, dtype=np.int64)  # 上次畫上去的格子
+
+    def update(self, cells, carrying):
+        """cells: 每隻螞蟻目前的扁平格子（不顯示的為 -1）；carrying: 是否帶著食物"""
+        flat = self._flat
+        flat[self.cells] = 0
+        shown = cells >= 0
+        drawn = cells[shown]
+        flat[drawn] = 4
+        flat[drawn[carrying[shown]]] = 3
+        self.cells = drawn
+
+
+def read_only(arr):
+    """不可寫的 view（不複製）"""
+    view = arr.view()
+    view.flags.writeable = False
+    return view
+
+
+def state_views(grid, layer, region=None, out=None):
+    """
+    get_state() 的共用實作。region: (x0, y0, w, h)（世界座標），省略為整張地圖。
+    預設回傳唯讀 view：不複製，但內容會隨下一次 step() 改變，要保留請自行複製。
+    out=(grid_buf, ant_buf) 時寫進呼叫端的緩衝區（形狀需與視窗相同）並回傳它們。
+    分塊地圖（ChunkedGrid）取視窗本來就會組出新陣列，回傳的是複本。
+    """
+    if region is None and not isinstance(grid, ChunkedGrid):
+        g, a = grid, layer
+    else:
+        x0, y0, w, h = region if region is not None else (0, 0, grid.size, grid.size)
+        g = grid[x0:x0 + w, y0:y0 + h]
+        a = layer[x0:x0 + w, y0:y0 + h]
+    if out is not None:
+        np.copyto(out[0], g, casting="unsafe")
+        np.copyto(out[1], a, casting="unsafe")
+        return out
+    return read_only(np.asarray(g)), read_only(np.asarray(a))
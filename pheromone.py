@@ -0,0 +1,221 @@
+"""
+費洛蒙場：每個頻道一張 float32 地圖（預設 "food" 往食物、"nest" 往巢）。
+螞蟻每回合在腳下留下氣味、決定方向時往氣味較濃的鄰格走；
+每 interval 回合整張做一次蒸發 + 擴散（8 鄰格模板），一次補足這幾回合的量，
+只計算有氣味的區塊（tile）與其外圍一圈，大地圖上只有螞蟻走過的一小部分需要更新。
+
+    field = PheromoneField(150)
+    field.deposit("food", xs, ys, 1.0)
+    field.update(sim.tick)
+    field.values("food", xs, ys)
+"""
+import itertools
+
+import numpy as np
+
+
+class PheromoneField:
+
+    def __init__(self, size, channels=("food", "nest"), evaporation=0.01, diffusion=0.02,
+                 tile=32, eps=1e-4, interval=4):
+        """
+        evaporation: 每回合蒸發掉的比例
+        diffusion: 每回合平均分給 8 個鄰格的比例
+        eps: 低於此值的氣味直接歸零，區塊全為零時不再更新
+        interval: 每幾回合更新一次；蒸發照回合數複利補足，擴散以同樣的比例合成一次
+                  （氣味一次只往外擴散一格）。1 就是每回合更新
+        """
+        self.size = size
+        self.channels = list(channels)
+        self.channel = {name: i for i, name in enumerate(self.channels)}
+        self.evaporation = evaporation
+        self.diffusion = diffusion
+        self.tile = tile
+        self.eps = eps
+        self.interval = interval
+        self.tiles = -(-size // tile)
+        span = self.tiles * tile
+        # 四周多一圈 0 當邊界，模板不必特別處理地圖邊緣（氣味會從邊緣散出去）
+        self.data = np.zeros((len(self.channels), span + 2, span + 2), dtype=np.float32)
+        self.active = np.zeros((self.tiles, self.tiles), dtype=bool)
+        self.updated_tiles = 0  # 上一次 update() 計算的區塊數
+        # 每個 rows 上一次的 (有氣味區塊的位元組, 計算範圍)：區塊沒變時不必重新找範圍
+        self.span_cache = {}
+
+    def field(self, channel):
+        """頻道的 (size, size) view"""
+        return self.data[self.channel[channel], 1:self.size + 1, 1:self.size + 1]
+
+    def deposit(self, channel, xs, ys, amount):
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        if xs.size == 0:
+            return
+        np.add.at(self.data[self.channel[channel]], (xs + 1, ys + 1), amount)
+        self.active[xs // self.tile, ys // self.tile] = True
+
+    def values(self, channel, xs, ys):
+        """xs / ys 可以超出地圖一格（得到 0），鄰格取樣不需要先裁切"""
+        return self.data[self.channel[channel], np.asarray(xs) + 1, np.asarray(ys) + 1]
+
+    def _near_active(self, tx0, tx1):
+        """第 tx0:tx1 列中有氣味或緊鄰有氣味的區塊（氣味每回合最多擴散一格，往外一圈就夠了）"""
+        lo, hi = max(tx0 - 1, 0), min(tx1 + 1, self.tiles)
+        pad = np.zeros((tx1 - tx0 + 2, self.tiles + 2), dtype=bool)
+        pad[lo - tx0 + 1:hi - tx0 + 1, 1:-1] = self.active[lo:hi]
+        near = pad[:-2] | pad[1:-1]
+        near |= pad[2:]
+        out = near[:, :-2] | near[:, 1:-1]
+        out |= near[:, 2:]
+        return out
+
+    def _spans(self, act):
+        """
+        要計算的區塊範圍 [(tx0, tx1, ty0, ty1)]：大部分區塊都有氣味時整張一次算，
+        否則每列取連續的區塊，相鄰幾列範圍相同時合成一個矩形（少呼叫幾次模板）
+        """
+        if not act.any():
+            return []
+        if act.mean() > 0.5:
+            return [(0, len(act), 0, self.tiles)]
+        edges = np.diff(np.pad(act, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+        runs = [tuple(zip(np.flatnonzero(e == 1).tolist(), np.flatnonzero(e == -1).tolist()))
+                for e in edges]
+        spans = []
+        tx = 0
+        for row, group in itertools.groupby(runs):
+            n = len(list(group))
+            spans += [(tx, tx + n, ty0, ty1) for ty0, ty1 in row]
+            tx += n
+        return spans
+
+    def _stencil(self, x0, x1, y0, y1):
+        """格子 [x0:x1, y0:y1] 的下一回合數值（讀舊值，不寫回）"""
+        d = self.data[:, x0:x1 + 2, y0:y1 + 2]
+        # 3×3 方框和拆成兩次一維加總，再扣掉中心就是 8 鄰格和
+        rows = d[:, :-2] + d[:, 1:-1]
+        rows += d[:, 2:]
+        out = rows[:, :, :-2] + rows[:, :, 1:-1]
+        out += rows[:, :, 2:]
+        keep = (1.0 - self.evaporation) ** self.interval
+        diffusion = 1.0 - (1.0 - self.diffusion) ** self.interval
+        share = keep * diffusion / 8
+        out *= np.float32(share)
+        out += d[:, 1:-1, 1:-1] * np.float32(keep * (1.0 - diffusion) - share)
+        out *= out >= self.eps
+        return out
+
+    def due(self, tick):
+        """這回合要不要更新（tick 是 sim.tick；多 process 時每個 worker 各自判斷，結果相同）"""
+        return tick % self.interval == 0
+
+    def update(self, tick=None):
+        """蒸發 + 擴散 interval 回合；給 tick 時只在 due(tick) 的回合更新"""
+        if tick is None or self.due(tick):
+            self.commit(self.compute())
+
+    def compute(self, rows=None):
+        """
+        只計算第 rows = (tx0, tx1) 列區塊的下一回合數值，不寫回（預設整張）。
+        多個 process 各自 compute 自己的區塊列、全部算完後再各自 commit，
+        結果與單一 process 的 update() 完全相同（見 domains.py）。
+        """
+        tx0, tx1 = rows if rows is not None else (0, self.tiles)
+        # 有氣味的區塊通常好幾回合都不變，範圍沿用上一次的
+        key = self.active[max(tx0 - 1, 0):tx1 + 1].tobytes()
+        cached = self.span_cache.get((tx0, tx1))
+        if cached is None or cached[0] != key:
+            spans = [(a + tx0, b + tx0, c, d)
+                     for a, b, c, d in self._spans(self._near_active(tx0, tx1))]
+            cached = self.span_cache[(tx0, tx1)] = (key, spans)
+        spans = cached[1]
+
+        t = self.tile
+        # 先全部算完再寫回，相鄰範圍讀到的外圍都是舊值
+        results = [(span, self._stencil(span[0] * t, span[1] * t, span[2] * t, span[3] * t))
+                   for span in spans]
+        return (tx0, tx1), results
+
+    def commit(self, computed):
+        """寫回 compute() 的結果並重新標記有氣味的區塊"""
+        (rx0, rx1), results = computed
+        t = self.tile
+        self.active[rx0:rx1] = False
+        self.updated_tiles = 0
+        for (tx0, tx1, ty0, ty1), out in results:
+            self.data[:, tx0 * t + 1:tx1 * t + 1, ty0 * t + 1:ty1 * t + 1] = out
+            # 每個區塊的最大值：先沿頻道、再沿 x、最後沿 y（都是連續的軸，比一次多軸快）
+            peak = out.max(axis=0).reshape(tx1 - tx0, t, -1).max(axis=1)
+            self.active[tx0:tx1, ty0:ty1] = peak.reshape(tx1 - tx0, ty1 - ty0, t).max(axis=2) > 0
+            self.updated_tiles += (tx1 - tx0) * (ty1 - ty0)
+        if not results:
+            return
+        # 地圖外（補齊區塊大小的部分）不留氣味
+        lo, hi = rx0 * t + 1, rx1 * t + 1
+        self.data[:, max(lo, self.size + 1):hi, :] = 0
+        self.data[:, lo:hi, self.size + 1:] = 0
+
+    def total(self, channel):
+        return float(self.field(channel).sum(dtype=np.float64))
+
+    def clear(self):
+        self.data[:] = 0
+        self.active[:] = False
+
+
+def lay_trails(field, pos, carrying, age, strength=1.0, decay=0.95):
+    """
+    帶著食物的螞蟻留 "food"、其餘留 "nest"。
+    age 是離開來源（撿到食物 / 離巢）後走的步數，越遠留得越淡，
+    兩種氣味都是往來源的方向越來越濃。
+    """
+    amount = (strength * decay ** age).astype(np.float32)
+    field.deposit("food", pos[carrying, 0], pos[carrying, 1], amount[carrying])
+    field.deposit("nest", pos[~carrying, 0], pos[~carrying, 1], amount[~carrying])
+
+
+def trail_bias(field, pos, carrying, offsets, grid=None, follow=None, nest=None, weight=2.0,
+               source_weight=None):
+    """
+    (N, 8) 的方向偏好，從 direction_keys 減掉後取最小：
+    沒帶食物的螞蟻往 "food" 較濃處走、帶著食物的往 "nest"。
+    只有比腳下更濃的鄰格才算（走到頂就恢復隨機探索），最濃的那一格得到 weight。
+    給 grid / nest 時，追氣味的螞蟻旁邊的來源格得到 source_weight（來源本身的氣味最濃）：
+    grid 的食物格（2）吸引沒帶食物的、nest（(size, size) bool 遮罩）的巢格吸引帶著食物的。
+    grid 的 1 也可能是牆，所以巢格一定要另外給。
+    呼叫端的 key 是 [0, 1) 的亂數、已知格再加 1，所以 source_weight 至少要比 weight 大 2，
+    來源格才一定贏過未知的上坡格；省略時就取 weight + 2。
+    follow: bool 陣列，False 的螞蟻這回合不追氣味（例如上回合被擋住，
+            否則兩隻在同一條路徑上迎面相遇的螞蟻會互相卡死）。
+    """
+    n = len(pos)
+    bias = np.zeros((n, len(offsets)), dtype=np.float64)
+    if n == 0:
+        return bias
+    tx = pos[:, None, 0] + offsets[None, :, 0]
+    ty = pos[:, None, 1] + offsets[None, :, 1]
+    if follow is None:
+        follow = np.ones(n, dtype=bool)
+    for channel, who in (("food", ~carrying), ("nest", carrying)):
+        idx = np.flatnonzero(who & follow)
+        if len(idx) == 0:
+            continue
+        near = field.values(channel, tx[idx], ty[idx])
+        here = field.values(channel, pos[idx, 0], pos[idx, 1])
+        best = near.max(axis=1)
+        uphill = (near == best[:, None]) & (best > here)[:, None]
+        bias[idx] = np.where(uphill, weight, 0.0)
+    if grid is None and nest is None:
+        return bias
+    if source_weight is None:
+        source_weight = weight + 2.0
+    size = field.size
+    cx, cy = np.clip(tx, 0, size - 1), np.clip(ty, 0, size - 1)
+    inside = (tx >= 0) & (tx < size) & (ty >= 0) & (ty < size)
+    source = np.zeros_like(inside)
+    if grid is not None:
+        source |= ~carrying[:, None] & (grid[cx, cy] == 2)
+    if nest is not None:
+        source |= carrying[:, None] & nest[cx, cy]
+    bias[source & inside & follow[:, None]] = source_weight
+    return bias
@@ -0,0 +1,168 @@
+"""
+step() 分階段計時：每回合每個階段（observe / decide / resolve / move ...）一筆耗時，
+回巢規劃、食物拾取、巢記憶合併等子區段每次呼叫一筆，可以輸出摘要表與 Chrome trace。
+沒開啟時介面每個階段只做一次屬性判斷（與 event_bus 相同的做法）。
+
+    prof = StepProfiler()
+    sim = AntSimInterface(seed=1, profiler=prof)
+    ...
+    print(prof.format_summary())
+    prof.export_chrome("trace.json")   # chrome://tracing 或 ui.perfetto.dev 開啟
+"""
+import json
+import time
+
+import numpy as np
+
+
+class StepProfiler:
+    """
+    介面端的用法：
+        prof = self.profiler
+        if prof.enabled:
+            prof.begin_tick(self.tick)
+            prof.phase("observe")   # 結束上一個階段、開始這一個
+        ...
+        if prof.enabled:
+            prof.end_tick()
+    子區段：start = prof.now()，做完後 prof.span("plan", start)
+    """
+
+    now = staticmethod(time.perf_counter_ns)
+
+    def __init__(self, enabled=True, trace=True, max_spans=2_000_000):
+        """
+        trace: 是否保留每一段的起訖（export_chrome 用）；只要摘要時可關掉省記憶體
+        max_spans: 保留的段數上限，超過後只再累計耗時（dropped 記錄丟掉幾段）
+        """
+        self.enabled = enabled
+        self.trace = trace
+        self.max_spans = max_spans
+        self.durations = {}  # 名稱 -> 每段耗時（ns）的 list
+        self.spans = []  # (名稱, tick, 開始 ns, 耗時 ns)
+        self.phases = {"step"}  # 階段名稱（每回合一筆），其餘是子區段
+        self.dropped = 0
+        self.origin = self.now()
+        self.tick = 0
+        self._phase = None
+        self._start = 0
+        self._tick_start = 0
+
+    def begin_tick(self, tick):
+        self.tick = tick
+        self._phase = None
+        self._tick_start = self._start = self.now()
+
+    def phase(self, name):
+        """結束目前的階段並開始 name"""
+        now = self.now()
+        if self._phase is not None:
+            self._record(self._phase, self._start, now)
+        self.phases.add(name)
+        self._phase = name
+        self._start = now
+
+    def end_tick(self):
+        now = self.now()
+        if self._phase is not None:
+            self._record(self._phase, self._start, now)
+        self._phase = None
+        self._record("step", self._tick_start, now)
+
+    def span(self, name, start):
+        """子區段：start 為 now() 的回傳值，結束時間取現在"""
+        self._record(name, start, self.now())
+
+    def _record(self, name, start, end):
+        d = self.durations.get(name)
+        if d is None:
+            d = self.durations[name] = []
+        d.append(end - start)
+        if self.trace:
+            if len(self.spans) < self.max_spans:
+                self.spans.append((name, self.tick, start, end - start))
+            else:
+                self.dropped += 1
+
+    def merge(self, other):
+        """併入另一個 profiler 的耗時（例如批次執行各個 process 的結果），不含 trace"""
+        for name, d in other.durations.items():
+            self.durations.setdefault(name, []).extend(d)
+        self.phases |= other.phases
+
+    def reset(self):
+        self.durations = {}
+        self.spans = []
+        self.dropped = 0
+
+    # ---- 輸出 ----
+
+    def summary(self):
+        """
+        每個名稱一列 dict：calls、per_tick（每回合幾次）、total_ms、share（佔 step 總時間）、
+        mean_us / p50_us / p95_us / p99_us / max_us。依 total_ms 由大到小。
+        """
+        step = self.durations.get("step", [])
+        ticks = max(len(step), 1)
+        step_total = max(sum(step), 1)
+        rows = []
+        for name, d in self.durations.items():
+            arr = np.array(d, dtype=np.float64) / 1e3
+            p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+            rows.append({
+                "name": name,
+                "calls": len(arr),
+                "per_tick": len(arr) / ticks,
+                "total_ms": arr.sum() / 1e3,
+                "share": arr.sum() * 1e3 / step_total,
+                "mean_us": arr.mean(),
+                "p50_us": p50,
+                "p95_us": p95,
+                "p99_us": p99,
+                "max_us": arr.max(),
+            })
+        rows.sort(key=lambda r: -r["total_ms"])
+        return rows
+
+    def format_summary(self):
+        lines = [f"{'name':12s} {'calls':>8s} {'/tick':>7s} {'total ms':>10s} {'share':>6s}"
+                 f" {'mean us':>9s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'max':>9s}"]
+        for r in self.summary():
+            lines.append(f"{r['name']:12s} {r['calls']:8d} {r['per_tick']:7.2f}"
+                         f" {r['total_ms']:10.1f} {r['share']:6.1%} {r['mean_us']:9.1f}"
+                         f" {r['p50_us']:9.1f} {r['p95_us']:9.1f} {r['p99_us']:9.1f}"
+                         f" {r['max_us']:9.1f}")
+        return "\n".join(lines)
+
+    def export_chrome(self, path, name="AntWorldSim"):
+        """
+        寫成 Chrome trace 的 JSON（Perfetto 也能直接開）：每一段一個 "X" 事件，
+        子區段依時間包含關係疊在所屬階段下方；每回合另有一個子區段呼叫次數的 counter。
+        """
+        events = [{"name": "process_name", "ph": "M", "pid": 0, "tid": 0,
+                   "args": {"name": name}}]
+        calls = {}  # tick -> {子區段: 次數}
+        starts = {}  # tick -> step 的開始時間
+        for span_name, tick, start, dur in self.spans:
+            events.append({"name": span_name, "ph": "X", "pid": 0, "tid": 0,
+                           "ts": (start - self.origin) / 1e3, "dur": dur / 1e3,
+                           "args": {"tick": tick}})
+            if span_name == "step":
+                starts[tick] = start
+        for span_name, tick, _, _ in self.spans:
+            if span_name not in self.phases:
+                counts = calls.setdefault(tick, {})
+                counts[span_name] = counts.get(span_name, 0) + 1
+        sub = sorted({n for c in calls.values() for n in c})
+        for tick, start in starts.items():
+            counts = calls.get(tick, {})
+            events.append({"name": "calls", "ph": "C", "pid": 0,
+                           "ts": (start - self.origin) / 1e3,
+                           "args": {n: counts.get(n, 0) for n in sub}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"dropped_spans": self.dropped}}, f)
+
+
+# 沒指定 profiler 時共用的預設值：關閉
+NO_PROFILER = StepProfiler(enabled=False, trace=False)
@@ -0,0 +1,68 @@
+"""
+回合排程用的計時輪：把事件排在未來某個 tick，每回合只取出當下那一格到期的事件，
+成本與到期的事件數成正比，與排了多少事件、多少螞蟻無關。
+一圈 slots 回合以外的事件先放在溢出 heap，進入這一圈時才搬進格子，
+所以每一格裡只會有同一個 tick 的事件。
+
+    wheel = TimerWheel()
+    wheel.schedule(sim.tick + 5, DEPART)
+    for item, tag in wheel.pop(sim.tick):
+        ...
+
+AntSimInterface 用它排探索蟻的出發時段、staggered 模式下等待中的螞蟻何時醒來，
+以及開啟 colony 時每隻螞蟻的死亡時間。
+"""
+
+import heapq
+
+DEPART = -1  # 出發時段；非負的項目是要醒來的螞蟻 id，小於 DEPART 的是 death_item(id)
+
+
+def death_item(agent_id):
+    """螞蟻 agent_id 壽命到了（還原 id：DEPART - 1 - item）"""
+    return DEPART - 1 - agent_id
+
+
+class TimerWheel:
+    def __init__(self, slots=64, now=0):
+        """slots: 輪的格數；now: 目前的 tick（還原快照時給 sim.tick）"""
+        self.slots = slots
+        self.now = now
+        self.buckets = [[] for _ in range(slots)]
+        # 溢出 heap：(tick, 排入序號, item, tag)；序號讓同一 tick 維持排入順序
+        self.overflow = []
+        self.seq = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def schedule(self, tick, item, tag=0):
+        """tag: 到期時原樣傳回，例如螞蟻 id 所在池位的世代（見 AgentPool.generation）"""
+        if tick - self.now < self.slots:
+            self.buckets[tick % self.slots].append((tick, item, tag))
+        else:
+            heapq.heappush(self.overflow, (tick, self.seq, item, tag))
+            self.seq += 1
+        self.count += 1
+
+    def pop(self, tick):
+        """取出排在 tick 的 (item, tag)（依排入順序）；每個 tick 都要呼叫一次，不能跳過"""
+        self.now = tick
+        # 進入這一圈的溢出事件搬進格子；它們比直接排進同一格的事件早排入，排在前面
+        overflow = self.overflow
+        while overflow and overflow[0][0] < tick + self.slots:
+            t, _, item, tag = heapq.heappop(overflow)
+            self.buckets[t % self.slots].append((t, item, tag))
+        bucket = self.buckets[tick % self.slots]
+        if not bucket:
+            return []
+        self.buckets[tick % self.slots] = []
+        self.count -= len(bucket)
+        return [(item, tag) for _, item, tag in bucket]
+
+    def items(self):
+        """所有還沒到期的 (tick, item, tag)，依 tick 排序（供快照）"""
+        pending = [e for bucket in self.buckets for e in bucket]
+        pending += [(t, item, tag) for t, _, item, tag in sorted(self.overflow)]
+        return sorted(pending, key=lambda e: e[0])
@@ -0,0 +1,263 @@
+"""
+模擬熱點的基準測試：固定 seed、可調地圖大小與螞蟻數，
+量測 ticks/sec、單次呼叫時間與峰值記憶體，結果存成 JSON 以便與基準比較。
+
+    python -m scripts.benchmark                               # 全部組合
+    python -m scripts.benchmark --sizes 150 --agents 16 --out bench_results/base.json
+    python -m scripts.benchmark --compare bench_results/base.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+
+SIZES = [150, 500, 2000]
+AGENT_COUNTS = [16, 1000, 10000]
+SEED = 223
+MIN_TIME = 0.5  # 每個項目至少量測的秒數
+MAX_REPS = 1000
+
+
+@contextlib.contextmanager
+def _quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _time_calls(fn, min_time=MIN_TIME, max_reps=MAX_REPS):
+    """重複呼叫 fn 直到累積 min_time 秒，回傳 (平均秒數, 次數)"""
+    reps = 0
+    total = 0.0
+    while reps < max_reps and (reps == 0 or total < min_time):
+        t = time.perf_counter()
+        fn()
+        total += time.perf_counter() - t
+        reps += 1
+    return total / reps, reps
+
+
+def _peak_mb(fn):
+    tracemalloc.start()
+    try:
+        with _quiet():
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def _make_sim(interface, size, agents):
+    if interface == "vec":
+        from env_interface_vec import VecAntSimInterface
+        return VecAntSimInterface(size=size, seed=SEED, num_agents=agents)
+    from env_interface_2 import AntSimInterface
+    return AntSimInterface(size=size, seed=SEED)
+
+
+def _make_agents(size, agents):
+    """在地圖上隨機擺 agents 隻 AntAgent，共用同一個 NestMemory"""
+    from antagent.AntAgent import AntAgent
+
+    sim = _make_sim("v2", size, 16)
+    rng = np.random.default_rng(SEED)
+    pos = rng.integers(0, size, (agents, 2))
+    ants = [AntAgent(i, [int(x), int(y)], memory_base=sim.nest_memory.base,
+                     planner=sim.planner, flow_field=sim.nest_memory.flow_field,
+                     rng=sim.rng)
+            for i, (x, y) in enumerate(pos)]
+    return sim, ants
+
+
+def bench_step(interface, size, agents, ticks):
+    if interface == "v2" and agents != 16:
+        return None  # 舊版介面的巢只放得下 16 隻
+
+    sim = _make_sim(interface, size, agents)
+    t = time.perf_counter()
+    with _quiet():
+        for _ in range(ticks):
+            sim.step()
+    dt = time.perf_counter() - t
+    return {
+        "ticks_per_sec": ticks / dt,
+        "sec_per_call": dt / ticks,
+        "calls": ticks,
+        "peak_mem_mb": _peak_mb(lambda: _make_sim(interface, size, agents).step()),
+    }
+
+
+def bench_get_state(interface, size, agents):
+    if interface == "v2" and agents != 16:
+        return None
+    sim = _make_sim(interface, size, agents)
+    per_call, reps = _time_calls(sim.get_state)
+    return {"sec_per_call": per_call, "calls": reps,
+            "peak_mem_mb": _peak_mb(sim.get_state)}
+
+
+def bench_agent_calls(size, agents):
+    """AntAgent.observe / observe_all / decide_move / plan_return_path 與 NestMemory.update_from_agent"""
+    from observation import observe_all
+
+    sim, ants = _make_agents(size, agents)
+    grid = sim.grid
+    results = {}
+
+    def observe():
+        for a in ants:
+            a.observe(grid)
+
+    def decide():
+        for a in ants:
+            a.decide_move()
+
+    per_call, reps = _time_calls(observe)
+    results["AntAgent.observe"] = {"sec_per_call": per_call / agents, "calls": reps * agents}
+    per_call, reps = _time_calls(lambda: observe_all(ants, grid))
+    results["observe_all (per ant)"] = {"sec_per_call": per_call / agents, "calls": reps * agents}
+    per_call, reps = _time_calls(decide)
+    results["AntAgent.decide_move"] = {"sec_per_call": per_call / agents, "calls": reps * agents}
+
+    # 規劃一次就可能很慢，只取少數幾隻
+    sample = ants[:5]
+    it = iter(sample * MAX_REPS)
+    per_call, reps = _time_calls(
+        lambda: next(it).plan_return_path(sim.nest_coords), max_reps=len(sample))
+    results["AntAgent.plan_return_path"] = {"sec_per_call": per_call, "calls": reps}
+
+    it = iter(ants)
+
+    def merge():
+        a = next(it)
+        a.observe(grid)
+        sim.nest_memory.update_from_agent(a)
+
+    per_call, reps = _time_calls(merge, max_reps=agents)
+    results["NestMemory.update_from_agent"] = {"sec_per_call": per_call, "calls": reps}
+    return results
+
+
+def bench_draw(size):
+    """stage 2 的 draw()，用 SDL dummy 視訊驅動，不開視窗；每幀之間走一步（不計時）"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    with _quiet():
+        import scripts.main_visual_stage2 as stage2
+        from scripts.grid_renderer import GridRenderer
+        stage2.open_window()
+        stage2.sim = _make_sim("v2", size, 16)
+        stage2.MAP_SIZE = size
+        stage2.renderer = GridRenderer(size, stage2.WINDOW_SIZE, stage2.PALETTE)
+        stage2.draw()  # 第一幀全畫
+
+    total = 0.0
+    frames = 0
+    with _quiet():
+        while frames < 50 and (frames == 0 or total < MIN_TIME):
+            stage2.sim.step()
+            t = time.perf_counter()
+            stage2.draw()
+            total += time.perf_counter() - t
+            frames += 1
+    per_call = total / frames
+    return {"sec_per_call": per_call, "calls": frames, "fps": 1.0 / per_call}
+
+
+def run_suite(sizes, agent_counts, ticks, interfaces, draw=True):
+    results = []
+
+    def record(name, size, agents, data):
+        if data is None:
+            return
+        row = {"name": name, "size": size, "agents": agents}
+        row.update(data)
+        results.append(row)
+        extra = f"  {data['ticks_per_sec']:10.1f} ticks/s" if "ticks_per_sec" in data else ""
+        mem = f"  {data['peak_mem_mb']:8.1f} MB" if "peak_mem_mb" in data else ""
+        print(f"{name:32s} size={size:<5d} agents={agents:<6d}"
+              f"{data['sec_per_call'] * 1e3:10.3f} ms/call{extra}{mem}")
+
+    for size in sizes:
+        for agents in agent_counts:
+            for iface in interfaces:
+                record(f"step[{iface}]", size, agents,
+                       bench_step(iface, size, agents, ticks))
+                record(f"get_state[{iface}]", size, agents,
+                       bench_get_state(iface, size, agents))
+            for name, data in bench_agent_calls(size, agents).items():
+                record(name, size, agents, data)
+        if draw:
+            record("stage2.draw", size, 16, bench_draw(size))
+    return results
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(path, results):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    data = {
+        "meta": {
+            "git": _git_rev(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "seed": SEED,
+        },
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def compare(results, baseline_path):
+    """與基準檔比較每項的單次呼叫時間，>1 代表變慢"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    base = {(r["name"], r["size"], r["agents"]): r for r in baseline}
+    print(f"\n與 {baseline_path} 比較（新 / 舊）：")
+    for r in results:
+        old = base.get((r["name"], r["size"], r["agents"]))
+        if old is None:
+            continue
+        ratio = r["sec_per_call"] / old["sec_per_call"]
+        flag = "  <-- 變慢" if ratio > 1.1 else ("  <-- 變快" if ratio < 0.9 else "")
+        print(f"{r['name']:32s} size={r['size']:<5d} agents={r['agents']:<6d} {ratio:6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AntWorldSim 基準測試")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--agents", type=int, nargs="+", default=AGENT_COUNTS)
+    parser.add_argument("--interfaces", nargs="+", default=["v2", "vec"],
+                        choices=["v2", "vec"])
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--no-draw", action="store_true")
+    parser.add_argument("--out", default="bench_results/latest.json")
+    parser.add_argument("--compare", default=None, help="基準結果 JSON")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.agents, args.ticks,
+                        args.interfaces, draw=not args.no_draw)
+    save(args.out, results)
+    print(f"\n結果已存到 {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
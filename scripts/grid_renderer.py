@@ -0,0 +1,139 @@
+import numpy as np
+import pygame
+
+from observation import nest_box
+
+
+# 索引影像裡每格的圖層編號（數字越大越上層）
+BG = 0
+MEMORY = 1
+VISITED = 2
+NEST = 3
+FOOD = 4
+ANT = 5
+CARRYING = 6
+QUEEN = 7
+WALL = 8  # 程序化地圖的牆（envs/scenario.py），地圖上與巢同為 1
+
+
+class GridRenderer:
+    """
+    以陣列組出整張地圖：背景 / 巢記憶 / 足跡 / 牆 / 巢 / 食物 / 螞蟻 / 蟻后
+    先合成一張 uint8 索引影像，再以 8-bit 調色盤 Surface 一次 blit，
+    只重畫跟上一幀不同的 tile，回傳需要 display.update 的矩形。
+    """
+
+    def __init__(self, size, window_size, colors, tile=32, origin=(0, 0), view=None):
+        """
+        colors: 依圖層編號排列的 RGB 列表（BG, MEMORY, VISITED, NEST, FOOD, ANT, CARRYING, QUEEN, WALL），
+                少了 WALL 時牆與巢同色
+        window_size: 地圖在畫面上的邊長（像素），可以不是 size 的整數倍
+        view: (x, y) 世界座標；給定時只畫從這裡開始的 size×size 視窗（大地圖用），
+              預設 None 表示整張地圖就是 size×size
+        """
+        self.size = size
+        self.window_size = window_size
+        self.tile = tile
+        self.origin = origin
+        self.view = view
+
+        self.surface = pygame.Surface((size, size), depth=8)
+        colors = list(colors)
+        if len(colors) <= WALL:
+            colors.append(colors[NEST])
+        self.surface.set_palette(colors)
+        self.image = np.zeros((size, size), dtype=np.uint8)
+        self.prev = None  # 上一幀的索引影像，None 代表要全畫
+
+        # 每個 tile 邊界在畫面上的像素位置
+        edges = np.arange(0, size + tile, tile).clip(max=size)
+        self.pixel_edges = ((edges * window_size) // size).tolist()
+        self.cell_edges = edges.tolist()
+
+    def _window(self, sim):
+        """目前視窗左上角的世界座標（夾在地圖內）"""
+        if self.view is None:
+            return 0, 0
+        limit = max(sim.size - self.size, 0)
+        vx, vy = self.view
+        return min(max(vx, 0), limit), min(max(vy, 0), limit)
+
+    def pan(self, dx, dy):
+        """移動視窗（世界座標格數）"""
+        vx, vy = self.view if self.view is not None else (0, 0)
+        self.view = (vx + dx, vy + dy)
+
+    def compose(self, sim):
+        x0, y0 = self._window(sim)
+        n = self.size
+        if self.view is None:
+            grid, ant_layer = sim.get_state()
+        else:
+            grid, ant_layer = sim.get_state(region=(x0, y0, n, n))
+        img = self.image
+        img[:] = BG
+
+        nest_memory = getattr(sim, "nest_memory", None)
+        if nest_memory is not None:
+            img[nest_memory.explored[x0:x0 + n, y0:y0 + n] == 1] = MEMORY
+        visit_count = getattr(sim, "visit_count", None)
+        if visit_count is not None:
+            img[visit_count[x0:x0 + n, y0:y0 + n] > 0] = VISITED
+        box = nest_box(sim)
+        if box is None:
+            img[grid == 1] = NEST
+        else:
+            img[grid == 1] = WALL
+            nx, ny, s = box
+            img[max(nx - x0, 0):max(nx + s - x0, 0), max(ny - y0, 0):max(ny + s - y0, 0)] = NEST
+        img[grid == 2] = FOOD
+        img[ant_layer == 4] = ANT
+        img[ant_layer == 3] = CARRYING
+        qx, qy = sim.queen_pos[0] - x0, sim.queen_pos[1] - y0
+        if 0 <= qx < n and 0 <= qy < n:
+            img[qx, qy] = QUEEN
+        return img
+
+    def draw(self, screen, sim):
+        """合成並畫到 screen 上，回傳有更新的矩形列表"""
+        img = self.compose(sim)
+        if self.prev is None:
+            dirty = np.ones((len(self.cell_edges) - 1,) * 2, dtype=bool)
+            self.prev = img.copy()
+        else:
+            changed = img != self.prev
+            t = self.tile
+            n = len(self.cell_edges) - 1
+            # 補齊成 tile 的整數倍再分塊
+            padded = np.zeros((n * t, n * t), dtype=bool)
+            padded[:self.size, :self.size] = changed
+            dirty = padded.reshape(n, t, n, t).any(axis=(1, 3))
+            self.prev[changed] = img[changed]
+
+        if not dirty.any():
+            return []
+
+        # 畫面座標是 (橫, 直) = (y, x)，surfarray 要轉置
+        pygame.surfarray.blit_array(self.surface, img.T)
+        ox, oy = self.origin
+        if dirty.mean() > 0.5:
+            scaled = pygame.transform.scale(self.surface, (self.window_size,) * 2)
+            return [screen.blit(scaled, (ox, oy))]
+
+        rects = []
+        for tx, ty in zip(*np.nonzero(dirty)):
+            x0, x1 = self.cell_edges[tx], self.cell_edges[tx + 1]
+            y0, y1 = self.cell_edges[ty], self.cell_edges[ty + 1]
+            px0, px1 = self.pixel_edges[tx], self.pixel_edges[tx + 1]
+            py0, py1 = self.pixel_edges[ty], self.pixel_edges[ty + 1]
+            if px1 <= px0 or py1 <= py0:
+                continue
+            src = self.surface.subsurface((y0, x0, y1 - y0, x1 - x0))
+            scaled = pygame.transform.scale(src, (py1 - py0, px1 - px0))
+            rect = screen.blit(scaled, (ox + py0, oy + px0))
+            rects.append(rect)
+        return rects
+
+    def invalidate(self):
+        """下一幀全部重畫（例如視窗被覆蓋後）"""
+        self.prev = None
@@ -1,10 +1,10 @@
 import pygame
 import sys
 from env_interface import AntSimInterface
+from scripts.grid_renderer import GridRenderer
 
 # 顏色定義
 COLOR_BG = (30, 30, 30)
-COLOR_GRID = (50, 50, 50)
 COLOR_NEST = (100, 200, 255)
 COLOR_FOOD = (0, 255, 100)
 COLOR_ANT = (255, 255, 0)
@@ -22,27 +22,14 @@ clock = pygame.time.Clock()
 font = pygame.font.SysFont("consolas", 18)
 
 sim = AntSimInterface(seed=42)
+# 第一版不畫記憶與足跡，蟻后與巢同色
+renderer = GridRenderer(MAP_SIZE, WINDOW_SIZE, [
+    COLOR_BG, COLOR_BG, COLOR_BG, COLOR_NEST,
+    COLOR_FOOD, COLOR_ANT, COLOR_CARRYING, COLOR_NEST,
+])
 
 def draw():
-    grid, ant_layer = sim.get_state()
-    for x in range(MAP_SIZE):
-        for y in range(MAP_SIZE):
-            rect = pygame.Rect(y * CELL_SIZE, x * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-
-            if grid[x][y] == 1:
-                color = COLOR_NEST
-            elif grid[x][y] == 2:
-                color = COLOR_FOOD
-            else:
-                color = COLOR_BG
-
-            pygame.draw.rect(screen, color, rect)
-
-            # 螞蟻在上面
-            if ant_layer[x][y] == 3:
-                pygame.draw.rect(screen, COLOR_CARRYING, rect)
-            elif ant_layer[x][y] == 4:
-                pygame.draw.rect(screen, COLOR_ANT, rect)
+    return renderer.draw(screen, sim)
 
 def draw_info():
     text_area = pygame.Rect(0, WINDOW_SIZE, WINDOW_SIZE, 40)
@@ -65,8 +52,7 @@ while True:
             sys.exit()
 
     sim.step()
-    screen.fill(COLOR_GRID)
-    draw()
+    rects = draw()
     draw_info()
-    pygame.display.flip()
+    pygame.display.update(rects + [pygame.Rect(0, WINDOW_SIZE, WINDOW_SIZE, 40)])
     clock.tick(10)
\ No newline at end of file
@@ -1,9 +1,13 @@
+import argparse
 import pygame
 import sys
 from env_interface_2 import AntSimInterface
+from scripts.grid_renderer import GridRenderer
+from trajectory import TrajectoryRecorder, Trajectory, ReplaySim
+from profiler import StepProfiler
+from live_sim import LiveSim, LiveFrame
 
 COLOR_BG = (30, 30, 30)
-COLOR_GRID = (50, 50, 50)
 COLOR_NEST = (100, 200, 255)
 COLOR_FOOD = (0, 255, 100)
 COLOR_ANT = (255, 255, 0)
@@ -12,58 +16,35 @@ COLOR_MEMORY = (60, 60, 60)
 COLOR_QUEEN = (255, 0, 255)
 COLOR_TEXT = (255, 255, 255)
 COLOR_VISITED = (80, 80, 80)
+COLOR_WALL = (120, 95, 70)
 
 CELL_SIZE = 5
 MAP_SIZE = 150
 WINDOW_SIZE = MAP_SIZE * CELL_SIZE
 
-pygame.init()
-screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE + 40))
-pygame.display.set_caption("AntWorld Simulation Stage 2")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont("consolas", 18)
+PALETTE = [
+    COLOR_BG, COLOR_MEMORY, COLOR_VISITED, COLOR_NEST,
+    COLOR_FOOD, COLOR_ANT, COLOR_CARRYING, COLOR_QUEEN, COLOR_WALL,
+]
 
-sim = AntSimInterface(seed=223)
+# 都在 main() 裡建立，import 這個模組不會開視窗或建立模擬
+screen = clock = font = None
+sim = None  # 要畫的對象：模擬、重播，或背景執行時最新的快照（LiveFrame）
+renderer = None
 
 
-def draw():
-    grid, ant_layer = sim.get_state()
-
-    # 🐜 畫螞蟻走過的痕跡（灰色）在最底層
-    for agent in sim.agents:
-        if hasattr(agent, 'path_history'):
-            for (x, y) in agent.path_history:
-                rect = pygame.Rect(y * CELL_SIZE, x *
-                                   CELL_SIZE, CELL_SIZE, CELL_SIZE)
-                pygame.draw.rect(screen, COLOR_VISITED, rect)
-
-    # 畫主格子內容（背景/巢/食物）與螞蟻
-    for x in range(MAP_SIZE):
-        for y in range(MAP_SIZE):
-            rect = pygame.Rect(y * CELL_SIZE, x * CELL_SIZE,
-                               CELL_SIZE, CELL_SIZE)
-
-            if sim.nest_memory.is_explored(x, y):
-                pygame.draw.rect(screen, COLOR_MEMORY, rect)
+def open_window():
+    global screen, clock, font
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE + 40))
+    pygame.display.set_caption("AntWorld Simulation Stage 2")
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont("consolas", 18)
 
-            if grid[x][y] == 1:
-                color = COLOR_NEST
-            elif grid[x][y] == 2:
-                color = COLOR_FOOD
-            else:
-                color = COLOR_BG
 
-            pygame.draw.rect(screen, color, rect)
-
-            if ant_layer[x][y] == 3:
-                pygame.draw.rect(screen, COLOR_CARRYING, rect)
-            elif ant_layer[x][y] == 4:
-                pygame.draw.rect(screen, COLOR_ANT, rect)
-
-    # 畫蟻后
-    qx, qy = sim.queen_pos
-    q_rect = pygame.Rect(qy * CELL_SIZE, qx * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-    pygame.draw.rect(screen, COLOR_QUEEN, q_rect)
+def draw():
+    """整張地圖合成成索引影像，只重畫有變動的 tile"""
+    return renderer.draw(screen, sim)
 
 
 def draw_info():
@@ -71,25 +52,171 @@ def draw_info():
     pygame.draw.rect(screen, (10, 10, 10), text_area)
 
     total = sim.food_delivered
-    carrying = sum(1 for a in sim.agents if a.carrying_food)
-    remaining = (sim.grid == 2).sum()
-    ants = len(sim.agents)
-    done = sum(1 for a in sim.agents if a.mode == "done")
+    if isinstance(sim, ReplaySim):
+        remaining = sim.food_remaining
+        carrying = sim.carrying_count()
+        ants = len(sim.frame)
+        done = sim.done_count()
+    elif isinstance(sim, LiveFrame):
+        remaining, carrying, ants, done = sim.food_remaining, sim.carrying, sim.ants, sim.done
+    else:
+        remaining = sim.food.total  # 食物區索引的總剩餘量，不必掃整張地圖
+        carrying = sum(1 for a in sim.agents if a.carrying_food)
+        ants = len(sim.agents)
+        done = len(sim.retired)
 
     info = f"""🍃 Remaining: {remaining}   📦 Delivered: {total}   🎒 Carrying: {carrying}   🐜 Total: {ants}   ✅ Done: {done}"""
+    if isinstance(sim, ReplaySim):
+        info += f"   ⏯ Tick: {sim.tick}  x{speed}"
+    elif isinstance(sim, LiveFrame):
+        target = f"/{sim.target_tps:.0f}" if sim.target_tps else ""
+        info += f"   ⏱ Tick: {sim.tick}  {sim.tps:.0f}{target} tps"
+        if sim.paused:
+            info += "  ⏸"
     txt_surface = font.render(info, True, COLOR_TEXT)
     screen.blit(txt_surface, (10, WINDOW_SIZE + 10))
 
 
-while True:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
+speed = 1  # 重播時每幀前進的回合數，負數為倒帶
+paused = False
+
+
+def handle_replay_key(key):
+    """
+    空白鍵 暫停 / 繼續，←/→ 單步，↑/↓ 加速 / 減速，R 反向，
+    PageUp/PageDown 跳 500 回合，Home/End 跳到頭尾
+    """
+    global speed, paused
+    if key == pygame.K_SPACE:
+        paused = not paused
+    elif key == pygame.K_LEFT:
+        sim.step(-1)
+    elif key == pygame.K_RIGHT:
+        sim.step(1)
+    elif key == pygame.K_UP:
+        speed = speed * 2 if abs(speed) < 1024 else speed
+    elif key == pygame.K_DOWN:
+        speed = speed // 2 if abs(speed) > 1 else speed
+    elif key == pygame.K_r:
+        speed = -speed
+    elif key == pygame.K_PAGEUP:
+        sim.step(-500)
+    elif key == pygame.K_PAGEDOWN:
+        sim.step(500)
+    elif key == pygame.K_HOME:
+        sim.seek(0)
+    elif key == pygame.K_END:
+        sim.trajectory.refresh()
+        sim.seek(len(sim) - 1)
+
+
+def handle_live_key(live, key):
+    """
+    背景執行模式：空白鍵 暫停 / 繼續，→ 單步，PageDown 快轉 500 回合，
+    ↑/↓ 目標速率加倍 / 減半（超過 8192 tps 為全速），0 全速
+    """
+    global target_tps
+    if key == pygame.K_SPACE:
+        live.toggle_pause()
+    elif key == pygame.K_RIGHT:
+        live.advance(1)
+    elif key == pygame.K_PAGEDOWN:
+        live.advance(500)
+    elif key == pygame.K_UP and target_tps is not None:
+        target_tps = None if target_tps >= 8192 else target_tps * 2
+        live.set_tps(target_tps)
+    elif key == pygame.K_DOWN:
+        target_tps = 8192 if target_tps is None else max(target_tps // 2, 1)
+        live.set_tps(target_tps)
+    elif key == pygame.K_0:
+        target_tps = None
+        live.set_tps(None)
+
+
+target_tps = None  # 背景執行模式的目標 tick / 秒，None 為全速
+
+
+def run_live(args):
+    """模擬在背景全速（或 --tps）執行，畫面以 60 FPS 畫最新的快照，看畫面不會拖慢模擬"""
+    global sim, renderer, target_tps
+    target_tps = args.tps
+    renderer = GridRenderer(MAP_SIZE, WINDOW_SIZE, PALETTE)
+    live = LiveSim(AntSimInterface, {"seed": 223}, backend=args.live, tps=args.tps,
+                   record=args.record, profile=args.profile).start()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                live.stop()
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN:
+                handle_live_key(live, event.key)
+        with live.latest() as sim:
+            rects = draw()
+            draw_info()
+        pygame.display.update(rects + [pygame.Rect(0, WINDOW_SIZE, WINDOW_SIZE, 40)])
+        if live.error:
+            print(live.error, file=sys.stderr)
+            live.stop()
             pygame.quit()
-            sys.exit()
-
-    sim.step()
-    screen.fill(COLOR_GRID)
-    draw()
-    draw_info()
-    pygame.display.flip()
-    clock.tick(144)  # 保持 20 FPS
+            sys.exit(1)
+        clock.tick(60)
+
+
+def main(argv=None):
+    global sim, renderer
+    parser = argparse.ArgumentParser(description="AntWorld Stage 2 視覺化")
+    parser.add_argument("--record", help="把每回合錄到這個目錄（見 trajectory.py）")
+    parser.add_argument("--replay", help="播放錄製檔而不執行模擬")
+    parser.add_argument("--profile", help="結束時把 step() 分階段耗時寫成這個 Chrome trace 檔並印出摘要")
+    parser.add_argument("--live", nargs="?", const="thread", choices=["thread", "process"],
+                        help="模擬在背景 thread / process 執行，與畫面幀率脫鉤（見 live_sim.py）")
+    parser.add_argument("--tps", type=int, default=None,
+                        help="搭配 --live：目標 tick / 秒（預設全速）")
+    args = parser.parse_args(argv)
+
+    open_window()
+    if args.live and not args.replay:
+        run_live(args)
+
+    recorder = None
+    if args.replay:
+        sim = ReplaySim(Trajectory(args.replay))
+    else:
+        # 前景模式才在這裡建立模擬（背景執行時模擬在 LiveSim 裡）
+        sim = AntSimInterface(seed=223)
+        if args.record:
+            recorder = TrajectoryRecorder(args.record, sim)
+    renderer = GridRenderer(sim.size, WINDOW_SIZE, PALETTE)
+    if args.profile and not args.replay:
+        sim.profiler = StepProfiler()
+
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                if recorder is not None:
+                    recorder.close()
+                if args.profile and not args.replay:
+                    sim.profiler.export_chrome(args.profile)
+                    print(sim.profiler.format_summary())
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN and args.replay:
+                handle_replay_key(event.key)
+
+        if not args.replay:
+            sim.step()
+            if recorder is not None:
+                recorder.record()
+        elif not paused:
+            if speed > 0 and sim.at_end():
+                sim.trajectory.refresh()  # 錄製中的檔案：跟上新寫入的回合
+            sim.step(speed)
+        rects = draw()
+        draw_info()
+        pygame.display.update(rects + [pygame.Rect(0, WINDOW_SIZE, WINDOW_SIZE, 40)])
+        clock.tick(144)  # 保持 20 FPS
+
+
+if __name__ == "__main__":
+    main()
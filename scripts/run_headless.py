@@ -0,0 +1,215 @@
+"""
+無視窗批次執行：在多個 process 中跑多組 seed / 設定，直到 is_done() 或達到 tick 上限，
+把每次執行的結果寫成欄位式的 .npz 檔。
+
+    python -m scripts.run_headless --seeds 0:1000 --interface vec --agents 1000 --out sweep.npz
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from envs.scenario import TERRAINS
+from event_bus import KINDS, BinarySink, EventBus
+from profiler import StepProfiler
+from sim_random import spawn_seeds
+
+
+COLUMNS = ["seed", "interface", "size", "agents", "ticks",
+           "food_delivered", "done", "wall_time"]
+
+
+def make_sim(interface, size, seed, agents, events=None, chunk=None, pheromone=False,
+             profiler=None, scenario=None, world_cache=None, staggered=False, colony=None):
+    if interface == "vec":
+        from env_interface_vec import VecAntSimInterface
+        return VecAntSimInterface(size=size, seed=seed, num_agents=agents, events=events,
+                                  chunk=chunk, pheromone=pheromone, profiler=profiler,
+                                  scenario=scenario, world_cache=world_cache)
+    if interface == "v2":
+        from env_interface_2 import AntSimInterface
+        return AntSimInterface(size=size, seed=seed, events=events, pheromone=pheromone,
+                               profiler=profiler, scenario=scenario, world_cache=world_cache,
+                               staggered=staggered, colony=colony)
+    raise ValueError(f"未知的 interface: {interface}")
+
+
+def run_one(config):
+    """
+    config: dict(seed, interface, size, agents, max_ticks)，可選 seed_seq：有的話模擬用它，
+    seed 只當作編號（main() 以 sim_random.spawn_seeds 導出），可選 chunk / pheromone / scenario /
+    world_cache / staggered / colony（見 make_sim、envs/scenario.py、schedule.py、colony.py），
+    可選 events_dir / event_kinds 把事件寫成 <events_dir>/<interface>_<size>_<agents>_<seed>.bin，
+    record_dir 把軌跡錄成 <record_dir>/<interface>_<size>_<agents>_<seed>.traj（見 trajectory.py），
+    profile_dir 把各階段耗時寫成 <profile_dir>/<interface>_<size>_<agents>_<seed>.trace.json（見 profiler.py）
+    回傳一列結果（dict，欄位見 COLUMNS；有 profile_dir 時另有 "profile"：該次的 StepProfiler）。
+    """
+    name = "{interface}_{size}_{agents}_{seed}".format(**config)
+    events = None
+    if config.get("events_dir"):
+        sink = BinarySink(os.path.join(config["events_dir"], name + ".bin"))
+        events = EventBus(sink, kinds=config.get("event_kinds"))
+    profiler = StepProfiler() if config.get("profile_dir") else None
+
+    t = time.perf_counter()
+    seed = config.get("seed_seq", config["seed"])
+    sim = make_sim(config["interface"], config["size"], seed, config["agents"], events, config.get("chunk"),
+                   config.get("pheromone", False), profiler,
+                   config.get("scenario"), config.get("world_cache"),
+                   config.get("staggered", False), config.get("colony"))
+    recorder = None
+    if config.get("record_dir"):
+        from trajectory import TrajectoryRecorder
+        recorder = TrajectoryRecorder(os.path.join(config["record_dir"], name + ".traj"), sim)
+    while not sim.is_done() and sim.tick < config["max_ticks"]:
+        sim.step()
+        if recorder is not None:
+            recorder.record()
+    wall = time.perf_counter() - t
+    if events is not None:
+        events.close()
+    if recorder is not None:
+        recorder.close()
+
+    agents = len(sim.agents) if hasattr(sim, "agents") else len(sim.mode)
+    row = {
+        "seed": config["seed"],
+        "interface": config["interface"],
+        "size": config["size"],
+        "agents": agents,
+        "ticks": sim.tick,
+        "food_delivered": sim.food_delivered,
+        "done": sim.is_done(),
+        "wall_time": wall,
+    }
+    if profiler is not None:
+        profiler.export_chrome(os.path.join(config["profile_dir"], name + ".trace.json"),
+                               name=name)
+        profiler.spans = []  # trace 已寫到檔案，只把耗時傳回主 process
+        row["profile"] = profiler
+    return row
+
+
+def run_sweep(configs, workers=None):
+    """在 process pool 中跑完所有 config，依輸入順序回傳結果列"""
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        return [run_one(c) for c in configs]
+    chunk = max(1, len(configs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_one, configs, chunksize=chunk))
+
+
+def to_columns(rows):
+    """結果列轉成欄位陣列"""
+    return {
+        "seed": np.array([r["seed"] for r in rows], dtype=np.int64),
+        "interface": np.array([r["interface"] for r in rows], dtype="U8"),
+        "size": np.array([r["size"] for r in rows], dtype=np.int32),
+        "agents": np.array([r["agents"] for r in rows], dtype=np.int32),
+        "ticks": np.array([r["ticks"] for r in rows], dtype=np.int64),
+        "food_delivered": np.array([r["food_delivered"] for r in rows], dtype=np.int64),
+        "done": np.array([r["done"] for r in rows], dtype=bool),
+        "wall_time": np.array([r["wall_time"] for r in rows], dtype=np.float64),
+    }
+
+
+def save_results(path, rows):
+    np.savez_compressed(path, **to_columns(rows))
+
+
+def load_results(path):
+    with np.load(path) as data:
+        return {k: data[k] for k in COLUMNS}
+
+
+def parse_seeds(text):
+    """'0:1000' 或 '1,5,9'"""
+    if ":" in text:
+        start, stop = text.split(":")
+        return list(range(int(start), int(stop)))
+    return [int(s) for s in text.split(",") if s]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AntWorldSim 無視窗批次執行")
+    parser.add_argument("--seeds", default="0:8",
+                        help="執行編號，例如 0:1000 或 1,5,9；編號 i 用 spawn_seeds(--root-seed, [i]) 的串流")
+    parser.add_argument("--root-seed", type=int, default=0,
+                        help="所有執行共用的根 seed，各次執行的串流由它分出、互相獨立")
+    parser.add_argument("--interface", default=["v2"], nargs="+",
+                        choices=["v2", "vec"])
+    parser.add_argument("--size", type=int, default=[150], nargs="+")
+    parser.add_argument("--agents", type=int, default=[16], nargs="+",
+                        help="只對 vec 有效，v2 固定 16 隻")
+    parser.add_argument("--max-ticks", type=int, default=5000)
+    parser.add_argument("--chunk", type=int, default=None,
+                        help="只對 vec 有效：以 chunk×chunk 區塊懶惰配置地圖（超大稀疏地圖用）")
+    parser.add_argument("--pheromone", action="store_true",
+                        help="螞蟻留下 / 追蹤費洛蒙（見 pheromone.py）")
+    parser.add_argument("--terrain", default=None, choices=TERRAINS,
+                        help="以 envs/scenario.py 程序化生成地圖（預設沿用原本的隨機放置）")
+    parser.add_argument("--num-food", type=int, default=4, help="搭配 --terrain：食物區數量")
+    parser.add_argument("--world-cache", default=None,
+                        help="搭配 --terrain：生成的地圖快取在這個目錄，同一個 seed 直接讀檔")
+    parser.add_argument("--staggered", action="store_true",
+                        help="只對 v2 有效：探索蟻在巢內等到自己的出發時段才行動（見 schedule.py）")
+    parser.add_argument("--colony", action="store_true",
+                        help="只對 v2 有效：蟻后用送回的食物產卵、螞蟻會老死（見 colony.py）")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default="results.npz")
+    parser.add_argument("--events-dir", default=None,
+                        help="每次執行的事件寫到這個目錄（event_bus.read_events 讀回）")
+    parser.add_argument("--event-kinds", nargs="+", default=None, choices=KINDS)
+    parser.add_argument("--record-dir", default=None,
+                        help="每次執行的軌跡錄到這個目錄（main_visual_stage2 --replay 播放）")
+    parser.add_argument("--profile-dir", default=None,
+                        help="每次執行的 step() 分階段耗時寫成 Chrome trace 到這個目錄，並印出摘要表")
+    args = parser.parse_args(argv)
+    if args.events_dir:
+        os.makedirs(args.events_dir, exist_ok=True)
+    if args.profile_dir:
+        os.makedirs(args.profile_dir, exist_ok=True)
+    scenario = None
+    if args.terrain:
+        scenario = {"terrain": args.terrain, "num_food": args.num_food}
+
+    seeds = parse_seeds(args.seeds)
+    streams = dict(zip(seeds, spawn_seeds(args.root_seed, seeds)))
+    configs = [
+        {"seed": seed, "seed_seq": streams[seed], "interface": iface, "size": size,
+         "agents": agents, "max_ticks": args.max_ticks,
+         "events_dir": args.events_dir, "event_kinds": args.event_kinds,
+         "record_dir": args.record_dir, "chunk": args.chunk,
+         "pheromone": args.pheromone, "profile_dir": args.profile_dir,
+         "scenario": scenario, "world_cache": args.world_cache,
+         "staggered": args.staggered, "colony": args.colony or None}
+        for iface in args.interface
+        for size in args.size
+        for agents in args.agents
+        for seed in seeds
+    ]
+
+    t = time.perf_counter()
+    rows = run_sweep(configs, args.workers)
+    save_results(args.out, rows)
+
+    cols = to_columns(rows)
+    print(f"{len(rows)} 次執行，{time.perf_counter() - t:.1f} 秒 -> {args.out}")
+    print(f"完成 {cols['done'].sum()} 次，平均 {cols['ticks'].mean():.0f} ticks，"
+          f"平均交付 {cols['food_delivered'].mean():.1f} 份食物")
+    if args.profile_dir:
+        # 同一種介面的所有執行合在一起算百分位數
+        for iface in args.interface:
+            total = StepProfiler()
+            for r in rows:
+                if r["interface"] == iface:
+                    total.merge(r["profile"])
+            print(f"\n[{iface}] step() 各階段耗時（trace: {args.profile_dir}/*.trace.json）")
+            print(total.format_summary())
+
+
+if __name__ == "__main__":
+    main()
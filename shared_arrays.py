@@ -0,0 +1,39 @@
+"""
+放在 multiprocessing.shared_memory 的 numpy 陣列，跨 process 共用同一份資料。
+建立端以 share() 複製進共享記憶體並記下 spec，另一端以 attach(spec) 取得同樣的 view：
+
+    shms, spec = [], {}
+    view = share(arr, "grid", shms, spec)
+    ...  # 把 spec 傳給其他 process
+    views, shms = attach(spec)
+
+SharedMemory 物件（shms）要留到不再使用 view 為止，用完各自 close()，建立端再 unlink()。
+domains.py 的 worker 與 live_sim.py 的背景 process 都用它。
+"""
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+def share(arr, name, shms, spec):
+    """
+    arr 複製進新的共享記憶體，回傳其上的 view。
+    SharedMemory 加進 shms，(名稱, 形狀, dtype) 記在 spec[name]
+    """
+    shm = SharedMemory(create=True, size=max(arr.nbytes, 1))
+    view = np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)
+    view[...] = arr
+    shms.append(shm)
+    spec[name] = (shm.name, arr.shape, arr.dtype.str)
+    return view
+
+
+def attach(spec):
+    """依 share() 記下的 spec 連上共享記憶體，回傳 ({name: view}, [SharedMemory])"""
+    shms = []
+    views = {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = SharedMemory(name=shm_name)
+        shms.append(shm)
+        views[name] = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+    return views, shms
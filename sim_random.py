@@ -0,0 +1,79 @@
+"""
+模擬用的亂數來源：每次執行擁有自己的 numpy Generator，
+同一個 seed 得到完全相同的重播；process pool 的 worker 用 spawn_seeds 取得互相獨立的串流。
+"""
+import numpy as np
+
+
+def make_seed_sequence(seed=None):
+    """seed 可為 None / int / SeedSequence"""
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def env_seed(seed, seed_seq):
+    """
+    給 AntWorldEnv（random.Random）用的整數 seed。
+    int seed 原樣傳入，地圖與以前相同；其他情況由 SeedSequence 導出，
+    所以 seed=None 時只要記下 seed_seq.entropy 也能重播。
+    """
+    if isinstance(seed, (int, np.integer)):
+        return int(seed)
+    return int(seed_seq.generate_state(1)[0])
+
+
+def spawn_seeds(root_seed, n):
+    """
+    從同一個根 seed 分出 n 個互相獨立的 SeedSequence，可直接傳給介面的 seed。
+    n 也可以是子串流編號的列表：spawn_seeds(root, [3, 7]) 與 spawn_seeds(root, 8) 的
+    第 3、7 個相同，批次執行時每個編號固定對應同一條串流，與一次跑哪些編號無關。
+    """
+    root = make_seed_sequence(root_seed)
+    if isinstance(n, (int, np.integer)):
+        return root.spawn(n)
+    return [np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (int(i),),
+                                   pool_size=root.pool_size) for i in n]
+
+
+def direction_keys(rng, n):
+    """
+    一次產生 n 隻螞蟻本回合要用的方向亂數（每隻 8 個），取代逐隻 shuffle / choice。
+    在「可走的方向」裡取 key 最小的，分佈與打亂後取第一個相同；
+    都不可走時對全部 8 個取最小，等同隨便選一個。
+    """
+    return rng.random((n, 8))
+
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix64(z):
+    """SplitMix64 的混合函式（uint64 陣列，溢位即取模）"""
+    z = z ^ (z >> np.uint64(30))
+    z = z * np.uint64(0xBF58476D1CE4E5B9)
+    z = z ^ (z >> np.uint64(27))
+    z = z * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def counter_key(seed_seq):
+    """counter_random 用的 64 位元金鑰，由 SeedSequence 導出（不動到 Generator 的狀態）"""
+    return np.uint64(seed_seq.generate_state(1, np.uint64)[0])
+
+
+def counter_random(key, tick, ids, width, salt=0):
+    """
+    以計數器產生的 [0, 1) 亂數 (len(ids), width)：
+    結果只由 (key, tick, 螞蟻編號, salt) 決定，與抽取順序、批次怎麼切無關，
+    所以多個 process 各自處理一部分螞蟻也能得到與單一 process 完全相同的亂數。
+    key / tick 也可以是與 ids 等長的陣列（多個模擬疊在一起跑時，每隻螞蟻用自己那份的）。
+    """
+    with np.errstate(over="ignore"):
+        key = np.asarray(key, dtype=np.uint64)
+        tick = np.asarray(tick).astype(np.uint64)
+        base = _mix64(key ^ _mix64(tick * _GOLDEN + np.uint64(salt)))
+        ctr = (np.asarray(ids, dtype=np.uint64)[:, None] * np.uint64(width)
+               + np.arange(1, width + 1, dtype=np.uint64)[None, :])
+        z = _mix64(base[..., None] + ctr * _GOLDEN)
+    return (z >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
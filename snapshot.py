@@ -0,0 +1,406 @@
+"""
+模擬狀態的快照 / 還原 / 分叉。
+快照是一組扁平的 NumPy 陣列（螞蟻狀態以 struct-of-arrays 存放），
+存成不壓縮的 .npz，每個成員都是普通的 .npy，讀回時不需重算任何東西。
+
+    save_snapshot(sim, "tick5000.npz")
+    sim2 = load_snapshot("tick5000.npz")
+    what_if = fork(sim)
+"""
+import json
+import random
+
+import numpy as np
+
+from antagent.ReturnPlanner import ReturnPlanner
+from collision import OccupancyGrid
+from env_interface_2 import AntSimInterface, NestMemory, NestFlowField, CHUNK_SIZE
+from env_interface_vec import VecAntSimInterface
+from envs.Adam_ants_2 import AntWorldEnv
+from envs.chunked_grid import ChunkedGrid
+from envs.food_zones import FoodZones
+from event_bus import DISABLED
+from observation import AntLayer
+from profiler import NO_PROFILER
+from schedule import DEPART, TimerWheel
+from colony import Colony
+from sim_random import counter_key
+from pheromone import PheromoneField
+
+
+MODES = ["explore", "return", "done"]
+MODE_ID = {name: i for i, name in enumerate(MODES)}
+FORMAT_VERSION = 3  # 欄位有增減就加一；讀取時版本不同一律拒絕
+
+
+def _json(obj):
+    return np.array(json.dumps(obj))
+
+
+def _unjson(arr):
+    return json.loads(str(arr))
+
+
+def _rng_state(rng):
+    return _json(rng.bit_generator.state)
+
+
+def _make_rng(state):
+    rng = np.random.default_rng()
+    rng.bit_generator.state = _unjson(state)
+    return rng
+
+
+def _seed_seq_state(seq):
+    return _json({"entropy": seq.entropy, "spawn_key": list(seq.spawn_key),
+                  "n_children_spawned": seq.n_children_spawned})
+
+
+def _make_seed_seq(state):
+    s = _unjson(state)
+    return np.random.SeedSequence(s["entropy"], spawn_key=s["spawn_key"],
+                                  n_children_spawned=s["n_children_spawned"])
+
+
+def _put_layer(arrays, name, layer):
+    """稠密陣列原樣存；ChunkedGrid 拆成區塊編號 + 區塊資料 + fill"""
+    if isinstance(layer, ChunkedGrid):
+        keys, chunks = layer.to_arrays()
+        arrays[name + ".keys"] = keys
+        arrays[name + ".chunks"] = chunks
+        arrays[name + ".fill"] = np.array(layer.fill, dtype=layer.dtype)
+    elif layer is not None:
+        arrays[name] = layer
+
+
+def _get_layer(a, name, size):
+    if name + ".keys" in a:
+        return ChunkedGrid.from_arrays(size, a[name + ".keys"], a[name + ".chunks"],
+                                       a[name + ".fill"][()])
+    if name in a:
+        return a[name].copy()
+    return None
+
+
+def _put_pheromone(arrays, sim):
+    field = sim.pheromone
+    if field is None:
+        return
+    arrays["pheromone.params"] = _json({
+        "channels": field.channels, "evaporation": field.evaporation,
+        "diffusion": field.diffusion, "tile": field.tile, "eps": field.eps,
+        "interval": field.interval})
+    arrays["pheromone.data"] = field.data
+    arrays["pheromone.active"] = field.active
+    arrays["scent_age"] = sim.scent_age
+    arrays["scent_blocked"] = sim.scent_blocked
+
+
+def _get_pheromone(a, sim, count):
+    if "pheromone.params" not in a:
+        sim.pheromone = None
+        sim.scent_age = np.zeros(count, dtype=np.int32)
+        sim.scent_blocked = np.zeros(count, dtype=bool)
+        return
+    p = _unjson(a["pheromone.params"])
+    field = PheromoneField(sim.size, p["channels"], p["evaporation"], p["diffusion"],
+                           p["tile"], p["eps"], p["interval"])
+    field.data[:] = a["pheromone.data"]
+    field.active[:] = a["pheromone.active"]
+    sim.pheromone = field
+    sim.scent_age = a["scent_age"].copy()
+    sim.scent_blocked = a["scent_blocked"].copy()
+
+
+def _env_arrays(env):
+    arrays = {
+        "env.params": np.array([env.size, env.nest_size, env.food_size, env.min_dist]),
+        "env.nest_pos": np.array(env.nest_pos),
+        "env.food_positions": np.array(env.food_positions, dtype=np.int64).reshape(-1, 2),
+        "env.rng": _json(env.rng.getstate()),
+    }
+    _put_layer(arrays, "env.grid", env.grid)
+    return arrays
+
+
+def _make_env(a):
+    env = AntWorldEnv.__new__(AntWorldEnv)
+    env.size, env.nest_size, env.food_size, env.min_dist = (int(v) for v in a["env.params"])
+    env.grid = _get_layer(a, "env.grid", env.size)
+    env.nest_pos = tuple(int(v) for v in a["env.nest_pos"])
+    env.food_positions = [tuple(int(v) for v in p) for p in a["env.food_positions"]]
+    chunk = env.grid.chunk if isinstance(env.grid, ChunkedGrid) else None
+    env.food = FoodZones(env.size, env.food_positions, env.food_size, env.grid, chunk)
+    version, internal, gauss = _unjson(a["env.rng"])
+    env.rng = random.Random()
+    env.rng.setstate((version, tuple(internal), gauss))
+    return env
+
+
+def _ragged(chunks, dtype, width=None):
+    """把一串長度不同的陣列接成 (資料, offsets)"""
+    lengths = np.array([len(c) for c in chunks], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    shape = (0,) if width is None else (0, width)
+    data = np.concatenate(chunks).astype(dtype) if len(chunks) and offsets[-1] else np.zeros(shape, dtype)
+    return data, offsets
+
+
+def _snapshot_v2(sim):
+    agents = sim.agents
+    nm = sim.nest_memory
+    delta_idx = []
+    delta_val = []
+    for a in agents:
+        idx, vals = a.memory.changed_cells()
+        delta_idx.append(idx)
+        delta_val.append(vals)
+    mem_idx, mem_off = _ragged(delta_idx, np.int64)
+    mem_val, _ = _ragged(delta_val, np.int8)
+    path_pts, path_off = _ragged([a.return_path.points for a in agents], np.int32, width=2)
+    zones, zones_off = _ragged([sorted(a.food_zones) for a in agents], np.int64)
+    trail_cap = agents[0].path_history.capacity if agents else 256
+
+    arrays = {
+        "kind": np.array("v2"),
+        "scalars": np.array([sim.size, sim.tick, sim.food_delivered, sim.departure_index]),
+        "rng": _rng_state(sim.rng),
+        "seed_seq": _seed_seq_state(sim.seed_seq),
+        "grid": sim.grid,
+        "visit_count": sim.visit_count,
+        "departure_queue": np.array(sim.departure_queue, dtype=np.int64),
+        "collision": np.array(sim.collision),
+        "view_radius": np.array(sim.view_radius),
+        # 排程：計時輪上還沒到期的 (tick, 出發時段 / 要醒來或死亡的螞蟻, 池位世代)
+        "sched.staggered": np.array(sim.staggered),
+        "sched.wheel": np.array(sim.wheel.items(), dtype=np.int64).reshape(-1, 3),
+        # 螞蟻（struct-of-arrays）；id 即在 AgentPool 中的位置
+        "pool": np.array([sim.pool.capacity, sim.pool.extent]),
+        "pool.generation": np.array(sim.pool.generation, dtype=np.int64),
+        "ant.id": np.array([a.id for a in agents], dtype=np.int64),
+        "ant.born": np.array([a.born for a in agents], dtype=np.int64),
+        "ant.pos": np.array([a.pos for a in agents], dtype=np.int64).reshape(-1, 2),
+        "ant.mode": np.array([MODE_ID[a.mode] for a in agents], dtype=np.int8),
+        "ant.flags": np.array([(a.carrying_food, a.is_explorer, a.follow_field, a.just_reset)
+                               for a in agents], dtype=bool).reshape(-1, 4),
+        "ant.counters": np.array([(a.steps_taken, a.max_steps, a.blocked_count)
+                                  for a in agents], dtype=np.int64).reshape(-1, 3),
+        "ant.mem_idx": mem_idx,
+        "ant.mem_val": mem_val,
+        "ant.mem_off": mem_off,
+        "ant.path": path_pts,
+        "ant.path_off": path_off,
+        "ant.path_cursor": np.array([a.return_path.cursor for a in agents], dtype=np.int64),
+        "ant.zones": zones,
+        "ant.zones_off": zones_off,
+        "ant.trail": np.array([a.path_history.points for a in agents],
+                              dtype=np.int32).reshape(-1, trail_cap, 2),
+        "ant.trail_pos": np.array([(a.path_history.head, a.path_history.total)
+                                   for a in agents], dtype=np.int64).reshape(-1, 2),
+        # 巢記憶
+        "nest.base": nm.base,
+        "nest.explored": nm.explored,
+        "nest.food_zones": np.array(sorted(nm.food_zones), dtype=np.int64),
+        "nest.counters": np.array([nm.sync_count, nm.empty_syncs, nm.merged_cells, nm.last_merged]),
+        "nest.dirty_chunks": np.array(sorted(nm.dirty_chunks), dtype=np.int64),
+    }
+    if nm.flow_field is not None:
+        arrays["nest.flow_dist"] = nm.flow_field.dist
+    if sim.colony is not None:
+        arrays["colony.params"] = _json(sim.colony.params())
+        arrays["colony.counters"] = np.array(sim.colony.counters(), dtype=np.int64)
+    _put_pheromone(arrays, sim)
+    return arrays
+
+
+def _restore_v2(a, events, planner=None):
+    sim = AntSimInterface.__new__(AntSimInterface)
+    size, tick, delivered, dep_index = (int(v) for v in a["scalars"])
+    sim.size = size
+    sim.events = events if events is not None else DISABLED
+    sim.profiler = NO_PROFILER
+    sim.seed_seq = _make_seed_seq(a["seed_seq"])
+    sim.rng = _make_rng(a["rng"])
+    sim.env = _make_env(a)
+    sim.grid = a["grid"].copy()
+    sim.food = sim.env.food
+    sim.food.recount(sim.grid)
+    sim.tick = tick
+    sim.food_delivered = delivered
+    sim.departure_queue = a["departure_queue"].tolist()
+    sim.departure_index = dep_index
+    sim.collision = str(a["collision"])
+    sim.nest_coords = sim._get_nest_coords()
+    sim.queen_pos = sim._place_queen()
+    sim.visit_count = a["visit_count"].copy()
+    sim.ant_layer = AntLayer(size)
+    sim.view_radius = int(a["view_radius"])
+
+    nm = NestMemory.__new__(NestMemory)
+    nm.size = size
+    nm.base = a["nest.base"].copy()
+    nm.explored = a["nest.explored"].copy()
+    nm.food = sim.food
+    nm.food_zones = set(a["nest.food_zones"].tolist())
+    nm.sync_count, nm.empty_syncs, nm.merged_cells, nm.last_merged = (
+        int(v) for v in a["nest.counters"])
+    nm.chunks_per_row = -(-size // CHUNK_SIZE)
+    nm.dirty_chunks = set(a["nest.dirty_chunks"].tolist())
+    nm.flow_field = None
+    if "nest.flow_dist" in a:
+        field = NestFlowField.__new__(NestFlowField)
+        field.base = nm.base
+        field.size = size
+        field.nest = np.zeros(size * size, dtype=bool)
+        for x, y in sim.nest_coords:
+            field.nest[x * size + y] = True
+        field.offsets = np.array([(dx, dy) for dx in [-1, 0, 1]
+                                  for dy in [-1, 0, 1] if not (dx == 0 and dy == 0)],
+                                 dtype=np.intp)
+        field.dist = a["nest.flow_dist"].copy()
+        nm.flow_field = field
+    sim.nest_memory = nm
+    # 規劃器只有暫存區，沒有跨呼叫的狀態，同一個 process 內可共用
+    sim.planner = planner if planner is not None else ReturnPlanner(size, sim.nest_coords)
+
+    pos = a["ant.pos"].tolist()
+    modes = a["ant.mode"].tolist()
+    flags = a["ant.flags"].tolist()
+    counters = a["ant.counters"].tolist()
+    mem_idx, mem_val = a["ant.mem_idx"].tolist(), a["ant.mem_val"].tolist()
+    mem_off = a["ant.mem_off"].tolist()
+    # 路徑與足跡各複製一次，每隻螞蟻拿自己那一段的 view
+    path, path_off = a["ant.path"].copy(), a["ant.path_off"].tolist()
+    cursor = a["ant.path_cursor"].tolist()
+    zones, zones_off = a["ant.zones"].tolist(), a["ant.zones_off"].tolist()
+    trail, trail_pos = a["ant.trail"].copy(), a["ant.trail_pos"].tolist()
+    capacity, extent = (int(v) for v in a["pool"])
+    ids, born = a["ant.id"].tolist(), a["ant.born"].tolist()
+    sim.colony = None
+    if "colony.params" in a:
+        sim.colony = Colony(**_unjson(a["colony.params"]))
+        sim.colony.store, sim.colony.born, sim.colony.died = a["colony.counters"].tolist()
+
+    sim.pool = sim._make_pool(capacity)
+    sim.pool.restore(ids, extent, a["pool.generation"].tolist())
+    sim.agents = []
+    for i in range(len(pos)):
+        agent = sim.pool[ids[i]]
+        agent.reset(pos[i], flags[i][1], born[i])
+        agent.mode = MODES[modes[i]]
+        agent.carrying_food, _, agent.follow_field, agent.just_reset = flags[i]
+        agent.steps_taken, agent.max_steps, agent.blocked_count = counters[i]
+        lo, hi = mem_off[i], mem_off[i + 1]
+        agent.memory.delta = dict(zip(mem_idx[lo:hi], mem_val[lo:hi]))
+        agent.return_path.set(path[path_off[i]:path_off[i + 1]])
+        agent.return_path.cursor = cursor[i]
+        agent.food_zones = set(zones[zones_off[i]:zones_off[i + 1]])
+        agent.path_history.points = trail[i]
+        agent.path_history.capacity = len(trail[i])
+        agent.path_history.head, agent.path_history.total = trail_pos[i]
+        sim.agents.append(agent)
+    # 佔用格由位置重建即可
+    sim.occupancy = OccupancyGrid(size, sim.nest_coords)
+    sim.occupancy.add(sim.occupancy.cells(a["ant.pos"]))
+    _get_pheromone(a, sim, capacity)
+
+    # 等待 / 結束的集合由螞蟻狀態重建
+    sim.staggered = bool(a["sched.staggered"])
+    sim.waiting = {ag.id for ag in sim.agents if ag.just_reset} if sim.staggered else set()
+    sim.retired = {ag.id for ag in sim.agents if ag.mode == "done"}
+    sim.wheel = TimerWheel(now=sim.tick)
+    for t, item, tag in a["sched.wheel"].tolist():
+        sim.wheel.schedule(t, item, tag)
+    sim.next_departure = next((t for t, item, _ in sim.wheel.items() if item == DEPART), None)
+    sim._alive = sim._acting = None
+    return sim
+
+
+VEC_ARRAYS = ["pos", "mode", "carrying", "steps_taken", "blocked_count",
+              "is_explorer", "departure_queue"]
+VEC_LAYERS = ["grid", "visit_count", "dist_home"]  # 可能是 ChunkedGrid 或 None
+
+
+def _snapshot_vec(sim):
+    arrays = {
+        "kind": np.array("vec"),
+        "scalars": np.array([sim.size, sim.tick, sim.food_delivered,
+                             sim.departure_index, sim.max_steps]),
+        "rng": _rng_state(sim.rng),
+        "seed_seq": _seed_seq_state(sim.seed_seq),
+        "collision": np.array(sim.collision),
+        "chunk": np.array(sim.chunk or 0),
+        "streams": np.array(sim.streams),
+    }
+    for name in VEC_ARRAYS:
+        arrays[name] = getattr(sim, name)
+    for name in VEC_LAYERS:
+        _put_layer(arrays, name, getattr(sim, name))
+    _put_pheromone(arrays, sim)
+    return arrays
+
+
+def _restore_vec(a, events):
+    sim = VecAntSimInterface.__new__(VecAntSimInterface)
+    size, tick, delivered, dep_index, max_steps = (int(v) for v in a["scalars"])
+    sim.size = size
+    sim.events = events if events is not None else DISABLED
+    sim.profiler = NO_PROFILER
+    sim.seed_seq = _make_seed_seq(a["seed_seq"])
+    sim.rng = _make_rng(a["rng"])
+    sim.streams = str(a["streams"])
+    sim.counter_key = counter_key(sim.seed_seq)
+    sim.env = _make_env(a)
+    sim.tick = tick
+    sim.food_delivered = delivered
+    sim.departure_index = dep_index
+    sim.max_steps = max_steps
+    sim.collision = str(a["collision"])
+    sim.chunk = int(a["chunk"]) or None
+    for name in VEC_ARRAYS:
+        setattr(sim, name, a[name].copy())
+    for name in VEC_LAYERS:
+        setattr(sim, name, _get_layer(a, name, size))
+    sim.food = sim.env.food
+    sim.food.recount(sim.grid)
+    sim.nest_coords = sim._get_nest_coords()
+    sim.queen_pos = sim._place_queen()
+    sim.occupancy = OccupancyGrid(size, sim.nest_coords, sim.chunk)
+    sim.ant_layer = AntLayer(size, sim.chunk)
+    sim.occupancy.add(sim.occupancy.cells(sim.pos))
+    _get_pheromone(a, sim, len(sim.pos))
+    return sim
+
+
+def snapshot_state(sim):
+    """完整狀態轉成 dict[str, ndarray]（陣列是 sim 的 view，要保存請立刻寫出或複製）"""
+    if isinstance(sim, VecAntSimInterface):
+        arrays = _snapshot_vec(sim)
+    else:
+        arrays = _snapshot_v2(sim)
+    arrays.update(_env_arrays(sim.env))
+    arrays["version"] = np.array(FORMAT_VERSION)
+    return arrays
+
+
+def restore_state(arrays, events=None, planner=None):
+    if int(arrays["version"]) != FORMAT_VERSION:
+        raise ValueError(f"不支援的快照版本: {int(arrays['version'])}")
+    if str(arrays["kind"]) == "vec":
+        return _restore_vec(arrays, events)
+    return _restore_v2(arrays, events, planner)
+
+
+def save_snapshot(sim, path):
+    """不壓縮的 .npz，讀寫都只是記憶體複製"""
+    np.savez(path, **snapshot_state(sim))
+
+
+def load_snapshot(path, events=None):
+    with np.load(path) as data:
+        return restore_state(data, events)
+
+
+def fork(sim, events=None):
+    """在同一個 process 內複製出一份獨立的模擬，之後兩邊互不影響"""
+    return restore_state(snapshot_state(sim), events, getattr(sim, "planner", None))
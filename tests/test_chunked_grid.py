@@ -0,0 +1,45 @@
+import numpy as np
+
+from env_interface_vec import VecAntSimInterface
+from envs.chunked_grid import ChunkedGrid
+
+
+def test_chunked_grid_matches_dense_array():
+    rng = np.random.default_rng(1)
+    size = 120
+    dense = np.zeros((size, size), np.int32)
+    chunked = ChunkedGrid(size, 32, np.int32)
+    for _ in range(200):
+        op = rng.integers(4)
+        xs, ys = rng.integers(0, size, (2, 40))
+        v = rng.integers(-3, 3, 40)
+        if op == 0:
+            dense[xs, ys] = v
+            chunked[xs, ys] = v
+        elif op == 1:
+            np.add.at(dense, (xs, ys), v)
+            chunked.add_at(xs, ys, v)
+        elif op == 2:
+            x0, y0 = rng.integers(0, size, 2)
+            x1, y1 = x0 + rng.integers(0, 60), y0 + rng.integers(0, 60)
+            dense[x0:x1, y0:y1] = v[0]
+            chunked[x0:x1, y0:y1] = v[0]
+        else:
+            dense.flat[xs * size + ys] = v
+            chunked.flat[xs * size + ys] = v
+        assert np.array_equal(chunked[0:size, 0:size], dense)
+        assert np.array_equal(chunked[xs[:, None], ys[None, :]], dense[xs[:, None], ys[None, :]])
+        assert chunked.count(0) == (dense == 0).sum()
+
+
+def test_chunked_sim_matches_dense_sim():
+    dense = VecAntSimInterface(size=150, seed=11, num_agents=300)
+    chunked = VecAntSimInterface(size=150, seed=11, num_agents=300, chunk=64)
+    for _ in range(400):
+        dense.step()
+        chunked.step()
+    assert np.array_equal(dense.pos, chunked.pos)
+    assert dense.food_delivered == chunked.food_delivered
+    for a, b in zip(dense.get_state(), chunked.get_state()):
+        assert np.array_equal(a, b)
+    assert np.array_equal(chunked.visit_count[0:150, 0:150], dense.visit_count)
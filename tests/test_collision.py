@@ -0,0 +1,39 @@
+import numpy as np
+
+from collision import OccupancyGrid
+from env_interface_vec import VecAntSimInterface
+
+
+def test_resolve_is_order_independent_without_double_occupancy():
+    rng = np.random.default_rng(0)
+    size = 30
+    for _ in range(300):
+        cells = rng.choice(size * size, 400, replace=False)
+        occ = OccupancyGrid(size, [(0, 0), (0, 1)])
+        occ.add(cells)
+        x, y = np.divmod(cells, size)
+        step = rng.integers(-1, 2, (len(cells), 2))
+        tgt = np.clip(x + step[:, 0], 0, size - 1) * size + np.clip(y + step[:, 1], 0, size - 1)
+        moving = tgt != cells
+        cur, tgt = cells[moving], tgt[moving]
+        rank = rng.random(len(cur))
+        ok = occ.resolve(cur, tgt, rank)
+        # 打亂順序重算，結果逐隻相同
+        p = rng.permutation(len(cur))
+        assert np.array_equal(occ.resolve(cur[p], tgt[p], rank[p]), ok[p])
+        occ.apply(cur[ok], tgt[ok])
+        assert occ.counts[~occ.unlimited].max() <= 1
+        # 沒有兩隻互換位置
+        won = set(zip(cur[ok].tolist(), tgt[ok].tolist()))
+        assert not any((b, a) in won for a, b in won
+                       if not occ.unlimited[a] and not occ.unlimited[b])
+
+
+def test_crowded_sim_keeps_one_ant_per_cell():
+    for collision in ("random", "priority"):
+        sim = VecAntSimInterface(size=60, seed=7, num_agents=1500, collision=collision)
+        for _ in range(60):
+            sim.step()
+            counts = np.bincount(sim.occupancy.cells(sim.pos), minlength=sim.size ** 2)
+            assert np.array_equal(counts, sim.occupancy.counts)
+            assert counts[~sim.occupancy.unlimited].max() <= 1
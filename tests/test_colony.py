@@ -0,0 +1,32 @@
+from colony import Colony
+from env_interface_2 import AntSimInterface
+
+
+def test_stale_wake_does_not_release_recycled_slot():
+    sim = AntSimInterface(seed=4, staggered=True,
+                          colony=Colony(max_ants=16, spawn_cost=0, lifespan=None))
+    old = next(a for a in sim.agents if a.id in sim.waiting and a.id != sim.departure_queue[0])
+    i = old.id
+    # 舊的螞蟻排了兩回合後醒來，醒來之前就死了，池位給了新出生的螞蟻
+    sim.wheel.schedule(sim.tick + 2, i, sim.pool.generation[i])
+    sim._die(old)
+    sim._spawn()
+    new = sim.pool[i]
+    assert new in sim.agents and i in sim.waiting
+    sim.step()
+    sim.step()
+    assert i in sim.waiting and new.just_reset
+
+
+def test_snapshot_keeps_pool_generations(tmp_path):
+    sim = AntSimInterface(seed=4, colony=Colony(max_ants=24, spawn_cost=0, lifespan=40))
+    for _ in range(120):
+        sim.step()
+    path = tmp_path / "colony.npz"
+    sim.save_snapshot(str(path))
+    copy = AntSimInterface.load_snapshot(str(path))
+    assert copy.pool.generation == sim.pool.generation
+    for _ in range(200):
+        sim.step()
+        copy.step()
+    assert [(a.id, a.pos, a.born) for a in sim.agents] == [(a.id, a.pos, a.born) for a in copy.agents]
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from domains import DomainSim
+from env_interface_vec import VecAntSimInterface
+
+FIELDS = ("pos", "mode", "carrying", "steps_taken", "blocked_count", "grid", "visit_count",
+          "scent_age")
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_domains_match_single_process_counter_streams(workers):
+    kwargs = dict(size=150, seed=4, num_agents=300, pheromone=True)
+    ref = VecAntSimInterface(streams="counter", **kwargs)
+    for _ in range(200):
+        ref.step()
+    with DomainSim(workers=workers, **kwargs) as sim:
+        sim.run(100)
+        for _ in range(100):
+            sim.step()
+        for name in FIELDS:
+            assert np.array_equal(getattr(sim, name), getattr(ref, name)), name
+        assert np.array_equal(sim.pheromone.data, ref.pheromone.data)
+        assert sim.food_delivered == ref.food_delivered
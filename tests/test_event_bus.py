@@ -0,0 +1,23 @@
+from event_bus import KINDS, ConsoleSink, EventBus
+
+
+def test_console_sink_formats_every_kind(capsys):
+    bus = EventBus(ConsoleSink())
+    for i, kind in enumerate(KINDS):
+        bus.emit(kind, i, 1, 2, 3)
+    bus.close()
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == len(KINDS)
+
+
+def test_console_sink_on_colony_run(capsys):
+    from colony import Colony
+    from env_interface_2 import AntSimInterface
+
+    bus = EventBus(ConsoleSink(), kinds=["spawned", "died"])
+    sim = AntSimInterface(seed=4, colony=Colony(max_ants=24, spawn_cost=0, lifespan=40), events=bus)
+    for _ in range(80):
+        sim.step()
+    bus.close()
+    assert bus.counts["spawned"] > 0 and bus.counts["died"] > 0
+    assert "老死" in capsys.readouterr().out
@@ -0,0 +1,30 @@
+import numpy as np
+
+from env_interface_2 import NestFlowField
+
+NEST = [(x, y) for x in range(2, 4) for y in range(2, 4)]
+
+
+def test_incremental_update_matches_rebuild():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        base = (rng.random((16, 16)) < 0.2).astype(np.int8)
+        field = NestFlowField(base, NEST)
+        for _ in range(5):
+            flip = rng.choice(base.size, size=rng.integers(1, 12), replace=False)
+            was = base.flat[flip] == 1
+            base.flat[flip] = 1 - base.flat[flip]
+            field.update(flip[was], flip[~was])
+            fresh = NestFlowField(base.copy(), NEST)
+            assert np.array_equal(field.dist, fresh.dist)
+
+
+def test_next_step_never_goes_sideways():
+    base = np.zeros((8, 8), dtype=np.int8)
+    field = NestFlowField(base, [(0, 0)])
+    memory = np.zeros((8, 8), dtype=np.int8)
+    # (3, 3) 距離 3，唯一更近的鄰格 (2, 2) 在螞蟻的記憶裡是牆；(2, 3) (3, 2) 同樣距離 3
+    memory[2, 2] = 1
+    assert field.next_step((3, 3), memory) is None
+    memory[2, 2] = 0
+    assert field.next_step((3, 3), memory) == (-1, -1)
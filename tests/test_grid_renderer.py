@@ -0,0 +1,24 @@
+import os
+
+import numpy as np
+import pytest
+
+pygame = pytest.importorskip("pygame")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from env_interface_2 import AntSimInterface  # noqa: E402
+from scripts.grid_renderer import ANT, CARRYING, NEST, QUEEN, WALL, GridRenderer  # noqa: E402
+
+
+def test_walls_and_nest_get_separate_colours():
+    sim = AntSimInterface(size=80, seed=2, scenario={"terrain": "caves", "num_food": 3})
+    renderer = GridRenderer(sim.size, 160, [(i, i, i) for i in range(9)])
+    img = renderer.compose(sim)
+    nest = np.zeros(img.shape, dtype=bool)
+    for x, y in sim.nest_coords:
+        nest[x, y] = True
+    walls = (sim.grid == 1) & ~nest
+    assert walls.any()
+    assert (img[walls] == WALL).all()
+    on_top = np.isin(img, [ANT, CARRYING, QUEEN])  # 螞蟻與蟻后畫在巢上
+    assert (img[nest & ~on_top] == NEST).all()
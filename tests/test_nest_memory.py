@@ -0,0 +1,8 @@
+from env_interface_2 import NestMemory
+
+
+def test_standalone_nest_memory_has_no_known_food():
+    nm = NestMemory(size=20)
+    nm.food_zones.add(3)
+    assert nm.get_known_food() == []
+    assert nm.nearest_known_food((5, 5)) == -1
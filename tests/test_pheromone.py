@@ -0,0 +1,72 @@
+import numpy as np
+
+from env_interface_2 import OFFSETS
+from pheromone import PheromoneField, trail_bias
+
+
+def _keys_with_source(carrying, source_value):
+    """螞蟻在 (5, 5)，(4, 4) 是來源格（已知），(6, 6) 是往上坡的未知格"""
+    field = PheromoneField(12)
+    channel = "nest" if carrying else "food"
+    field.deposit(channel, [6], [6], 1.0)
+    grid = np.zeros((12, 12), dtype=np.int8)
+    grid[4, 4] = source_value
+    nest = np.zeros((12, 12), dtype=bool)
+    nest[4, 4] = carrying
+    pos = np.array([[5, 5]])
+    bias = trail_bias(field, pos, np.array([carrying]), OFFSETS, grid, nest=nest)
+    known = np.array([(dx, dy) == (-1, -1) for dx, dy in OFFSETS.tolist()])
+    return bias, known
+
+
+def test_adjacent_source_always_beats_uphill_trail():
+    rng = np.random.default_rng(0)
+    source = OFFSETS.tolist().index([-1, -1])
+    uphill = OFFSETS.tolist().index([1, 1])
+    for carrying, value in ((False, 2), (True, 1)):
+        bias, known = _keys_with_source(carrying, value)
+        assert bias[0, uphill] > 0
+        keys = rng.random((10000, 8)) + known - bias
+        # 最壞情況：來源格抽到接近 1、上坡格抽到 0 也一樣
+        keys[:, source] = np.nextafter(1.0, 0.0) + 1 - bias[0, source]
+        keys[:, uphill] = 0.0 - bias[0, uphill]
+        assert (keys.argmin(axis=1) == source).all()
+
+
+def test_wall_next_to_carrier_is_not_a_source():
+    field = PheromoneField(12)
+    grid = np.zeros((12, 12), dtype=np.int8)
+    grid[4, 4] = 1  # 牆，不是巢
+    grid[6, 6] = 1  # 巢格
+    nest = np.zeros((12, 12), dtype=bool)
+    nest[6, 6] = True
+    pos = np.array([[5, 5], [5, 5]])
+    carrying = np.array([True, True])
+    bias = trail_bias(field, pos, carrying, OFFSETS, grid, np.array([True, False]), nest)
+    wall = OFFSETS.tolist().index([-1, -1])
+    home = OFFSETS.tolist().index([1, 1])
+    assert bias[0, wall] == 0 and bias[0, home] > 0
+    # 這回合不追氣味的螞蟻也不被來源格吸引
+    assert not bias[1].any()
+
+
+def test_tiled_update_matches_full_map_and_strips():
+    rng = np.random.default_rng(1)
+    tiled, full, strips = (PheromoneField(70, tile=8) for _ in range(3))
+    for tick in range(1, 200):
+        if tick % 3 == 0:
+            xs, ys = rng.integers(0, 70, (2, 4))
+            for field in (tiled, full, strips):
+                field.deposit("food", xs, ys, 1.0)
+        tiled.update(tick)
+        if full.due(tick):
+            # 整張一起算（所有區塊都標成有氣味）
+            full.active[:] = True
+            full.commit(full.compute())
+        if strips.due(tick):
+            done = [strips.compute(rows) for rows in ((0, 3), (3, 5), (5, 9))]
+            for computed in done:
+                strips.commit(computed)
+        assert np.array_equal(tiled.data, full.data)
+        assert np.array_equal(tiled.data, strips.data)
+    assert tiled.total("food") > 0
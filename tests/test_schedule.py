@@ -0,0 +1,33 @@
+from schedule import TimerWheel
+
+
+def test_far_entries_wait_outside_the_buckets():
+    wheel = TimerWheel(slots=8)
+    for k in range(100):
+        wheel.schedule(10 + 8 * k, k)
+    wheel.schedule(2, "a")
+    wheel.schedule(10, "b")
+    assert sum(len(b) for b in wheel.buckets) == 1
+    for tick in range(10):
+        due = wheel.pop(tick)
+        assert due == ([("a", 0)] if tick == 2 else [])
+        # 每一格只放同一個 tick 的事件，溢出的等進了這一圈才搬進來
+        assert all(len({e[0] for e in b}) <= 1 for b in wheel.buckets)
+    assert wheel.pop(10) == [(0, 0), ("b", 0)]
+    assert len(wheel) == 99
+    assert [e[1] for e in wheel.items()] == list(range(1, 100))
+
+
+def test_pop_every_tick_matches_schedule_order():
+    wheel = TimerWheel(slots=4, now=50)
+    plan = [(53, 1), (70, 2), (53, 3), (90, 4), (70, 5), (51, 6)]
+    for t, item in plan:
+        wheel.schedule(t, item, tag=t)
+    got = []
+    for tick in range(51, 100):
+        got += [(tick, item, tag) for item, tag in wheel.pop(tick)]
+        if tick == 60:
+            wheel.schedule(70, 7, 70)
+    assert got == [(51, 6, 51), (53, 1, 53), (53, 3, 53), (70, 2, 70), (70, 5, 70),
+                   (70, 7, 70), (90, 4, 90)]
+    assert len(wheel) == 0
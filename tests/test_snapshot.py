@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import snapshot
+from env_interface_2 import AntSimInterface
+from env_interface_vec import VecAntSimInterface
+
+
+def test_mismatched_version_is_rejected(tmp_path):
+    sim = AntSimInterface(seed=2)
+    sim.step()
+    arrays = dict(snapshot.snapshot_state(sim))
+    arrays["version"] = np.array(snapshot.FORMAT_VERSION - 1)
+    with pytest.raises(ValueError):
+        snapshot.restore_state(arrays)
+
+
+def _signature(sim):
+    grid, ants = sim.get_state()
+    return (grid.tobytes(), ants.tobytes(), sim.food_delivered, sim.tick,
+            np.asarray(sim.visit_count[0:sim.size, 0:sim.size]).tobytes())
+
+
+@pytest.mark.parametrize("cls, kwargs", [
+    (AntSimInterface, {}),
+    (AntSimInterface, {"pheromone": True, "staggered": True}),
+    (VecAntSimInterface, {"num_agents": 200, "pheromone": True}),
+    (VecAntSimInterface, {"num_agents": 200, "chunk": 64}),
+])
+def test_save_load_and_fork_continue_identically(tmp_path, cls, kwargs):
+    sim = cls(size=150, seed=7, **kwargs)
+    for _ in range(200):
+        sim.step()
+    path = str(tmp_path / "sim.npz")
+    sim.save_snapshot(path)
+    fork = sim.fork()
+    loaded = cls.load_snapshot(path)
+    assert _signature(loaded) == _signature(sim)
+    for _ in range(200):
+        sim.step()
+        fork.step()
+        loaded.step()
+    assert _signature(fork) == _signature(sim)
+    assert _signature(loaded) == _signature(sim)
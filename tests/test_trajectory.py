@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from env_interface_2 import AntSimInterface
+from env_interface_vec import VecAntSimInterface
+from trajectory import ReplaySim, Trajectory, TrajectoryRecorder
+
+
+@pytest.mark.parametrize("cls, kwargs", [(AntSimInterface, {}),
+                                         (VecAntSimInterface, {"num_agents": 500})])
+def test_replay_matches_recorded_states(tmp_path, cls, kwargs):
+    sim = cls(size=100, seed=7, **kwargs)
+    # 巢附近鋪滿食物，錄到的回合裡一定有撿食物造成的地圖變化
+    nx, ny = sim.env.nest_pos
+    area = sim.grid[max(nx - 10, 0):nx + 15, max(ny - 10, 0):ny + 15]
+    area[area == 0] = 2
+    path = str(tmp_path / "run.traj")
+    recorder = TrajectoryRecorder(path, sim)
+    # get_state() 回傳的是 view，要先複製
+    states = [tuple(np.copy(s) for s in sim.get_state())]
+    for _ in range(150):
+        sim.step()
+        recorder.record()
+        states.append(tuple(np.copy(s) for s in sim.get_state()))
+    recorder.close()
+    assert sim.food_delivered > 0
+
+    replay = ReplaySim(Trajectory(path))
+    order = list(range(151)) + list(range(150, -1, -7))
+    order += np.random.default_rng(0).integers(0, 151, 50).tolist()
+    for tick in order:
+        replay.seek(tick)
+        grid, ants = replay.get_state()
+        assert np.array_equal(grid, states[tick][0])
+        assert np.array_equal(ants, states[tick][1])
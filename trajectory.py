@@ -0,0 +1,276 @@
+"""
+軌跡錄製與重播。
+錄製端每回合把螞蟻位置 / 狀態與格子變化附加到檔案尾端（只 append，不改寫）；
+重播端用 np.memmap 直接映射這些檔案，可以任意速度播放、跳到任一 tick、往回倒帶，
+完全不需要重跑 step()。
+
+    rec = TrajectoryRecorder("run.traj", sim)
+    for _ in range(5000):
+        sim.step()
+        rec.record()
+    rec.close()
+
+    replay = ReplaySim(Trajectory("run.traj"))
+    replay.seek(2500)
+    grid, ant_layer = replay.get_state()
+
+run.traj/ 目錄內容：
+    meta.json   地圖大小、座標型別、蟻后位置
+    grid0.npy   開始錄製時的格子（分塊地圖為 grid0.npz：區塊編號 + 區塊資料）
+    ticks.bin   每回合一筆 TICK_DTYPE（該回合螞蟻資料在 frames.bin 的位置、送回的食物數…）
+    frames.bin  每回合每隻螞蟻一筆 (x, y, state)，state = mode | carrying << 2
+    deltas.bin  格子變化 DELTA_DTYPE (x, y, old, new)，依時間排列
+"""
+import json
+import os
+
+import numpy as np
+
+from snapshot import MODE_ID
+from env_interface_vec import MODE_DONE
+from envs.chunked_grid import ChunkedGrid
+from observation import AntLayer, nest_box, state_views
+
+
+CARRYING_BIT = 4
+
+TICK_DTYPE = np.dtype([
+    ("tick", np.int32),
+    ("offset", np.int64),      # 這回合第一筆螞蟻資料在 frames.bin 的位置（筆數）
+    ("count", np.int32),       # 螞蟻數
+    ("food_delivered", np.int32),
+    ("delta_end", np.int64),   # 累計到這回合為止的格子變化筆數
+])
+
+DELTA_DTYPE = np.dtype([
+    ("x", np.int32),
+    ("y", np.int32),
+    ("old", np.int8),
+    ("new", np.int8),
+])
+
+
+def frame_dtype(coord):
+    return np.dtype([("x", coord), ("y", coord), ("state", np.uint8)])
+
+
+def ant_arrays(sim):
+    """(pos (N,2), state (N,) uint8)，v2 與向量化介面都適用"""
+    if hasattr(sim, "agents"):
+        agents = sim.agents
+        pos = np.array([a.pos for a in agents], dtype=np.int32).reshape(-1, 2)
+        state = np.array([MODE_ID[a.mode] | (CARRYING_BIT if a.carrying_food else 0)
+                          for a in agents], dtype=np.uint8)
+        return pos, state
+    state = sim.mode.astype(np.uint8)
+    state[sim.carrying] |= CARRYING_BIT
+    return sim.pos, state
+
+
+class TrajectoryRecorder:
+    """
+    record() 在每次 step() 之後呼叫。
+    格子只會在螞蟻腳下改變（撿食物），所以平常只比對螞蟻所在的格子；
+    每 scan_every 回合再整張比對一次，補上其他來源的變化。
+    """
+
+    def __init__(self, path, sim, scan_every=64):
+        self.path = path
+        self.sim = sim
+        self.size = sim.size
+        self.scan_every = scan_every
+        coord = np.int16 if self.size < 2 ** 15 else np.int32
+        self.frame_dtype = frame_dtype(coord)
+
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"size": self.size, "coord": np.dtype(coord).str,
+                       "queen_pos": [int(v) for v in sim.queen_pos],
+                       "nest_box": nest_box(sim), "start_tick": sim.tick}, f)
+        if isinstance(sim.grid, ChunkedGrid):
+            keys, chunks = sim.grid.to_arrays()
+            np.savez(os.path.join(path, "grid0.npz"), keys=keys, chunks=chunks)
+        else:
+            np.save(os.path.join(path, "grid0.npy"), sim.grid)
+        self.prev = sim.grid.copy()
+
+        self.ticks_file = open(os.path.join(path, "ticks.bin"), "wb")
+        self.frames_file = open(os.path.join(path, "frames.bin"), "wb")
+        self.deltas_file = open(os.path.join(path, "deltas.bin"), "wb")
+        self.frames = 0
+        self.offset = 0
+        self.delta_end = 0
+        self.record()
+
+    def _grid_changes(self, pos):
+        grid = self.sim.grid
+        if self.frames % self.scan_every == 0:
+            if isinstance(grid, ChunkedGrid):
+                return grid.diff(self.prev)
+            return np.flatnonzero(grid.ravel() != self.prev.ravel())
+        cells = pos[:, 0].astype(np.int64) * self.size + pos[:, 1]
+        return np.unique(cells[grid.flat[cells] != self.prev.flat[cells]])
+
+    def record(self):
+        sim = self.sim
+        pos, state = ant_arrays(sim)
+        n = len(state)
+
+        idx = self._grid_changes(pos)
+        if len(idx):
+            deltas = np.empty(len(idx), dtype=DELTA_DTYPE)
+            deltas["x"], deltas["y"] = np.divmod(idx, self.size)
+            deltas["old"] = self.prev.flat[idx]
+            deltas["new"] = sim.grid.flat[idx]
+            self.prev.flat[idx] = deltas["new"]
+            deltas.tofile(self.deltas_file)
+            self.delta_end += len(idx)
+
+        frame = np.empty(n, dtype=self.frame_dtype)
+        frame["x"] = pos[:, 0]
+        frame["y"] = pos[:, 1]
+        frame["state"] = state
+        frame.tofile(self.frames_file)
+
+        entry = np.array([(sim.tick, self.offset, n, sim.food_delivered, self.delta_end)],
+                         dtype=TICK_DTYPE)
+        entry.tofile(self.ticks_file)
+        self.offset += n
+        self.frames += 1
+
+    def flush(self):
+        """讓同時在讀的 Trajectory.refresh() 看得到最新的回合"""
+        self.deltas_file.flush()
+        self.frames_file.flush()
+        self.ticks_file.flush()
+
+    def close(self):
+        for f in (self.deltas_file, self.frames_file, self.ticks_file):
+            f.close()
+
+
+def _map(path, dtype, limit=None):
+    """把整數筆的部分映射進來；檔案還沒有資料時回傳空陣列"""
+    count = os.path.getsize(path) // dtype.itemsize
+    if limit is not None:
+        count = min(count, limit)
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class Trajectory:
+    """唯讀的錄製檔；錄製中也可以開，用 refresh() 跟上新寫入的回合"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.size = self.meta["size"]
+        self.queen_pos = tuple(self.meta["queen_pos"])
+        box = self.meta.get("nest_box")  # 舊的錄製檔沒有
+        self.nest_box = tuple(box) if box else None
+        chunked = os.path.join(path, "grid0.npz")
+        if os.path.exists(chunked):
+            with np.load(chunked) as data:
+                self.grid0 = ChunkedGrid.from_arrays(self.size, data["keys"], data["chunks"])
+        else:
+            self.grid0 = np.load(os.path.join(path, "grid0.npy"))
+        self.frame_dtype = frame_dtype(np.dtype(self.meta["coord"]))
+        self.refresh()
+
+    def refresh(self):
+        self.ticks = _map(os.path.join(self.path, "ticks.bin"), TICK_DTYPE)
+        if len(self.ticks):
+            # 只看索引已經寫到的部分，避免讀到寫了一半的回合
+            last = self.ticks[-1]
+            frames_end = int(last["offset"] + last["count"])
+            deltas_end = int(last["delta_end"])
+        else:
+            frames_end = deltas_end = 0
+        self.frames = _map(os.path.join(self.path, "frames.bin"), self.frame_dtype, frames_end)
+        self.deltas = _map(os.path.join(self.path, "deltas.bin"), DELTA_DTYPE, deltas_end)
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def frame(self, i):
+        """第 i 個錄製回合的螞蟻資料（memmap 上的 view）"""
+        entry = self.ticks[i]
+        start = int(entry["offset"])
+        return self.frames[start:start + int(entry["count"])]
+
+
+class ReplaySim:
+    """
+    以錄製檔模擬 AntSimInterface 的唯讀介面（get_state / grid / queen_pos / tick），
+    可以直接交給 GridRenderer。格子用 deltas 的 old / new 雙向增量更新，倒帶不必從頭重建。
+    """
+
+    def __init__(self, trajectory):
+        self.trajectory = trajectory
+        self.size = trajectory.size
+        self.queen_pos = trajectory.queen_pos
+        self.nest_box = trajectory.nest_box
+        self.grid = trajectory.grid0.copy()
+        # 地圖上剩下的食物格數，隨格子變化增量更新
+        if isinstance(self.grid, ChunkedGrid):
+            self.food_remaining = self.grid.count(2)
+        else:
+            self.food_remaining = int(np.count_nonzero(self.grid == 2))
+        chunk = self.grid.chunk if isinstance(self.grid, ChunkedGrid) else None
+        self.ant_layer = AntLayer(self.size, chunk)
+        self.index = 0
+        self.applied = 0  # 已套用到 grid 的變化筆數
+        self.tick = 0
+        self.food_delivered = 0
+        self.frame = None
+        self.seek(0)
+
+    def __len__(self):
+        return len(self.trajectory)
+
+    def seek(self, index):
+        """跳到第 index 個錄製回合（超出範圍會夾到頭尾）"""
+        traj = self.trajectory
+        index = min(max(index, 0), len(traj) - 1)
+        if index < 0:
+            return
+        entry = traj.ticks[index]
+        target = int(entry["delta_end"])
+        deltas = traj.deltas
+        if target > self.applied:
+            d = deltas[self.applied:target]
+            self.grid[d["x"], d["y"]] = d["new"]
+            self.food_remaining += int(np.count_nonzero(d["new"] == 2) - np.count_nonzero(d["old"] == 2))
+        elif target < self.applied:
+            d = deltas[target:self.applied][::-1]
+            self.grid[d["x"], d["y"]] = d["old"]
+            self.food_remaining += int(np.count_nonzero(d["old"] == 2) - np.count_nonzero(d["new"] == 2))
+        self.applied = target
+        self.index = index
+        self.tick = int(entry["tick"])
+        self.food_delivered = int(entry["food_delivered"])
+        self.frame = traj.frame(index)
+
+    def step(self, n=1):
+        self.seek(self.index + n)
+
+    def at_end(self):
+        return self.index >= len(self.trajectory) - 1
+
+    def carrying_count(self):
+        return int(np.count_nonzero(self.frame["state"] & CARRYING_BIT))
+
+    def done_count(self):
+        return int(np.count_nonzero((self.frame["state"] & 3) == MODE_DONE))
+
+    def get_state(self, region=None, out=None):
+        """region / out 與 AntSimInterface.get_state 相同，預設回傳唯讀 view"""
+        frame = self.frame
+        if frame is not None:
+            state = frame["state"]
+            cells = np.where((state & 3) != MODE_DONE,
+                             frame["x"].astype(np.int64) * self.size + frame["y"], -1)
+            self.ant_layer.update(cells, (state & CARRYING_BIT) != 0)
+        return state_views(self.grid, self.ant_layer.layer, region, out)
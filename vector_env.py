@@ -0,0 +1,331 @@
+"""
+強化學習用的批次環境：N 個互相獨立的蟻巢疊在同一組陣列裡一起跑（gym 的 vector env 介面）。
+
+    env = AntVectorEnv(num_envs=256, controlled=1)
+    obs = env.reset(seeds=range(256))
+    obs, reward, terminated, truncated, info = env.step(actions)  # actions: (256, 1)，0..8
+
+每個蟻巢的前 controlled 隻螞蟻（探索蟻）由 actions 控制：0..7 為 DIRECTIONS 的方向、8 為不動，
+其餘螞蟻照 VecAntSimInterface 的規則行動。獎勵是這一步交付的食物數。
+蟻巢 is_done()（交付 target_food 份）或跑滿 max_ticks 時自動以下一個 seed 重設，
+回傳的觀測已經是新一局的（見 step 的 info）。
+
+觀測是預先配置、每步原地覆寫的緩衝區（要保留請自行複製）：
+    obs["local"]     (N, controlled, 4, window, window) uint8：以螞蟻為中心的牆 / 食物 / 巢 / 其他螞蟻
+    obs["carrying"]  (N, controlled) bool
+    obs["global"]    (N, 2, size, size) int8：地圖與螞蟻層（同 get_state()），global_layers=False 時沒有
+
+疊在一起的蟻巢沿 x 方向相接（第 w 個佔 x ∈ [w*size, (w+1)*size)），共用 VecAntSimInterface 的規則，
+亂數用 streams="counter" 並以各自的 seed / tick 取用，所以沒有受控螞蟻時，
+每個蟻巢與 VecAntSimInterface(seed=..., streams="counter") 單獨跑的結果完全相同。
+"""
+import numpy as np
+
+from collision import OccupancyGrid
+from env_interface_vec import VecAntSimInterface, DIRECTIONS, MODE_DONE, MODE_EXPLORE
+from envs.scenario import WorldCache
+from event_bus import DISABLED
+from sim_random import make_seed_sequence, counter_random
+
+
+NUM_ACTIONS = len(DIRECTIONS) + 1  # 8 個方向 + 不動
+ACTION_MOVES = np.concatenate([DIRECTIONS, [[0, 0]]]).astype(np.int32)
+LOCAL_CHANNELS = ["wall", "food", "nest", "ants"]
+
+
+class _StackedColonies(VecAntSimInterface):
+    """
+    num_envs 個同樣大小的蟻巢疊成一張 (num_envs * size, size) 的地圖。
+    螞蟻 i 屬於第 i // num_agents 個蟻巢；地圖邊界、巢與亂數都依所屬的蟻巢判斷。
+    """
+
+    def __init__(self, num_envs, size, num_agents, max_steps, collision):
+        self.num_envs = num_envs
+        self.size = size
+        self.num_agents = num_agents
+        self.max_steps = max_steps
+        self.collision = collision
+        self.chunk = None
+        self.events = DISABLED
+        self.streams = "counter"
+        self.pheromone = None
+        self.food = None  # 不維護食物區索引（_arrive 跳過）
+
+        n = num_envs * num_agents
+        self.grid = np.zeros((num_envs * size, size), dtype=np.int8)
+        self.dist_home = np.zeros((num_envs * size, size), dtype=np.int32)
+        self.visit_count = np.zeros((num_envs * size, size), dtype=np.int32)
+        self.nest_mask = np.zeros((num_envs * size, size), dtype=bool)  # 各蟻巢的巢格
+        self.occupancy = OccupancyGrid(size, count=num_envs)
+        self.pos = np.zeros((n, 2), dtype=np.int32)
+        self.mode = np.zeros(n, dtype=np.int8)
+        self.carrying = np.zeros(n, dtype=bool)
+        self.steps_taken = np.zeros(n, dtype=np.int32)
+        self.blocked_count = np.zeros(n, dtype=np.int32)
+        self.is_explorer = np.zeros(n, dtype=bool)
+        self.scent_age = np.zeros(n, dtype=np.int32)
+        self.scent_blocked = np.zeros(n, dtype=bool)
+
+        # 每個蟻巢自己的狀態
+        self.world = np.repeat(np.arange(num_envs), num_agents)  # 螞蟻 → 蟻巢
+        self.local = np.tile(np.arange(num_agents), num_envs)  # 螞蟻在蟻巢內的編號
+        self.origin = np.arange(num_envs) * size  # 蟻巢的 x 起點
+        self.keys = np.zeros(num_envs, dtype=np.uint64)
+        self.ticks = np.zeros(num_envs, dtype=np.int64)
+        self.delivered = np.zeros(num_envs, dtype=np.int64)
+        self.food_delivered = 0  # 全部蟻巢的總和（_arrive 會累加）
+        self.departure_queue = np.zeros(0, dtype=np.int64)
+        self.departure_index = np.zeros(num_envs, dtype=np.int64)
+
+    def load(self, w, sim):
+        """把剛建好的 VecAntSimInterface(streams="counter") 放進第 w 格"""
+        s = self.size
+        x0 = w * s
+        ants = slice(w * self.num_agents, (w + 1) * self.num_agents)
+        rows = slice(x0, x0 + s)
+        cells = slice(x0 * s, (x0 + s) * s)
+
+        self.grid[rows] = sim.grid
+        self.dist_home[rows] = sim.dist_home
+        self.nest_mask[rows] = False
+        (nx, ny), n = sim.env.nest_pos, sim.env.nest_size
+        self.nest_mask[x0 + nx:x0 + nx + n, ny:ny + n] = True
+        self.visit_count[rows] = sim.visit_count
+        self.occupancy.counts[cells] = sim.occupancy.counts
+        self.occupancy.unlimited[cells] = sim.occupancy.unlimited
+        self.pos[ants] = sim.pos + (x0, 0)
+        for name in ("mode", "carrying", "steps_taken", "blocked_count", "is_explorer",
+                     "scent_age", "scent_blocked"):
+            getattr(self, name)[ants] = getattr(sim, name)
+        self.keys[w] = sim.counter_key
+        self.ticks[w] = sim.tick
+        self.delivered[w] = sim.food_delivered
+        self.departure_queue = sim.departure_queue
+        self.departure_index[w] = sim.departure_index
+
+    def _targets(self, idx, targets):
+        # 以所屬蟻巢的範圍判斷出界，跨進隔壁蟻巢也算出界
+        x0 = self.origin[self.world[idx]].reshape((-1,) + (1,) * (targets.ndim - 2))
+        lx = targets[..., 0] - x0
+        ly = targets[..., 1]
+        inside = (lx >= 0) & (lx < self.size) & (ly >= 0) & (ly < self.size)
+        tx = np.clip(lx, 0, self.size - 1) + x0
+        ty = np.clip(ly, 0, self.size - 1)
+        return inside, tx, ty
+
+    def _in_nest(self, x, y):
+        # 呼叫端給的座標都已裁切到所屬蟻巢內
+        return self.nest_mask[x, y]
+
+    def _draw(self, ids, width, salt):
+        w = self.world[ids]
+        keys = counter_random(self.keys[w], self.ticks[w], self.local[ids], width, salt)
+        return keys if width > 1 else keys[:, 0]
+
+    def _depart(self):
+        """每個蟻巢各自每 5 tick 放一隻探索蟻出發"""
+        q = self.departure_index
+        due = np.flatnonzero((self.ticks % 5 == 0) & (q < len(self.departure_queue)))
+        if len(due) == 0:
+            return
+        i = due * self.num_agents + self.departure_queue[q[due]]
+        go = (self.mode[i] == MODE_EXPLORE) & self._in_nest(self.pos[i, 0], self.pos[i, 1])
+        self.departure_index[due[go]] += 1
+
+    def step(self, moves=None, controlled=None):
+        """
+        全部蟻巢走一回合，回傳每個蟻巢這回合交付的食物數。
+        controlled: 受控螞蟻的全域編號；moves: 牠們這回合的移動 (len(controlled), 2)
+        """
+        self.ticks += 1
+        idx = np.flatnonzero(self.mode != MODE_DONE)
+        planned = self._decide(idx)
+        if controlled is not None:
+            at = np.searchsorted(idx, controlled)
+            at = np.minimum(at, len(idx) - 1)
+            live = idx[at] == controlled
+            planned[at[live]] = moves[live]
+        moved, still, blocked = self._move(idx, planned)
+        carrying = self.carrying.copy()
+        self._arrive(idx, moved, still, blocked)
+        self._depart()
+        delivered = np.bincount(self.world[carrying & ~self.carrying], minlength=self.num_envs)
+        self.delivered += delivered
+        return delivered
+
+
+class AntVectorEnv:
+    """
+    N 個蟻巢的批次環境，見模組說明。
+    """
+
+    def __init__(self, num_envs=64, size=150, num_agents=16, controlled=1, window=11,
+                 global_layers=True, target_food=100, max_ticks=5000, max_steps=300,
+                 collision="random", seed=None, scenario=None, world_cache=None):
+        """
+        controlled: 每個蟻巢受控的螞蟻數（前幾隻探索蟻，最多 num_agents // 2）
+        window: 局部觀測的邊長（奇數）
+        target_food / max_ticks: 交付這麼多食物算結束（terminated）、跑滿這麼多 tick 算截斷（truncated）
+        seed: 自動重設時用的 seed 從這裡依序分出
+        scenario: 程序化生成的地圖參數（見 envs/scenario.py），每次重設都依新的 seed 生成
+        world_cache: WorldCache 或目錄，重設時同一個 seed 的地圖直接讀檔
+        """
+        if not 0 <= controlled <= num_agents // 2:
+            raise ValueError(f"controlled 需在 0..{num_agents // 2} 之間")
+        if window % 2 == 0:
+            raise ValueError("window 需為奇數")
+        self.num_envs = num_envs
+        self.size = size
+        self.num_agents = num_agents
+        self.controlled = controlled
+        self.window = window
+        self.target_food = target_food
+        self.max_ticks = max_ticks
+        self.collision = collision
+        self.max_steps = max_steps
+        self.seed_seq = make_seed_sequence(seed)
+        self.scenario = scenario
+        if world_cache is not None and not isinstance(world_cache, WorldCache):
+            world_cache = WorldCache(world_cache)
+        self.world_cache = world_cache
+        self.colonies = _StackedColonies(num_envs, size, num_agents, max_steps, collision)
+        self.seeds = [None] * num_envs
+
+        # 受控螞蟻的全域編號 (N, controlled)
+        self.agent_ids = (np.arange(num_envs)[:, None] * num_agents
+                          + np.arange(controlled)[None, :])
+        r = window // 2
+        self._window_offsets = np.arange(-r, r + 1)
+        self.observations = {
+            "local": np.zeros((num_envs, controlled, len(LOCAL_CHANNELS), window, window),
+                              dtype=np.uint8),
+            "carrying": np.zeros((num_envs, controlled), dtype=bool),
+        }
+        if global_layers:
+            self.observations["global"] = np.zeros((num_envs, 2, size, size), dtype=np.int8)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.terminated = np.zeros(num_envs, dtype=bool)
+        self.truncated = np.zeros(num_envs, dtype=bool)
+
+    def _reset_one(self, w, seed):
+        if seed is None:
+            seed = self.seed_seq.spawn(1)[0]
+        sim = VecAntSimInterface(size=self.size, seed=seed, num_agents=self.num_agents,
+                                 max_steps=self.max_steps, collision=self.collision,
+                                 streams="counter", scenario=self.scenario,
+                                 world_cache=self.world_cache)
+        self.colonies.load(w, sim)
+        self.seeds[w] = seed
+
+    def reset(self, seeds=None):
+        """seeds: 每個蟻巢的 seed（長度 num_envs），None 時從建構時的 seed 依序分出"""
+        seeds = list(seeds) if seeds is not None else [None] * self.num_envs
+        if len(seeds) != self.num_envs:
+            raise ValueError(f"需要 {self.num_envs} 個 seed")
+        for w, seed in enumerate(seeds):
+            self._reset_one(w, seed)
+        return self._observe()
+
+    def step(self, actions):
+        """
+        actions: (num_envs, controlled) 的整數 0..NUM_ACTIONS-1
+        回傳 (obs, reward, terminated, truncated, info)，陣列都是每步覆寫的緩衝區。
+        結束的蟻巢已自動重設；info["food"] / info["ticks"] 是牠們結束那一局的成績
+        （其他蟻巢為 -1），info["final_seed"] 為結束那一局的 seed。
+        """
+        c = self.colonies
+        ids = self.agent_ids.ravel()
+        moves = ACTION_MOVES[np.asarray(actions).reshape(-1)] if len(ids) else None
+        delivered = c.step(moves, ids if len(ids) else None)
+        self.rewards[:] = delivered
+        np.greater_equal(c.delivered, self.target_food, out=self.terminated)
+        np.greater_equal(c.ticks, self.max_ticks, out=self.truncated)
+        self.truncated &= ~self.terminated
+
+        info = {}
+        done = np.flatnonzero(self.terminated | self.truncated)
+        if len(done):
+            food = np.full(self.num_envs, -1, dtype=np.int64)
+            ticks = np.full(self.num_envs, -1, dtype=np.int64)
+            food[done] = c.delivered[done]
+            ticks[done] = c.ticks[done]
+            info = {"food": food, "ticks": ticks,
+                    "final_seed": {int(w): self.seeds[w] for w in done}}
+            for w in done.tolist():
+                self._reset_one(w, None)
+        return self._observe(), self.rewards, self.terminated, self.truncated, info
+
+    def _observe(self):
+        c = self.colonies
+        obs = self.observations
+        s = self.size
+        if self.controlled:
+            ids = self.agent_ids.ravel()
+            x0 = c.origin[c.world[ids]]
+            # 每隻受控螞蟻的視窗座標 (n, window, window)，地圖外當成牆
+            lx = c.pos[ids, 0, None, None] - x0[:, None, None] + self._window_offsets[:, None]
+            ly = c.pos[ids, 1, None, None] + self._window_offsets[None, :]
+            inside = (lx >= 0) & (lx < s) & (ly >= 0) & (ly < s)
+            gx = np.clip(lx, 0, s - 1) + x0[:, None, None]
+            gy = np.clip(ly, 0, s - 1)
+            cell = c.grid[gx, gy]
+            nest = c._in_nest(gx, gy) & inside
+            local = obs["local"].reshape(len(ids), len(LOCAL_CHANNELS), self.window, self.window)
+            local[:, 0] = ((cell == 1) & ~nest) | ~inside
+            local[:, 1] = (cell == 2) & inside
+            local[:, 2] = nest
+            ants = c.occupancy.counts[gx * s + gy] > 0
+            ants[:, self.window // 2, self.window // 2] = False  # 不含自己
+            local[:, 3] = ants & inside
+            obs["carrying"][:] = c.carrying[ids].reshape(self.num_envs, self.controlled)
+
+        if "global" in obs:
+            layers = obs["global"]
+            layers[:, 0] = c.grid.reshape(self.num_envs, s, s)
+            layers[:, 1] = 0
+            alive = np.flatnonzero(c.mode != MODE_DONE)
+            w = c.world[alive]
+            layers[w, 1, c.pos[alive, 0] - c.origin[w], c.pos[alive, 1]] = np.where(
+                c.carrying[alive], 3, 4)
+        return obs
+
+    @property
+    def food_delivered(self):
+        """每個蟻巢這一局到目前交付的食物數"""
+        return self.colonies.delivered
+
+    @property
+    def ticks(self):
+        return self.colonies.ticks
+
+    def close(self):
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    # 隨機策略收集資料的吞吐量（env-steps/s = 蟻巢數 × 每秒步數）
+    parser = argparse.ArgumentParser(description="AntVectorEnv 吞吐量量測")
+    parser.add_argument("--envs", type=int, default=256)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--agents", type=int, default=16)
+    parser.add_argument("--controlled", type=int, default=1)
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--no-global", action="store_true")
+    args = parser.parse_args()
+
+    env = AntVectorEnv(num_envs=args.envs, size=args.size, num_agents=args.agents,
+                       controlled=args.controlled, global_layers=not args.no_global, seed=0)
+    env.reset()
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, NUM_ACTIONS, size=(args.steps, args.envs, args.controlled))
+    t = time.perf_counter()
+    total = 0.0
+    for k in range(args.steps):
+        obs, reward, terminated, truncated, info = env.step(actions[k])
+        total += reward.sum()
+    dt = time.perf_counter() - t
+    print(f"{args.envs} 個蟻巢 × {args.steps} 步：{args.envs * args.steps / dt:,.0f} env-steps/s，"
+          f"交付 {total:.0f} 份食物")